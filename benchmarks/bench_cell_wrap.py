@@ -0,0 +1,96 @@
+"""
+Benchmark ngắt dòng ô bảng: TextWrapper (chuỗi đã ngắt sẵn) so với Paragraph cho mỗi ô
+
+Chạy từ thư mục gốc của project:
+    python benchmarks/bench_cell_wrap.py --rows 10000 --cols 10
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from reportlab.lib.styles import ParagraphStyle
+from reportlab.platypus import Paragraph, Table, TableStyle
+
+from src.converters.excel_to_pdf import FontManager
+from src.converters.text_wrap import TextWrapper
+
+WORDS = ('báo cáo điểm thi học sinh giỏi lớp năm học trường trung phổ thông '
+         'Hà Nội Thành phố Hồ Chí Minh tổng hợp kết quả ghi chú đạt xuất sắc').split()
+
+COL_WIDTH = 90.0
+PADDING = 10.0
+
+
+def make_cells(rows: int, cols: int, seed: int = 1):
+    """Sinh dữ liệu: phần lớn ô ngắn, khoảng 1/5 ô là câu dài cần ngắt dòng"""
+    rnd = random.Random(seed)
+    data = []
+    for _ in range(rows):
+        row = []
+        for _ in range(cols):
+            count = rnd.randint(8, 30) if rnd.random() < 0.2 else rnd.randint(1, 3)
+            row.append(' '.join(rnd.choice(WORDS) for _ in range(count)))
+        data.append(row)
+    return data
+
+
+def layout(data, cols: int, font: str) -> float:
+    """Dựng Table và tính layout (wrap) như khi build PDF"""
+    table = Table(data, colWidths=[COL_WIDTH] * cols)
+    table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), font),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('LEADING', (0, 0), (-1, -1), 9.6),
+        ('LEFTPADDING', (0, 0), (-1, -1), PADDING / 2),
+        ('RIGHTPADDING', (0, 0), (-1, -1), PADDING / 2),
+    ]))
+    table.wrap(COL_WIDTH * cols, 10 ** 9)
+    return table._height
+
+
+def bench_text_wrapper(cells, cols: int, font: str):
+    start = time.perf_counter()
+    wrapper = TextWrapper.get(font, 8)
+    data = [[wrapper.wrap(text, COL_WIDTH - PADDING) for text in row] for row in cells]
+    prepared = time.perf_counter()
+    height = layout(data, cols, font)
+    return prepared - start, time.perf_counter() - prepared, height
+
+
+def bench_paragraph(cells, cols: int, font: str):
+    start = time.perf_counter()
+    style = ParagraphStyle('BenchCell', fontName=font, fontSize=8, leading=9.6)
+    data = [[Paragraph(text, style) for text in row] for row in cells]
+    prepared = time.perf_counter()
+    height = layout(data, cols, font)
+    return prepared - start, time.perf_counter() - prepared, height
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--cols', type=int, default=10)
+    args = parser.parse_args()
+
+    font, _ = FontManager.register_fonts()
+    cells = make_cells(args.rows, args.cols)
+    total = args.rows * args.cols
+    print(f"{total} ô ({args.rows} dòng x {args.cols} cột), font {font}")
+
+    results = {}
+    for name, bench in (('TextWrapper', bench_text_wrapper), ('Paragraph', bench_paragraph)):
+        prepare, table_layout, height = bench(cells, args.cols, font)
+        results[name] = prepare + table_layout
+        print(f"{name:<12} chuẩn bị {prepare:7.2f}s  layout {table_layout:7.2f}s  "
+              f"tổng {prepare + table_layout:7.2f}s  ({total / (prepare + table_layout):,.0f} ô/s)  "
+              f"cao {height:,.0f}pt")
+
+    print(f"Nhanh hơn: x{results['Paragraph'] / results['TextWrapper']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""
+Kiểm tra ngân sách bộ nhớ: chuyển đổi workbook / tài liệu Word lớn sinh tự động
+
+Mỗi fixture chạy trong một process mới (spawn) để RSS không lẫn giữa các lần;
+bộ nhớ được đo theo từng giai đoạn bằng MemoryTracker. Vượt ngân sách thì in
+giai đoạn tốn nhất và thoát với mã 1 (dùng được trong CI); process con chết
+(lỗi chuyển đổi, MemoryError, bị OOM kill) hoặc chạy quá --timeout cũng tính là
+không đạt.
+
+Chạy từ thư mục gốc của project:
+    python benchmarks/bench_memory_budget.py
+    python benchmarks/bench_memory_budget.py --mode tracemalloc --only word
+
+Chế độ rss so RSS đỉnh với ngân sách; tracemalloc so bộ nhớ Python đỉnh (RSS bị
+chính tracemalloc làm phình) và in top dòng cấp phát, chậm hơn nhiều lần nên
+với workbook nên giảm --scale.
+"""
+import argparse
+import multiprocessing
+import queue as queue_module
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+WORDS = ('báo cáo điểm thi học sinh giỏi lớp năm học trường trung phổ thông '
+         'Hà Nội Thành phố Hồ Chí Minh tổng hợp kết quả ghi chú đạt xuất sắc').split()
+
+_MB = 1024 ** 2
+
+# Tên fixture -> (hàm sinh, ngân sách MB: RSS đỉnh tăng thêm so với lúc bắt đầu
+# chuyển đổi, bộ nhớ Python đỉnh theo tracemalloc). Đo trên Linux x86_64,
+# Python 3.11 (excel +165MB RSS / 166MB Python, word +60MB / 28MB), chừa ~1.5 lần.
+FIXTURES = {}
+
+
+def fixture(name: str, rss_mb: float, python_mb: float):
+    def register(make):
+        FIXTURES[name] = (make, {'rss': rss_mb, 'tracemalloc': python_mb})
+        return make
+    return register
+
+
+def _sentence(rnd: random.Random, low: int, high: int) -> str:
+    return ' '.join(rnd.choice(WORDS) for _ in range(rnd.randint(low, high)))
+
+
+@fixture('excel', rss_mb=250, python_mb=250)
+def make_excel(folder: Path, scale: float) -> Path:
+    """Workbook 3 sheet x 5.000 dòng x 12 cột (số, ngày, chữ ngắn/dài)"""
+    from datetime import date, timedelta
+    from openpyxl import Workbook
+
+    rnd = random.Random(1)
+    path = folder / 'budget.xlsx'
+    wb = Workbook(write_only=True)
+    for sheet in range(3):
+        ws = wb.create_sheet(f"Sheet{sheet + 1}")
+        ws.append([f"Cột {c + 1}" for c in range(12)])
+        for r in range(int(5000 * scale)):
+            ws.append([r, rnd.random() * 1e6, date(2020, 1, 1) + timedelta(days=r % 1000)]
+                      + [_sentence(rnd, 8, 25) if rnd.random() < 0.1 else _sentence(rnd, 1, 3)
+                         for _ in range(9)])
+    wb.save(path)
+    return path
+
+
+@fixture('word', rss_mb=90, python_mb=45)
+def make_word(folder: Path, scale: float) -> Path:
+    """Tài liệu 10.000 paragraph (heading mỗi 200 đoạn) và bảng 1.000 dòng x 6 cột"""
+    from docx import Document
+
+    rnd = random.Random(2)
+    path = folder / 'budget.docx'
+    doc = Document()
+    for i in range(int(10000 * scale)):
+        if i % 200 == 0:
+            doc.add_heading(f"Chương {i // 200 + 1}", level=1)
+        para = doc.add_paragraph(_sentence(rnd, 20, 80))
+        if i % 7 == 0:
+            para.add_run(' ' + _sentence(rnd, 3, 8)).bold = True
+    table = doc.add_table(rows=int(1000 * scale), cols=6)
+    for row in table.rows:
+        for cell in row.cells:
+            cell.text = _sentence(rnd, 1, 6)
+    doc.save(path)
+    return path
+
+
+def _measure(name: str, input_path: str, output_path: str, mode: str, queue):
+    """Chạy trong process con: chuyển đổi một fixture và gửi số đo về"""
+    from src.batch.engine import get_converter
+    from src.logging.memory_tracker import MemoryTracker, track_memory
+
+    convert = get_converter(Path(input_path))
+    with track_memory(Path(input_path), mode) as tracker:
+        convert(Path(input_path), Path(output_path))
+    assert isinstance(tracker, MemoryTracker)
+    queue.put((name, tracker.baseline_rss, tracker.peak_rss, tracker.traced_peak,
+               tracker.stages, tracker.report()))
+
+
+def run_fixture(name: str, folder: Path, scale: float, mode: str,
+                timeout: float) -> Optional[tuple]:
+    """Số đo của fixture, None nếu process con chết hoặc chạy quá timeout giây"""
+    make, _ = FIXTURES[name]
+    input_path = make(folder, scale)
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    process = ctx.Process(target=_measure,
+                          args=(name, str(input_path), str(folder / f"{name}.pdf"), mode, queue))
+    process.start()
+    deadline = time.monotonic() + timeout
+    result = None
+    while result is None:
+        alive = process.is_alive()
+        try:
+            result = queue.get(timeout=1)
+        except queue_module.Empty:
+            if not alive:
+                # Đã thoát mà không gửi số đo
+                process.join()
+                print(f"❌ {name:<6} process đo thoát với mã {process.exitcode}")
+                break
+            if time.monotonic() > deadline:
+                print(f"❌ {name:<6} quá {timeout:.0f}s, dừng process đo")
+                process.kill()
+                break
+    process.join()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--mode', choices=('rss', 'tracemalloc'), default='rss')
+    parser.add_argument('--only', choices=sorted(FIXTURES), action='append',
+                        help="Chỉ chạy fixture này (lặp lại được)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Hệ số kích thước fixture (ngân sách nhân theo)")
+    parser.add_argument('--timeout', type=float, default=1800,
+                        help="Số giây tối đa cho mỗi fixture")
+    parser.add_argument('--verbose', action='store_true', help="In bảng từng giai đoạn")
+    args = parser.parse_args()
+
+    failed = []
+    with tempfile.TemporaryDirectory(prefix='wordtopdf_budget_') as tmp:
+        for name in args.only or sorted(FIXTURES):
+            budget_mb = FIXTURES[name][1][args.mode] * max(args.scale, 1.0)
+            result = run_fixture(name, Path(tmp), args.scale, args.mode, args.timeout)
+            if result is None:
+                failed.append(name)
+                continue
+            name, baseline, peak, traced_peak, stages, report = result
+            if args.mode == 'tracemalloc':
+                used = traced_peak / _MB
+                heaviest = max(stages, key=lambda s: s.traced_peak)
+                what = "Python"
+            else:
+                used = (peak - baseline) / _MB
+                heaviest = max(stages, key=lambda s: s.peak_rss)
+                what = f"RSS +, nền {baseline / _MB:.0f}MB"
+            ok = used <= budget_mb
+            print(f"{'✅' if ok else '❌'} {name:<6} {used:7.1f}MB / ngân sách {budget_mb:.0f}MB "
+                  f"({what}, đỉnh ở {heaviest.name})")
+            if args.verbose or not ok:
+                for line in report:
+                    print(f"     {line}")
+            if not ok:
+                failed.append(name)
+
+    if failed:
+        print(f"Vượt ngân sách bộ nhớ hoặc lỗi: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
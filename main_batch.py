@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+main_batch.py - Chuyển đổi hàng loạt không cần giao diện
+
+Ví dụ:
+    python main_batch.py convert thu_muc/ -o pdf/
+    python main_batch.py watch "\\\\server\\to convert" -o pdf/
+    python main_batch.py enqueue /mnt/share/queue bao_cao/*.xlsx
+    python main_batch.py worker /mnt/share/queue      (chạy trên mỗi máy)
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Thêm src vào Python path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.batch.daemon import WatchDaemon
+from src.batch.engine import BatchEngine, CONVERTERS
+from src.batch.journal import open_journal
+from src.batch.shared_queue import QueueWorker, SharedQueue
+from src.converters.output_split import enable_part_limits
+from src.io.file_handler import FileHandler
+from src.logging.logger_setup import setup_logger
+from src.logging.memory_tracker import MODES as MEMTRACE_MODES, enable_memtrace
+from src.logging.profiler import DEFAULT_TOP, enable_profiling, profile_folder, write_report
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """Đọc tham số dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Document to PDF - chế độ batch")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    convert = sub.add_parser('convert', help="Chuyển đổi file/thư mục rồi thoát")
+    convert.add_argument('inputs', nargs='+', type=Path, help="File hoặc thư mục")
+    convert.add_argument('--no-resume', action='store_true',
+                         help="Không ghi journal / không tiếp tục batch bị gián đoạn")
+
+    watch = sub.add_parser('watch', help="Theo dõi thư mục và tự động chuyển đổi")
+    watch.add_argument('folders', nargs='+', type=Path, help="Thư mục cần theo dõi")
+    watch.add_argument('--settle', type=float, default=2.0,
+                       help="Số giây file phải đứng yên trước khi chuyển đổi (mặc định 2)")
+    watch.add_argument('--poll-interval', type=float, default=2.0,
+                       help="Chu kỳ quét khi dùng polling (mặc định 2)")
+    watch.add_argument('--poll', action='store_true',
+                       help="Dùng polling thay vì inotify (thư mục mạng)")
+    watch.add_argument('--no-recursive', action='store_true',
+                       help="Không theo dõi thư mục con")
+
+    worker = sub.add_parser('worker', help="Nhận file từ hàng đợi chung (thư mục mạng) "
+                                           "và chuyển đổi, chạy được trên nhiều máy")
+    worker.add_argument('queue', type=Path, help="Thư mục hàng đợi chung")
+    worker.add_argument('--lease-ttl', type=float, default=60.0,
+                        help="Số giây không heartbeat thì file của worker được máy khác "
+                             "nhận lại (mặc định 60)")
+    worker.add_argument('--settle', type=float, default=2.0,
+                        help="Số giây file trong inbox phải đứng yên trước khi nhận (mặc định 2)")
+    worker.add_argument('--poll-interval', type=float, default=2.0,
+                        help="Chu kỳ quét inbox (mặc định 2)")
+
+    enqueue = sub.add_parser('enqueue', help="Chép file/thư mục vào inbox của hàng đợi chung")
+    enqueue.add_argument('queue', type=Path, help="Thư mục hàng đợi chung")
+    enqueue.add_argument('inputs', nargs='+', type=Path, help="File hoặc thư mục")
+
+    for p in (convert, watch, worker):
+        p.add_argument('-o', '--output', type=Path, default=None,
+                       help="Thư mục lưu PDF (mặc định: cùng thư mục file gốc, "
+                            "với worker là <hàng đợi>/output)")
+        p.add_argument('-j', '--workers', type=int, default=None,
+                       help="Số worker process (mặc định: số CPU)")
+        p.add_argument('--timeout', type=float, default=600,
+                       help="Thời gian tối đa mỗi file, giây (mặc định 600, 0 = không giới hạn)")
+        p.add_argument('--max-memory', type=int, default=0,
+                       help="Bộ nhớ (RSS) tối đa mỗi worker, MB (mặc định 0 = không giới hạn)")
+        p.add_argument('--split', type=int, default=1,
+                       help="Số process dựng song song các sheet/chương của một file "
+                            "(mặc định 1 = tuần tự, 0 = số CPU; cần pypdf)")
+        p.add_argument('--part-pages', type=int, default=0,
+                       help="Chia PDF của Excel thành nhiều file, tối đa N trang mỗi file "
+                            "(<tên>.part001.pdf...; mặc định 0 = một file)")
+        p.add_argument('--part-rows', type=int, default=0,
+                       help="Chia PDF của Excel, tối đa N dòng dữ liệu mỗi file")
+        p.add_argument('--part-mb', type=float, default=0,
+                       help="Chia PDF của Excel, mỗi file khoảng N MB")
+        p.add_argument('--retries', type=int, default=2,
+                       help="Số lần thử lại file lỗi, chờ 5s, 10s, 20s... (mặc định 2)")
+        p.add_argument('--profile', type=Path, nargs='?', const=Path('profiles'), default=None,
+                       metavar='DIR',
+                       help="Profile từng file bằng cProfile, ghi .pstats / .collapsed và "
+                            "báo cáo hotspot vào DIR (mặc định profiles/). "
+                            "Tương đương biến môi trường WORDTOPDF_PROFILE=DIR")
+        p.add_argument('--profile-top', type=int, default=DEFAULT_TOP,
+                       help=f"Số hàm trong báo cáo hotspot (mặc định {DEFAULT_TOP})")
+        p.add_argument('--memtrace', choices=MEMTRACE_MODES, nargs='?', const='rss',
+                       default=None,
+                       help="Ghi log bộ nhớ từng giai đoạn của mỗi file: rss (mặc định) hoặc "
+                            "tracemalloc (kèm top dòng cấp phát, chậm hơn). "
+                            "Tương đương biến môi trường WORDTOPDF_MEMTRACE")
+
+    return parser.parse_args(argv)
+
+
+def collect_files(inputs) -> list:
+    """Gom danh sách file từ các file/thư mục được truyền vào"""
+    patterns = [f"*{ext}" for ext in CONVERTERS]
+    files = []
+    for path in inputs:
+        if path.is_dir():
+            files.extend(FileHandler.get_files_from_folder(path, patterns))
+        elif FileHandler.validate_file(path, list(CONVERTERS)):
+            files.append(path)
+    return [f for f in files if not FileHandler.is_temp_file(f)]
+
+
+def main(argv=None) -> int:
+    """Main function"""
+    args = parse_args(argv)
+    logger = setup_logger("batch_converter")
+    if args.command == 'enqueue':
+        queue = SharedQueue(args.queue)
+        files = collect_files(args.inputs)
+        for path in files:
+            queue.enqueue(path)
+        logger.info(f"📥 Đã đưa {len(files)} file vào {queue.inbox}")
+        return 0
+    if args.profile:
+        enable_profiling(args.profile)
+    if args.memtrace:
+        enable_memtrace(args.memtrace)
+    if args.part_pages or args.part_rows or args.part_mb:
+        enable_part_limits(args.part_pages, args.part_rows, args.part_mb)
+    profiles = profile_folder()
+
+    if args.command == 'watch':
+        daemon = WatchDaemon(
+            args.folders, args.output, args.workers,
+            timeout=args.timeout, memory_limit_mb=args.max_memory, split=args.split,
+            retries=args.retries, profile_top=args.profile_top, settle_seconds=args.settle, poll_interval=args.poll_interval,
+            recursive=not args.no_recursive, use_polling=args.poll
+        )
+        try:
+            daemon.run()
+        except KeyboardInterrupt:
+            logger.info("Nhận Ctrl+C, đang dừng...")
+        return 0
+
+    if args.command == 'worker':
+        queue = SharedQueue(args.queue, lease_ttl=args.lease_ttl, settle_seconds=args.settle,
+                            output_folder=args.output)
+        engine = BatchEngine(None, args.workers, args.timeout, args.max_memory, args.split,
+                             retries=args.retries)
+        worker = QueueWorker(queue, engine, poll_interval=args.poll_interval,
+                             profile_top=args.profile_top)
+        try:
+            worker.run()
+        except KeyboardInterrupt:
+            logger.info("Nhận Ctrl+C, đang dừng...")
+        return 0
+
+    files = collect_files(args.inputs)
+    logger.info(f"🚀 BẮT ĐẦU CHUYỂN ĐỔI {len(files)} FILE")
+    journal = None if args.no_resume else open_journal()
+    with BatchEngine(args.output, args.workers, args.timeout, args.max_memory,
+                     args.split, journal=journal, retries=args.retries) as engine:
+        results = engine.convert_files(files)
+    if profiles:
+        write_report([r.profile for r in results], profiles, args.profile_top)
+    errors = sum(1 for r in results if not r.success)
+    logger.info(f"🎉 KẾT QUẢ: ✅ {len(results) - errors} | ❌ {errors}")
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,7 +10,8 @@ from pathlib import Path
 # Thêm src vào Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.converters.excel_to_pdf import convert_excel_to_pdf
+from src.converters.excel_to_pdf import convert_excel_stream, convert_excel_to_pdf, preview_excel
+from src.converters.output_split import configured_part_limits
 from src.interface.tkinter_ui import create_app
 from src.logging.logger_setup import setup_logger
 
@@ -23,11 +24,15 @@ def main():
     
     # Cấu hình
     title = "Excel to PDF Converter"
-    file_types = [("Excel Files", "*.xlsx *.xls")]
-    patterns = ['*.xlsx', '*.xls']
+    file_types = [("Excel Files", "*.xlsx *.xls"), ("CSV / TSV", "*.csv *.tsv")]
+    patterns = ['*.xlsx', '*.xls', '*.csv', '*.tsv']
+    
+    # Chia phần (WORDTOPDF_PART_LIMITS) cần ghi thẳng ra file, không dựng trong bộ nhớ
+    stream_func = None if configured_part_limits() else convert_excel_stream
     
     # Tạo app
-    app = create_app(title, file_types, patterns, convert_excel_to_pdf)
+    app = create_app(title, file_types, patterns, convert_excel_to_pdf, preview_excel,
+                     stream_func)
     
     # Chạy
     logger.info("Ứng dụng đã sẵn sàng")
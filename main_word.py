@@ -10,7 +10,7 @@ from pathlib import Path
 # Thêm src vào Python path
 sys.path.insert(0, str(Path(__file__).parent))
 
-from src.converters.word_to_pdf import convert_word_to_pdf
+from src.converters.word_to_pdf import convert_word_stream, convert_word_to_pdf, preview_word
 from src.interface.tkinter_ui import create_app
 from src.logging.logger_setup import setup_logger
 
@@ -27,7 +27,8 @@ def main():
     patterns = ['*.docx', '*.doc']
     
     # Tạo app
-    app = create_app(title, file_types, patterns, convert_word_to_pdf)
+    app = create_app(title, file_types, patterns, convert_word_to_pdf, preview_word,
+                     convert_word_stream)
     
     # Chạy
     logger.info("Ứng dụng đã sẵn sàng")
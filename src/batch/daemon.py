@@ -0,0 +1,98 @@
+"""
+Watch-folder daemon - tự động chuyển đổi file được thả vào thư mục
+"""
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from ..logging.logger_setup import get_logger
+from ..logging.profiler import DEFAULT_TOP, profile_folder, write_report
+from ..io.folder_watcher import FolderWatcher
+from ..io.preflight import preflight
+from .engine import BatchEngine, CONVERTERS
+
+logger = get_logger(__name__)
+
+
+class WatchDaemon:
+    """Kết nối FolderWatcher với BatchEngine"""
+
+    def __init__(self, folders: Iterable[Path], output_folder: Optional[Path] = None,
+                 max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 memory_limit_mb: Optional[int] = None, split: int = 1,
+                 retries: int = 0, profile_top: int = DEFAULT_TOP, settle_seconds: float = 2.0,
+                 poll_interval: float = 2.0, recursive: bool = True,
+                 use_polling: bool = False):
+        """
+        Args:
+            folders: Các thư mục cần theo dõi
+            output_folder: Thư mục lưu PDF (None = cùng thư mục file gốc)
+            max_workers: Số worker process
+            timeout: Thời gian tối đa mỗi file (giây), None = không giới hạn
+            memory_limit_mb: RSS tối đa mỗi worker (MB), None = không giới hạn
+            split: Số process dựng song song các phần của một file (1 = tuần tự)
+            retries: Số lần thử lại file lỗi (chờ tăng dần giữa các lần)
+            profile_top: Số hàm trong báo cáo hotspot khi dừng (nếu bật profiling)
+            settle_seconds: Thời gian file phải đứng yên trước khi chuyển đổi
+            poll_interval: Chu kỳ quét khi dùng polling
+            recursive: Theo dõi cả thư mục con
+            use_polling: Bắt buộc dùng polling thay vì inotify
+        """
+        self.engine = BatchEngine(output_folder, max_workers, timeout, memory_limit_mb, split,
+                                  retries=retries)
+        patterns = [f"*{ext}" for ext in CONVERTERS]
+        self.watcher = FolderWatcher(
+            folders, patterns, self._on_ready,
+            settle_seconds=settle_seconds, poll_interval=poll_interval,
+            recursive=recursive, use_polling=use_polling
+        )
+        self.success = self.error = 0
+        self.profile_top = profile_top
+        self.profiles: List[Path] = []
+
+    def run(self):
+        """Chạy daemon (block cho đến khi stop() hoặc Ctrl+C)"""
+        try:
+            self.watcher.run()
+        finally:
+            logger.info("Đang chờ các job còn lại...")
+            self.engine.shutdown(wait=True)
+            logger.info(f"🎉 KẾT QUẢ: ✅ {self.success} | ❌ {self.error}")
+            folder = profile_folder()
+            if folder:
+                write_report(self.profiles, folder, self.profile_top)
+
+    def stop(self):
+        """Dừng daemon"""
+        self.watcher.stop()
+
+    def _on_ready(self, paths: List[Path]):
+        """Đưa các file đã ổn định vào batch engine (bỏ qua file có PDF mới hơn)"""
+        for path in paths:
+            if self.engine.is_up_to_date(path):
+                logger.debug(f"Bỏ qua (PDF đã mới nhất): {path}")
+                continue
+            check = preflight(path)
+            if not check.ok:
+                logger.error(f"   ❌ {path.name}: {check.error}")
+                self.error += 1
+                continue
+            logger.info(f"⏳ Đang xử lý: {path.name}")
+            self.engine.submit(path, check.kind, check).add_done_callback(self._on_done)
+
+    def _on_done(self, future: Future):
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Worker lỗi: {e}", exc_info=True)
+            self.error += 1
+            return
+        if result.profile:
+            self.profiles.append(result.profile)
+        if result.success:
+            logger.info(f"   ✅ {result.input_path.name} → {result.output_path.name} "
+                        f"({result.duration:.1f}s)")
+            self.success += 1
+        else:
+            logger.error(f"   ❌ {result.input_path.name}: {result.error}")
+            self.error += 1
@@ -0,0 +1,404 @@
+"""
+Batch engine - chuyển đổi nhiều file song song bằng process pool
+"""
+import importlib
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from ..logging.logger_setup import get_logger
+from ..logging.memory_tracker import peak_memory, reset_peak_memory, track_memory
+from ..logging.profiler import profile_conversion
+from ..io.file_handler import FileHandler
+from ..io.preflight import PreflightResult, preflight
+from .journal import JobJournal, JobRef, batch_key, retry_delay, worker_journal
+from .metrics import DurationModel, MetricsStore, format_duration, open_metrics
+from .worker_pool import SupervisedPool
+
+logger = get_logger(__name__)
+
+
+# Extension -> (module, hàm converter). Import lazy để worker chỉ nạp converter cần dùng
+# (.doc chỉ nhận khi thực chất là .docx bị đổi đuôi, pre-flight loại .doc đời cũ)
+CONVERTERS: Dict[str, Tuple[str, str]] = {
+    '.docx': ('src.converters.word_to_pdf', 'convert_word_to_pdf'),
+    '.doc': ('src.converters.word_to_pdf', 'convert_word_to_pdf'),
+    '.xlsx': ('src.converters.excel_to_pdf', 'convert_excel_to_pdf'),
+    '.xls': ('src.converters.excel_to_pdf', 'convert_excel_to_pdf'),
+    '.csv': ('src.converters.excel_to_pdf', 'convert_excel_to_pdf'),
+    '.tsv': ('src.converters.excel_to_pdf', 'convert_excel_to_pdf'),
+}
+
+# Định dạng mà converter dựng được song song từng phần (tham số workers)
+SPLIT_KINDS = {'.docx', '.doc', '.xlsx', '.xls'}
+
+
+def get_converter(input_path: Path, kind: Optional[str] = None) -> Callable:
+    """
+    Lấy hàm converter theo định dạng của file
+
+    Args:
+        input_path: Đường dẫn file input
+        kind: Định dạng thật do pre-flight xác định (None = theo extension)
+
+    Returns:
+        Callable: Hàm (input_path, output_path) -> Path
+
+    Raises:
+        ValueError: Extension không được hỗ trợ
+    """
+    suffix = kind or input_path.suffix.lower()
+    if suffix not in CONVERTERS:
+        raise ValueError(f"Không hỗ trợ định dạng: {suffix}")
+    module_name, func_name = CONVERTERS[suffix]
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+@dataclass
+class ConversionResult:
+    """Kết quả chuyển đổi một file"""
+    input_path: Path
+    output_path: Optional[Path]
+    success: bool
+    error: Optional[str] = None
+    duration: float = 0.0
+    peak_memory: int = 0  # byte, RSS đỉnh của worker trong lúc chuyển đổi
+    attempts: int = 1
+    profile: Optional[Path] = None  # file .pstats nếu đang bật profiling
+
+
+def _journal_write(job: JobRef, method: str, *args):
+    """Ghi trạng thái job vào journal từ worker, lỗi journal không làm hỏng job"""
+    try:
+        getattr(worker_journal(job), method)(job.batch_id, job.input_path, *args)
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Không ghi được journal: {e}")
+
+
+def run_conversion(input_path: Path, output_path: Path, kind: Optional[str] = None,
+                   split: int = 1, job: Optional[JobRef] = None) -> ConversionResult:
+    """
+    Chuyển đổi một file (chạy trong worker process)
+
+    Args:
+        input_path: Đường dẫn file input
+        output_path: Đường dẫn file PDF output
+        kind: Định dạng thật do pre-flight xác định (None = theo extension)
+        split: Số process dựng các phần của file song song (1 = tuần tự)
+        job: Job trong journal, worker tự ghi trạng thái running / done
+
+    Returns:
+        ConversionResult: Kết quả, lỗi được bắt lại thay vì raise
+    """
+    if job is not None:
+        _journal_write(job, 'mark_running')
+    reset_peak_memory()
+    start = time.perf_counter()
+    profile = None
+    try:
+        convert = get_converter(input_path, kind)
+        with profile_conversion(input_path) as profile, track_memory(input_path) as tracker:
+            if split != 1 and (kind or input_path.suffix.lower()) in SPLIT_KINDS:
+                result = convert(input_path, output_path, workers=split)
+            else:
+                result = convert(input_path, output_path)
+        duration = time.perf_counter() - start
+        # Tracker đặt lại mức đỉnh sau mỗi giai đoạn nên lấy đỉnh từ tracker
+        peak = tracker.peak_rss if tracker else peak_memory()
+        if job is not None:
+            _journal_write(job, 'mark_done', FileHandler.file_hash(result))
+        return ConversionResult(input_path, result, True, duration=duration,
+                                peak_memory=peak, profile=profile)
+    except Exception as e:
+        logger.error(f"Lỗi chuyển đổi {input_path}: {e}", exc_info=True)
+        return ConversionResult(input_path, output_path, False, str(e),
+                                time.perf_counter() - start, profile=profile)
+
+
+class BatchEngine:
+    """Chạy các job chuyển đổi song song trên nhiều CPU"""
+
+    def __init__(self, output_folder: Optional[Path] = None,
+                 max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 memory_limit_mb: Optional[int] = None, split: int = 1,
+                 metrics: Optional[MetricsStore] = None,
+                 journal: Optional[JobJournal] = None, retries: int = 0):
+        """
+        Args:
+            output_folder: Thư mục lưu PDF (None = cùng thư mục file gốc)
+            max_workers: Số worker process (None = số CPU)
+            timeout: Thời gian tối đa mỗi file (giây), None = không giới hạn
+            memory_limit_mb: RSS tối đa mỗi worker (MB), None = không giới hạn
+            split: Số process dựng song song các phần (sheet, chương) của một file
+                (1 = tuần tự, 0 = số CPU). Nên dùng khi batch ít file mà mỗi file lớn.
+            metrics: Lịch sử chuyển đổi để dự đoán thời gian (None = store mặc định)
+            journal: Journal job để convert_files tiếp tục được batch bị gián đoạn
+                (None = không ghi journal)
+            retries: Số lần thử lại job lỗi (chờ tăng dần giữa các lần)
+        """
+        self.output_folder = output_folder
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout or None
+        self.memory_limit_mb = memory_limit_mb or None
+        self.split = split
+        self.metrics = metrics if metrics is not None else open_metrics()
+        self.model = DurationModel(self.metrics)
+        self.journal = journal
+        self.retries = max(0, retries)
+        self._executor: Optional[SupervisedPool] = None
+        # Job lỗi đang chờ thử lại: timer -> hàm trả kết quả lỗi nếu engine dừng trước
+        self._waiting: Dict[threading.Timer, Callable[[], None]] = {}
+        self._waiting_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    @property
+    def executor(self) -> SupervisedPool:
+        """Process pool có giám sát timeout/bộ nhớ, tạo khi có job đầu tiên"""
+        if self._executor is None:
+            memory_limit = self.memory_limit_mb * 1024 ** 2 if self.memory_limit_mb else None
+            self._executor = SupervisedPool(self.max_workers, self.timeout, memory_limit)
+            limits = []
+            if self.timeout:
+                limits.append(f"timeout {self.timeout:g}s")
+            if self.memory_limit_mb:
+                limits.append(f"bộ nhớ {self.memory_limit_mb}MB")
+            logger.info(f"Khởi tạo {self.max_workers} worker"
+                        + (f" ({', '.join(limits)})" if limits else ""))
+        return self._executor
+
+    def output_path_for(self, input_path: Path) -> Path:
+        """Đường dẫn PDF output cho một file input"""
+        return FileHandler.ensure_output_path(None, input_path, self.output_folder)
+
+    def is_up_to_date(self, input_path: Path) -> bool:
+        """
+        Kiểm tra PDF output đã mới hơn file input chưa (bỏ qua convert lại)
+
+        Args:
+            input_path: Đường dẫn file input
+
+        Returns:
+            bool: True nếu PDF đã tồn tại và không cũ hơn file input
+        """
+        output_path = self.output_path_for(input_path)
+        try:
+            return output_path.stat().st_mtime_ns >= input_path.stat().st_mtime_ns
+        except OSError:
+            return False
+
+    def submit(self, input_path: Path, kind: Optional[str] = None,
+               check: Optional[PreflightResult] = None, job: Optional[JobRef] = None,
+               output_path: Optional[Path] = None) -> Future:
+        """
+        Đưa một file vào hàng đợi chuyển đổi
+
+        Job lỗi được thử lại tối đa self.retries lần, lần sau chờ lâu gấp đôi lần trước.
+
+        Args:
+            input_path: Đường dẫn file input
+            kind: Định dạng thật do pre-flight xác định (None = theo extension)
+            check: Kết quả pre-flight, có thì lần chuyển đổi thành công được ghi
+                vào lịch sử để dự đoán thời gian
+            job: Job trong journal (worker ghi running/done, engine ghi các lần lỗi)
+            output_path: File PDF output (None = theo output_folder của engine)
+
+        Returns:
+            Future: Future trả về ConversionResult (kể cả khi worker bị kill)
+        """
+        output_path = output_path or self.output_path_for(input_path)
+        result = Future()
+        attempts = 0
+
+        def _start():
+            try:
+                task = self.executor.submit(run_conversion, input_path, output_path,
+                                            kind, self.split, job)
+            except RuntimeError as e:  # pool đã dừng trong lúc chờ thử lại
+                result.set_result(ConversionResult(input_path, output_path, False, str(e),
+                                                   attempts=attempts))
+                return
+            task.add_done_callback(_done)
+
+        # Job bị kill (quá thời gian, vượt bộ nhớ, worker crash) vẫn trả về
+        # ConversionResult lỗi như các lỗi chuyển đổi thông thường
+        def _done(task: Future):
+            nonlocal attempts
+            if task.cancelled():
+                result.cancel()
+                result.set_running_or_notify_cancel()
+                return
+            attempts += 1
+            error = task.exception()
+            if error is None:
+                conversion = task.result()
+            else:
+                conversion = ConversionResult(input_path, output_path, False, str(error),
+                                              getattr(error, 'duration', 0.0))
+            conversion.attempts = attempts
+            if conversion.success:
+                self._record(check, conversion)
+                result.set_result(conversion)
+                return
+
+            retry = attempts <= self.retries
+            delay = retry_delay(attempts) if retry else None
+            if job is not None and self.journal is not None:
+                try:
+                    self.journal.mark_failed(job.batch_id, job.input_path, conversion.error,
+                                             time.time() + delay if retry else None)
+                except sqlite3.Error as e:
+                    logger.warning(f"Không ghi được journal: {e}")
+            if not retry:
+                result.set_result(conversion)
+                return
+            logger.warning(f"⚠️ {input_path.name} lỗi, thử lại sau {delay:g}s "
+                           f"(lần {attempts}/{self.retries})")
+            self._retry_later(delay, _start, lambda: result.set_result(conversion))
+
+        _start()
+        return result
+
+    def _retry_later(self, delay: float, start: Callable[[], None],
+                     give_up: Callable[[], None]):
+        """Chạy lại job sau delay giây (engine dừng trước thì trả kết quả lỗi)"""
+        def _fire():
+            with self._waiting_lock:
+                if self._waiting.pop(timer, None) is None:
+                    return  # shutdown đã xử lý
+            start()
+
+        timer = threading.Timer(delay, _fire)
+        timer.daemon = True
+        with self._waiting_lock:
+            self._waiting[timer] = give_up
+        timer.start()
+
+    def _record(self, check: Optional[PreflightResult], result: ConversionResult):
+        """Ghi lần chuyển đổi thành công vào lịch sử"""
+        if check is None or self.metrics is None or not result.success:
+            return
+        try:
+            self.metrics.record(check, result.duration, result.peak_memory)
+        except Exception as e:
+            logger.warning(f"Không ghi được lịch sử chuyển đổi: {e}")
+
+    def predict(self, check: PreflightResult) -> float:
+        """Thời gian chuyển đổi dự kiến của một file (giây)"""
+        return self.model.predict(check)
+
+    @staticmethod
+    def rejected(check: PreflightResult) -> ConversionResult:
+        """Kết quả lỗi cho file bị pre-flight loại (không tốn worker)"""
+        logger.error(f"Bỏ qua {check.path}: {check.error}")
+        return ConversionResult(check.path, None, False, check.error)
+
+    def convert_files(self, files: Iterable[Path],
+                      on_result: Optional[Callable[[ConversionResult], None]] = None
+                      ) -> List[ConversionResult]:
+        """
+        Chuyển đổi danh sách file và chờ tất cả hoàn tất
+
+        Args:
+            files: Danh sách file input
+            on_result: Callback gọi khi mỗi file xong (tùy chọn)
+
+        Returns:
+            List[ConversionResult]: Kết quả theo thứ tự hoàn thành
+        """
+        files = list(files)
+        results = []
+        accepted = []
+        for check in map(preflight, files):
+            if check.ok:
+                accepted.append(check)
+                continue
+            result = self.rejected(check)
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+        jobs = {}
+        batch_id = None
+        if self.journal is not None and accepted:
+            batch_id, accepted = self._open_batch(files, accepted, results, on_result)
+            jobs = {check.path: self.journal.ref(batch_id, check.path) for check in accepted}
+
+        # Job lâu chạy trước (LPT) theo thời gian dự đoán để file lớn không rơi
+        # vào cuối hàng đợi rồi kéo dài cả batch trong khi các worker khác đã rảnh
+        predicted = {check.path: self.predict(check) for check in accepted}
+        accepted.sort(key=lambda check: predicted[check.path], reverse=True)
+        remaining = sum(predicted.values())
+        if accepted:
+            logger.info(f"⏱️ Ước tính: ~{format_duration(self.eta(remaining))}")
+        futures = [self.submit(check.path, check.kind, check, jobs.get(check.path))
+                   for check in accepted]
+        failed = 0
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            results.append(result)
+            failed += not result.success
+            remaining -= predicted.get(result.input_path, 0.0)
+            if self.eta(remaining) >= 1 and done < len(futures):
+                logger.info(f"⏱️ Còn lại: ~{format_duration(self.eta(remaining))}")
+            if on_result:
+                on_result(result)
+        # Còn file lỗi thì giữ batch mở: chạy lại cùng lệnh chỉ làm lại các file đó
+        if batch_id is not None and not failed:
+            self.journal.finish_batch(batch_id)
+        return results
+
+    def _open_batch(self, files: List[Path], accepted: List[PreflightResult],
+                    results: List[ConversionResult],
+                    on_result: Optional[Callable[[ConversionResult], None]]
+                    ) -> Tuple[int, List[PreflightResult]]:
+        """
+        Ghi batch vào journal; batch dang dở cùng danh sách file thì bỏ qua các file đã xong
+
+        Returns:
+            Tuple[int, List[PreflightResult]]: (id batch, các file còn phải chuyển đổi)
+        """
+        batch_id, resumed = self.journal.open_batch(
+            batch_key(files, self.output_folder), 'cli',
+            [(check.path, self.output_path_for(check.path)) for check in accepted])
+        if not resumed:
+            return batch_id, accepted
+        completed = self.journal.completed(batch_id)
+        logger.info(f"♻️ Tiếp tục batch dang dở: {len(completed)}/{len(accepted)} file đã xong")
+        pending = []
+        for check in accepted:
+            if check.path.resolve() not in completed:
+                pending.append(check)
+                continue
+            result = ConversionResult(check.path, self.output_path_for(check.path), True,
+                                      attempts=0)
+            results.append(result)
+            if on_result:
+                on_result(result)
+        return batch_id, pending
+
+    def eta(self, work: float) -> float:
+        """Thời gian chờ cho một khối lượng (giây tuần tự) chia trên các worker"""
+        return work / self.max_workers
+
+    def shutdown(self, wait: bool = True):
+        """Dừng process pool (job đang chờ thử lại kết thúc với lỗi lần trước)"""
+        with self._waiting_lock:
+            waiting = list(self._waiting.items())
+            self._waiting.clear()
+        for timer, give_up in waiting:
+            timer.cancel()
+            give_up()
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
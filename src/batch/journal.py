@@ -0,0 +1,271 @@
+"""
+Journal các job chuyển đổi trong SQLite - tiếp tục batch bị gián đoạn
+
+Mỗi batch (danh sách file + thư mục output) được ghi lại cùng trạng thái từng
+file: queued -> running -> done (kèm SHA-256 của PDF) hoặc failed (kèm số lần
+thử và thời điểm được thử lại). App crash hay máy khởi động lại giữa chừng thì
+lần chạy sau với cùng batch chỉ chuyển đổi các file chưa xong. Journal dùng
+chế độ WAL: worker process ghi trực tiếp trạng thái của job mình mà không chặn
+nhau hay chặn người đọc, mỗi lần ghi chỉ là một transaction nhỏ.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from ..logging.logger_setup import get_logger
+from ..io.file_handler import FileHandler
+
+logger = get_logger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+# Thử lại job lỗi sau 5s, 10s, 20s... (tối đa 5 phút)
+RETRY_DELAY = 5.0
+MAX_RETRY_DELAY = 300.0
+_BUSY_TIMEOUT_MS = 10_000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    source TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS batches_open ON batches (key, finished_at);
+CREATE TABLE IF NOT EXISTS jobs (
+    batch_id INTEGER NOT NULL REFERENCES batches (id),
+    input_path TEXT NOT NULL,
+    output_path TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL,
+    input_size INTEGER,
+    input_mtime_ns INTEGER,
+    output_hash TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (batch_id, input_path)
+);
+"""
+
+
+class JobRef(NamedTuple):
+    """Job trong journal, gửi kèm job cho worker process (pickle được)"""
+    journal_path: str
+    batch_id: int
+    input_path: str
+
+
+def retry_delay(attempt: int) -> float:
+    """Thời gian chờ trước lần thử lại thứ attempt (1, 2, ...), tăng gấp đôi mỗi lần"""
+    return min(RETRY_DELAY * 2 ** max(attempt - 1, 0), MAX_RETRY_DELAY)
+
+
+def batch_key(files: Iterable[Path], output_folder: Optional[Path] = None) -> str:
+    """Định danh batch: cùng danh sách file và thư mục output thì cùng batch"""
+    digest = hashlib.sha1(str(Path(output_folder).resolve() if output_folder else '').encode())
+    for path in sorted({_key(f) for f in files}):
+        digest.update(b'\0' + path.encode())
+    return digest.hexdigest()
+
+
+def _key(path) -> str:
+    """Đường dẫn lưu trong journal (tuyệt đối, để chạy lại từ thư mục khác vẫn khớp)"""
+    return str(Path(path).resolve())
+
+
+def _fingerprint(path: Path) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None, None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class JobJournal:
+    """Trạng thái các batch và job chuyển đổi (dùng được từ nhiều thread và process)"""
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Args:
+            path: File SQLite (None = jobs.sqlite3 trong thư mục dữ liệu ứng dụng)
+        """
+        self.path = Path(path) if path else FileHandler.get_app_data_folder() / 'jobs.sqlite3'
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), timeout=_BUSY_TIMEOUT_MS / 1000,
+                                     check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        # WAL: người ghi không chặn người đọc; NORMAL chỉ fsync khi checkpoint
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA busy_timeout={_BUSY_TIMEOUT_MS}")
+        with self._lock, self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    def ref(self, batch_id: int, input_path: Path) -> JobRef:
+        """Tham chiếu job để worker tự ghi trạng thái"""
+        return JobRef(str(self.path), batch_id, _key(input_path))
+
+    def _write(self, sql: str, args: tuple = ()):
+        with self._lock, self._conn:
+            return self._conn.execute(sql, args)
+
+    # ------------------------------------------------------------------
+    # Batch
+    # ------------------------------------------------------------------
+
+    def open_batch(self, key: str, source: str, jobs: Iterable[Tuple[Path, Path]],
+                   supersede: bool = False) -> Tuple[int, bool]:
+        """
+        Mở batch mới, hoặc tiếp tục batch cùng key chưa hoàn tất
+
+        Args:
+            key: Định danh batch (batch_key)
+            source: Nơi tạo batch ('cli', 'ui')
+            jobs: Các cặp (input, output) của batch
+            supersede: Đóng các batch dang dở khác cùng source (giao diện chỉ có
+                một batch, batch mới thay batch cũ)
+
+        Returns:
+            Tuple[int, bool]: (id batch, True nếu là batch dang dở được tiếp tục)
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            if supersede:
+                self._conn.execute(
+                    "UPDATE batches SET finished_at = ? WHERE source = ? AND key != ?"
+                    " AND finished_at IS NULL", (now, source, key))
+            row = self._conn.execute(
+                "SELECT id FROM batches WHERE key = ? AND finished_at IS NULL"
+                " ORDER BY id DESC LIMIT 1", (key,)).fetchone()
+            resumed = row is not None
+            if resumed:
+                batch_id = row['id']
+            else:
+                batch_id = self._conn.execute(
+                    "INSERT INTO batches (key, source, created_at) VALUES (?, ?, ?)",
+                    (key, source, now)).lastrowid
+            rows = []
+            for input_path, output_path in jobs:
+                size, mtime_ns = _fingerprint(input_path)
+                rows.append((batch_id, _key(input_path), _key(output_path), QUEUED,
+                             size, mtime_ns, now))
+            # Job đã có (batch tiếp tục) giữ nguyên trạng thái
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO jobs (batch_id, input_path, output_path, state,"
+                " input_size, input_mtime_ns, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return batch_id, resumed
+
+    def finish_batch(self, batch_id: int):
+        """Đánh dấu batch đã chạy hết (lần chạy sau với cùng file là batch mới)"""
+        self._write("UPDATE batches SET finished_at = ? WHERE id = ?", (time.time(), batch_id))
+
+    def unfinished(self, source: str) -> Optional[Tuple[int, List[Path]]]:
+        """
+        Batch dang dở gần nhất của một source
+
+        Returns:
+            Optional[Tuple[int, List[Path]]]: (id batch, các file chưa xong), None nếu không có
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id FROM batches WHERE source = ? AND finished_at IS NULL"
+                " ORDER BY id DESC LIMIT 1", (source,)).fetchone()
+            if row is None:
+                return None
+            paths = [Path(r['input_path']) for r in self._conn.execute(
+                "SELECT input_path FROM jobs WHERE batch_id = ? AND state != ?"
+                " ORDER BY rowid", (row['id'], DONE))]
+        return row['id'], paths
+
+    # ------------------------------------------------------------------
+    # Job
+    # ------------------------------------------------------------------
+
+    def completed(self, batch_id: int) -> Set[Path]:
+        """
+        Các file của batch đã xong và vẫn còn nguyên: input không đổi kể từ khi
+        xếp hàng và PDF output vẫn đúng nội dung đã ghi (SHA-256)
+
+        Returns:
+            Set[Path]: Đường dẫn input (đã resolve)
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT input_path, output_path, input_size, input_mtime_ns, output_hash"
+                " FROM jobs WHERE batch_id = ? AND state = ?", (batch_id, DONE)).fetchall()
+        done = set()
+        for row in rows:
+            input_path = Path(row['input_path'])
+            if not row['output_hash'] or \
+                    _fingerprint(input_path) != (row['input_size'], row['input_mtime_ns']):
+                continue
+            try:
+                if FileHandler.file_hash(Path(row['output_path'])) == row['output_hash']:
+                    done.add(input_path)
+            except OSError:
+                continue
+        return done
+
+    def mark_running(self, batch_id: int, input_path: Path):
+        self._write("UPDATE jobs SET state = ?, updated_at = ? WHERE batch_id = ?"
+                    " AND input_path = ?", (RUNNING, time.time(), batch_id, _key(input_path)))
+
+    def mark_done(self, batch_id: int, input_path: Path, output_hash: Optional[str]):
+        self._write("UPDATE jobs SET state = ?, output_hash = ?, error = NULL,"
+                    " next_attempt_at = NULL, updated_at = ? WHERE batch_id = ?"
+                    " AND input_path = ?",
+                    (DONE, output_hash, time.time(), batch_id, _key(input_path)))
+
+    def mark_failed(self, batch_id: int, input_path: Path, error: Optional[str],
+                    retry_at: Optional[float] = None) -> int:
+        """
+        Ghi một lần thử thất bại
+
+        Args:
+            retry_at: Thời điểm (time.time()) sẽ thử lại, None = không thử lại nữa
+
+        Returns:
+            int: Tổng số lần đã thử thất bại
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, error = ?,"
+                " next_attempt_at = ?, updated_at = ? WHERE batch_id = ? AND input_path = ?",
+                (FAILED, error, retry_at, time.time(), batch_id, _key(input_path)))
+            row = self._conn.execute(
+                "SELECT attempts FROM jobs WHERE batch_id = ? AND input_path = ?",
+                (batch_id, _key(input_path))).fetchone()
+        return row['attempts'] if row else 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# Kết nối journal của worker process, mở một lần cho mọi job của worker
+_worker_journals: Dict[str, JobJournal] = {}
+
+
+def worker_journal(ref: JobRef) -> JobJournal:
+    """Journal dùng trong worker process (giữ kết nối giữa các job)"""
+    journal = _worker_journals.get(ref.journal_path)
+    if journal is None:
+        journal = _worker_journals[ref.journal_path] = JobJournal(Path(ref.journal_path))
+    return journal
+
+
+def open_journal() -> Optional[JobJournal]:
+    """Mở journal mặc định, None (kèm cảnh báo) nếu không ghi được thư mục dữ liệu"""
+    try:
+        return JobJournal()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Không mở được journal, batch sẽ không tiếp tục được khi bị gián đoạn: {e}")
+        return None
@@ -0,0 +1,216 @@
+"""
+Lịch sử chuyển đổi và mô hình dự đoán thời gian
+
+Mỗi lần chuyển đổi thành công được ghi vào SQLite (kích thước, số sheet/ô/
+paragraph từ pre-flight, thời gian, bộ nhớ đỉnh). DurationModel fit hồi quy
+tuyến tính (bình phương tối thiểu) theo từng định dạng trên các lần gần nhất;
+dự đoán dùng để sắp lịch (job lâu chạy trước) và hiển thị thời gian còn lại.
+Càng nhiều lần ghi, dự đoán càng sát.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from ..logging.logger_setup import get_logger
+from ..io.file_handler import FileHandler
+from ..io.preflight import PreflightResult
+
+logger = get_logger(__name__)
+
+# Số lần ghi gần nhất dùng để fit mỗi định dạng
+MAX_SAMPLES = 500
+# Chưa đủ dữ liệu: giây cho mỗi MB nội dung (cost của pre-flight)
+DEFAULT_SECONDS_PER_MB = 2.0
+MIN_DURATION = 0.05
+_RIDGE = 1e-3
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    id INTEGER PRIMARY KEY,
+    recorded_at REAL NOT NULL,
+    kind TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    sheet_count INTEGER,
+    cell_count INTEGER,
+    paragraph_count INTEGER,
+    image_bytes INTEGER NOT NULL DEFAULT 0,
+    cost REAL NOT NULL DEFAULT 0,
+    duration REAL NOT NULL,
+    peak_memory INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS conversions_kind ON conversions (kind, id);
+"""
+
+
+def format_duration(seconds: float) -> str:
+    """Hiển thị thời gian ngắn gọn: 45s, 3m20s, 1h05m"""
+    seconds = max(0, int(round(seconds)))
+    if seconds < 60:
+        return f"{seconds}s"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+class MetricsStore:
+    """Lịch sử chuyển đổi trong SQLite (dùng được từ nhiều thread)"""
+
+    def __init__(self, path: Optional[Path] = None):
+        """
+        Args:
+            path: File SQLite (None = metrics.sqlite3 trong thư mục dữ liệu ứng dụng)
+        """
+        self.path = Path(path) if path else FileHandler.get_app_data_folder() / 'metrics.sqlite3'
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(_SCHEMA)
+        self.version = 0  # tăng mỗi lần ghi để model biết phải fit lại
+
+    def record(self, check: PreflightResult, duration: float, peak_memory: int = 0):
+        """Ghi một lần chuyển đổi thành công"""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO conversions (recorded_at, kind, size, sheet_count, cell_count,"
+                " paragraph_count, image_bytes, cost, duration, peak_memory)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), check.kind or check.path.suffix.lower(), check.size,
+                 check.sheet_count, check.cell_count, check.paragraph_count,
+                 check.image_bytes, check.cost, duration, peak_memory))
+            self._conn.commit()
+            self.version += 1
+
+    def samples(self, kind: Optional[str] = None, limit: int = MAX_SAMPLES) -> List[sqlite3.Row]:
+        """Các lần ghi gần nhất (của một định dạng, hoặc tất cả)"""
+        query = ("SELECT size, sheet_count, cell_count, paragraph_count, image_bytes, cost,"
+                 " duration FROM conversions")
+        args: tuple = ()
+        if kind:
+            query += " WHERE kind = ?"
+            args = (kind,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            return self._conn.execute(query, args + (limit,)).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _features(size, sheet_count, cell_count, paragraph_count, image_bytes) -> List[float]:
+    """Biến hồi quy (đơn vị chọn để các hệ số cùng cỡ)"""
+    return [
+        1.0,
+        size / 1e6,
+        (cell_count or 0) / 1e5,
+        (paragraph_count or 0) / 1e3,
+        image_bytes / 1e6,
+        float(sheet_count or 0),
+    ]
+
+
+def _solve(matrix: List[List[float]], vector: List[float]) -> Optional[List[float]]:
+    """Giải hệ tuyến tính nhỏ bằng khử Gauss (chọn phần tử trội), None nếu suy biến"""
+    n = len(vector)
+    a = [row[:] + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for r in range(col + 1, n):
+            factor = a[r][col] / a[col][col]
+            if factor:
+                for c in range(col, n + 1):
+                    a[r][c] -= factor * a[col][c]
+    solution = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        solution[r] = (a[r][n] - sum(a[r][c] * solution[c] for c in range(r + 1, n))) / a[r][r]
+    return solution
+
+
+def fit_least_squares(rows: Sequence[Sequence[float]], targets: Sequence[float],
+                      ridge: float = _RIDGE) -> Optional[List[float]]:
+    """Hệ số hồi quy tuyến tính (phương trình chuẩn, thêm ridge để ổn định)"""
+    if not rows:
+        return None
+    n = len(rows[0])
+    xtx = [[0.0] * n for _ in range(n)]
+    xty = [0.0] * n
+    for x, y in zip(rows, targets):
+        for i in range(n):
+            xty[i] += x[i] * y
+            xi = x[i]
+            row = xtx[i]
+            for j in range(n):
+                row[j] += xi * x[j]
+    for i in range(1, n):  # không phạt hệ số tự do
+        xtx[i][i] += ridge
+    return _solve(xtx, xty)
+
+
+class DurationModel:
+    """Dự đoán thời gian chuyển đổi từ kết quả pre-flight"""
+
+    def __init__(self, store: Optional[MetricsStore] = None):
+        self.store = store
+        self._fits: Dict[Optional[str], Optional[List[float]]] = {}
+        self._rate = DEFAULT_SECONDS_PER_MB
+        self._version = -1
+
+    def predict(self, check: PreflightResult) -> float:
+        """Thời gian dự kiến (giây)"""
+        self._refresh()
+        kind = check.kind or check.path.suffix.lower()
+        coefficients = self._fit(kind)
+        if coefficients is not None:
+            x = _features(check.size, check.sheet_count, check.cell_count,
+                          check.paragraph_count, check.image_bytes)
+            estimate = sum(c * v for c, v in zip(coefficients, x))
+            if estimate > 0:
+                return max(estimate, MIN_DURATION)
+        # Chưa đủ dữ liệu cho định dạng này: theo khối lượng nội dung
+        return max(check.cost / 1e6 * self._rate, MIN_DURATION)
+
+    def _refresh(self):
+        """Bỏ các fit cũ khi store có bản ghi mới"""
+        if self.store is None or self.store.version == self._version:
+            return
+        self._version = self.store.version
+        self._fits.clear()
+        rates = sorted(r['duration'] / (r['cost'] / 1e6)
+                       for r in self._rows(None) if r['cost'] > 0)
+        self._rate = rates[len(rates) // 2] if rates else DEFAULT_SECONDS_PER_MB
+
+    def _fit(self, kind: str) -> Optional[List[float]]:
+        if self.store is None:
+            return None
+        if kind not in self._fits:
+            rows = self._rows(kind)
+            features = [_features(r['size'], r['sheet_count'], r['cell_count'],
+                                  r['paragraph_count'], r['image_bytes']) for r in rows]
+            # Cần nhiều mẫu hơn số biến, không thì chỉ nội suy được nhiễu
+            enough = len(rows) >= 2 * len(_features(0, 0, 0, 0, 0))
+            self._fits[kind] = fit_least_squares(
+                features, [r['duration'] for r in rows]) if enough else None
+        return self._fits[kind]
+
+    def _rows(self, kind: Optional[str]) -> List[sqlite3.Row]:
+        try:
+            return self.store.samples(kind)
+        except sqlite3.Error as e:
+            logger.warning(f"Không đọc được lịch sử chuyển đổi: {e}")
+            return []
+
+
+def open_metrics() -> Optional[MetricsStore]:
+    """Mở store mặc định, None (kèm cảnh báo) nếu không ghi được thư mục dữ liệu"""
+    try:
+        return MetricsStore()
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Không mở được lịch sử chuyển đổi, bỏ qua dự đoán thời gian: {e}")
+        return None
@@ -0,0 +1,426 @@
+"""
+Hàng đợi chung trên thư mục mạng - nhiều máy cùng chuyển đổi một batch
+
+Các máy mount cùng một share chạy `main_batch.py worker <thư mục>`; mỗi worker
+tự lấy file từ inbox/ bằng lease nên số máy tăng thì thông lượng tăng theo mà
+không file nào bị chuyển đổi hai lần:
+
+    inbox/    file cần chuyển đổi (thả / `main_batch.py enqueue` vào đây)
+    leases/   <file>.lease: worker đang giữ file (tạo bằng O_EXCL, chỉ một máy thắng)
+    work/     work/<token>/: PDF được dựng ở đây rồi mới publish
+    output/   PDF đã xong (đổi tên nguyên tử từ work/)
+    published/ <file>.json: SHA-256 file gốc + các PDF đã publish, giữ tới khi dọn xong
+    done/     file gốc đã chuyển đổi xong
+    failed/   file gốc bị lỗi kèm <file>.error.txt
+
+Worker giữ lease bằng cách cập nhật mtime của file lease (heartbeat). Máy khác
+coi lease hết hạn khi mtime không đổi trong lease_ttl giây tính theo đồng hồ của
+chính nó, nên không phụ thuộc đồng hồ giữa các máy. Lease hết hạn (worker chết,
+mất mạng) được cướp bằng rename - chỉ một máy rename thành công. Trước khi
+publish, worker kiểm tra token trong lease vẫn là của mình, worker mất lease bỏ
+kết quả; máy nhận lại file đã publish xong nhưng chưa kịp dọn (manifest trong
+published/ khớp nội dung file gốc và đủ các PDF) thì chỉ dọn.
+"""
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..logging.logger_setup import get_logger
+from ..logging.profiler import DEFAULT_TOP, profile_folder, write_report
+from ..io.file_handler import FileHandler
+from ..io.preflight import preflight
+from .engine import BatchEngine, CONVERTERS
+
+logger = get_logger(__name__)
+
+FOLDERS = ('inbox', 'leases', 'work', 'output', 'published', 'done', 'failed')
+LEASE_SUFFIX = '.lease'
+
+
+@dataclass
+class Lease:
+    """Lease của worker này trên một file trong inbox/"""
+    name: str
+    path: Path  # file lease
+    token: str
+    work_dir: Path
+    lost: bool = False  # bị máy khác cướp (heartbeat không tới kịp)
+
+
+class SharedQueue:
+    """Thao tác trên thư mục hàng đợi chung: nhận file, heartbeat, publish"""
+
+    def __init__(self, root: Path, lease_ttl: float = 60.0, settle_seconds: float = 2.0,
+                 output_folder: Optional[Path] = None):
+        """
+        Args:
+            root: Thư mục hàng đợi (trên share chung)
+            lease_ttl: Lease không được heartbeat trong chừng này giây thì hết hạn
+            settle_seconds: Thời gian file trong inbox phải đứng yên trước khi nhận
+            output_folder: Nơi publish PDF (None = <root>/output)
+        """
+        self.root = Path(root)
+        for name in FOLDERS:
+            (self.root / name).mkdir(parents=True, exist_ok=True)
+        self.inbox = self.root / 'inbox'
+        self.leases = self.root / 'leases'
+        self.manifests = self.root / 'published'
+        self.output = Path(output_folder) if output_folder else self.root / 'output'
+        self.output.mkdir(parents=True, exist_ok=True)
+        self.lease_ttl = lease_ttl
+        self.settle_seconds = settle_seconds
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+        self.held: Dict[str, Lease] = {}
+        self._held_lock = threading.Lock()
+        self._patterns = [f"*{ext}" for ext in CONVERTERS]
+        # Quan sát theo đồng hồ máy này: tên -> (chữ ký, lúc thấy chữ ký đó)
+        self._files: Dict[str, Tuple[Tuple[int, int], float]] = {}
+        self._leases: Dict[str, Tuple[int, float]] = {}
+
+    def ready_files(self) -> List[Path]:
+        """File trong inbox đã ghi xong và chưa có lease còn hạn, theo thứ tự thấy trước"""
+        now = time.monotonic()
+        seen = {}
+        try:
+            with os.scandir(self.inbox) as entries:
+                for entry in entries:
+                    path = Path(entry.path)
+                    if (not entry.is_file() or FileHandler.is_temp_file(path)
+                            or not FileHandler.matches_patterns(path, self._patterns)):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    sig = (st.st_size, st.st_mtime_ns)
+                    previous = self._files.get(entry.name)
+                    seen[entry.name] = previous if previous and previous[0] == sig else (sig, now)
+        except OSError as e:
+            logger.warning(f"Không đọc được {self.inbox}: {e}")
+            return []
+        self._files = seen
+
+        ready = []
+        for name, (_, since) in sorted(seen.items(), key=lambda item: item[1][1]):
+            if name in self.held or now - since < self.settle_seconds:
+                continue
+            if self._lease_alive(name):
+                continue
+            ready.append(self.inbox / name)
+        return ready
+
+    def _lease_path(self, name: str) -> Path:
+        return self.leases / (name + LEASE_SUFFIX)
+
+    def _lease_alive(self, name: str) -> bool:
+        """Có lease của máy khác còn hạn không (mtime đổi trong lease_ttl giây gần nhất)"""
+        try:
+            mtime = self._lease_path(name).stat().st_mtime_ns
+        except FileNotFoundError:
+            self._leases.pop(name, None)
+            return False
+        now = time.monotonic()
+        previous = self._leases.get(name)
+        if previous is None or previous[0] != mtime:
+            self._leases[name] = (mtime, now)
+            return True
+        return now - previous[1] < self.lease_ttl
+
+    def claim(self, path: Path) -> Optional[Lease]:
+        """
+        Nhận một file trong inbox
+
+        Args:
+            path: File trong inbox/
+
+        Returns:
+            Optional[Lease]: Lease nếu nhận được, None nếu máy khác đã giữ / đã xong
+        """
+        name = path.name
+        lease_path = self._lease_path(name)
+        if lease_path.exists():
+            if self._lease_alive(name) or not self._break_lease(name):
+                return None
+        token = uuid.uuid4().hex
+        try:
+            fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        except FileExistsError:
+            return None  # máy khác nhanh hơn
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump({'worker': self.worker_id, 'token': token, 'claimed': time.time()}, f)
+        lease = Lease(name, lease_path, token, self.root / 'work' / token)
+        if not path.exists():
+            # Worker trước đã xong file rồi mới xoá lease
+            self._remove(lease_path)
+            return None
+        lease.work_dir.mkdir(parents=True, exist_ok=True)
+        with self._held_lock:
+            self.held[name] = lease
+        return lease
+
+    def _break_lease(self, name: str) -> bool:
+        """Cướp lease hết hạn (rename: chỉ một máy thành công), dọn thư mục work/ của nó"""
+        lease_path = self._lease_path(name)
+        observed = self._leases.pop(name, None)
+        stale = lease_path.with_name(f"{lease_path.name}.{self.worker_id}.stale")
+        try:
+            os.rename(lease_path, stale)
+        except OSError:
+            return False  # máy khác đã cướp / worker cũ vừa xong
+        try:
+            if observed is not None and stale.stat().st_mtime_ns != observed[0]:
+                # Lease vừa được heartbeat / tạo mới sau lần quan sát cuối: trả lại
+                os.rename(stale, lease_path)
+                return False
+            with open(stale, encoding='utf-8') as f:
+                old = json.load(f)
+        except (OSError, ValueError):
+            old = {}
+        logger.warning(f"⚠️ Lease của {old.get('worker', '?')} trên {name} đã hết hạn, nhận lại")
+        if old.get('token'):
+            shutil.rmtree(self.root / 'work' / old['token'], ignore_errors=True)
+        self._remove(stale)
+        return True
+
+    def owns(self, lease: Lease) -> bool:
+        """Lease trên share còn đúng token của worker này không"""
+        try:
+            with open(lease.path, encoding='utf-8') as f:
+                return json.load(f).get('token') == lease.token
+        except (OSError, ValueError):
+            return False
+
+    def heartbeat(self):
+        """Gia hạn mọi lease đang giữ (cập nhật mtime file lease)"""
+        with self._held_lock:
+            leases = [lease for lease in self.held.values() if not lease.lost]
+        for lease in leases:
+            try:
+                if not self.owns(lease):
+                    raise FileNotFoundError(lease.path)
+                os.utime(lease.path)
+            except OSError:
+                lease.lost = True
+                logger.warning(f"⚠️ Mất lease {lease.name}, kết quả sẽ bị bỏ")
+
+    def output_path(self, lease: Lease) -> Path:
+        """PDF dựng tạm trong work/ của lease"""
+        return FileHandler.ensure_output_path(None, self.inbox / lease.name, lease.work_dir)
+
+    def _manifest_path(self, name: str) -> Path:
+        return self.manifests / (name + '.json')
+
+    def published(self, lease: Lease) -> bool:
+        """
+        File gốc này đã được publish (worker trước chết khi đang dọn): manifest
+        có cùng SHA-256 với file trong inbox và mọi PDF ghi trong đó (kể cả các
+        file .partNNN) còn trong output/
+        """
+        try:
+            with open(self._manifest_path(lease.name), encoding='utf-8') as f:
+                manifest = json.load(f)
+            if not all((self.output / name).exists() for name in manifest['outputs']):
+                return False
+            return manifest['sha256'] == FileHandler.file_hash(self.inbox / lease.name)
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+
+    def complete(self, lease: Lease) -> List[Path]:
+        """
+        Publish PDF (cả các file .partNNN) và chuyển file gốc sang done/
+
+        Returns:
+            List[Path]: Các file đã publish, rỗng nếu lease đã mất
+        """
+        if lease.lost or not self.owns(lease):
+            logger.warning(f"⚠️ Bỏ kết quả {lease.name}: lease đã thuộc worker khác")
+            self._drop(lease, keep_lease=True)
+            return []
+        source = self.inbox / lease.name
+        digest = FileHandler.file_hash(source)
+        published = []
+        for path in sorted(lease.work_dir.iterdir()):
+            target = self.output / path.name
+            os.replace(path, target)
+            published.append(target)
+        # Manifest ghi sau khi publish: có manifest khớp nội dung nghĩa là đã đủ PDF
+        manifest = self._manifest_path(lease.name)
+        temp = manifest.with_name(f".{manifest.name}.{lease.token}.tmp")
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'sha256': digest, 'token': lease.token, 'worker': self.worker_id,
+                       'outputs': [path.name for path in published]}, f)
+        os.replace(temp, manifest)
+        os.replace(source, self.root / 'done' / lease.name)
+        self._remove(manifest)
+        self._drop(lease)
+        return published
+
+    def finish_published(self, lease: Lease):
+        """Dọn file đã publish đủ (theo manifest) mà worker trước chưa kịp dọn"""
+        if lease.lost or not self.owns(lease):
+            self._drop(lease, keep_lease=True)
+            return
+        os.replace(self.inbox / lease.name, self.root / 'done' / lease.name)
+        self._remove(self._manifest_path(lease.name))
+        self._drop(lease)
+
+    def fail(self, lease: Lease, error: str):
+        """Chuyển file gốc sang failed/ kèm lý do"""
+        if not lease.lost and self.owns(lease):
+            failed = self.root / 'failed'
+            (failed / f"{lease.name}.error.txt").write_text(
+                f"{self.worker_id}: {error}\n", encoding='utf-8')
+            os.replace(self.inbox / lease.name, failed / lease.name)
+            self._drop(lease)
+        else:
+            self._drop(lease, keep_lease=True)
+
+    def release(self, lease: Lease):
+        """Trả file về hàng đợi chưa xử lý (VD: worker dừng trước khi chạy)"""
+        self._drop(lease, keep_lease=lease.lost or not self.owns(lease))
+
+    def _drop(self, lease: Lease, keep_lease: bool = False):
+        shutil.rmtree(lease.work_dir, ignore_errors=True)
+        if not keep_lease:
+            self._remove(lease.path)
+        with self._held_lock:
+            self.held.pop(lease.name, None)
+
+    @staticmethod
+    def _remove(path: Path):
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def enqueue(self, path: Path) -> Path:
+        """
+        Chép file vào inbox (chép vào tên tạm rồi đổi tên để worker không đọc file chép dở)
+
+        Returns:
+            Path: File trong inbox
+        """
+        path = Path(path)
+        target = self.inbox / path.name
+        temp = self.inbox / f".{path.name}.{uuid.uuid4().hex}.tmp"
+        # copyfile: file trong inbox mang thời điểm enqueue, không giữ mtime của file nguồn
+        shutil.copyfile(path, temp)
+        os.replace(temp, target)
+        return target
+
+
+class QueueWorker:
+    """Worker không giao diện: nhận file từ SharedQueue và chuyển đổi bằng BatchEngine"""
+
+    def __init__(self, queue: SharedQueue, engine: BatchEngine, poll_interval: float = 2.0,
+                 profile_top: int = DEFAULT_TOP):
+        """
+        Args:
+            queue: Hàng đợi chung
+            engine: Batch engine chạy chuyển đổi (mỗi worker process một file)
+            poll_interval: Chu kỳ quét inbox (giây)
+            profile_top: Số hàm trong báo cáo hotspot khi dừng (nếu bật profiling)
+        """
+        self.queue = queue
+        self.engine = engine
+        self.poll_interval = poll_interval
+        self.success = self.error = 0
+        self.profile_top = profile_top
+        self.profiles: List[Path] = []
+        self._active = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._idle = threading.Event()
+
+    def run(self):
+        """Nhận và chuyển đổi file cho đến khi stop() hoặc Ctrl+C"""
+        heartbeat = threading.Thread(target=self._heartbeat, daemon=True)
+        heartbeat.start()
+        logger.info(f"Worker {self.queue.worker_id} nhận file từ {self.queue.root} "
+                    f"({self.engine.max_workers} file cùng lúc)")
+        try:
+            while not self._stop.is_set():
+                self._claim()
+                self._stop.wait(self.poll_interval)
+        finally:
+            logger.info("Đang chờ các file đang chuyển đổi...")
+            self.engine.shutdown(wait=True)
+            self._idle.set()
+            heartbeat.join()
+            for lease in list(self.queue.held.values()):
+                self.queue.release(lease)
+            logger.info(f"🎉 KẾT QUẢ: ✅ {self.success} | ❌ {self.error}")
+            folder = profile_folder()
+            if folder:
+                write_report(self.profiles, folder, self.profile_top)
+
+    def stop(self):
+        """Dừng nhận file mới (file đang chạy vẫn được làm xong)"""
+        self._stop.set()
+
+    def _heartbeat(self):
+        # Chạy cả trong lúc chờ các file cuối cùng khi dừng
+        while not self._idle.wait(self.queue.lease_ttl / 3):
+            self.queue.heartbeat()
+
+    def _claim(self):
+        """Nhận tối đa số file bằng số worker còn rảnh, phần còn lại để cho máy khác"""
+        for path in self.queue.ready_files():
+            with self._lock:
+                if self._active >= self.engine.max_workers:
+                    return
+            lease = self.queue.claim(path)
+            if lease is None:
+                continue
+            if self.queue.published(lease):
+                logger.info(f"♻️ {lease.name} đã có PDF, chỉ dọn hàng đợi")
+                self.queue.finish_published(lease)
+                continue
+            check = preflight(path)
+            if not check.ok:
+                logger.error(f"   ❌ {path.name}: {check.error}")
+                self.queue.fail(lease, check.error)
+                self.error += 1
+                continue
+            logger.info(f"⏳ Đang xử lý: {path.name}")
+            with self._lock:
+                self._active += 1
+            future = self.engine.submit(path, check.kind, check,
+                                        output_path=self.queue.output_path(lease))
+            future.add_done_callback(lambda f, lease=lease: self._on_done(lease, f))
+
+    def _on_done(self, lease: Lease, future: Future):
+        with self._lock:
+            self._active -= 1
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Worker lỗi: {e}", exc_info=True)
+            self.queue.release(lease)
+            self.error += 1
+            return
+        if result.profile:
+            self.profiles.append(result.profile)
+        try:
+            if result.success:
+                published = self.queue.complete(lease)
+                if published:
+                    logger.info(f"   ✅ {lease.name} → {published[0].name} "
+                                f"({result.duration:.1f}s)")
+                    self.success += 1
+            else:
+                logger.error(f"   ❌ {lease.name}: {result.error}")
+                self.queue.fail(lease, result.error)
+                self.error += 1
+        except OSError as e:
+            logger.error(f"Không publish được {lease.name}: {e}")
+            self.queue.release(lease)
+            self.error += 1
@@ -0,0 +1,320 @@
+"""
+Process pool có giám sát: giới hạn thời gian và bộ nhớ cho từng job
+
+ProcessPoolExecutor không dừng được một job đang chạy, một file lỗi làm
+_create_table/doc.build chạy hàng giờ hay ăn hết RAM sẽ giữ worker mãi. Ở đây
+mỗi worker là một process riêng nói chuyện qua Pipe; thread giám sát kill
+worker quá thời gian hoặc vượt RSS, báo job thất bại và tạo worker mới thay thế.
+"""
+import atexit
+import itertools
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait
+from typing import Callable, Deque, List, Optional, Tuple
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+# Chu kỳ worker rảnh kiểm tra process cha còn sống (giây)
+_PARENT_CHECK_INTERVAL = 2.0
+
+# Worker không phải daemon (converter còn tạo process con dựng fragment) nên
+# phải tự kill khi thoát chương trình, nếu không multiprocessing sẽ chờ chúng mãi
+_live_pools: "weakref.WeakSet[SupervisedPool]" = weakref.WeakSet()
+
+
+@atexit.register
+def _kill_live_workers():
+    for pool in list(_live_pools):
+        for worker in list(pool._workers):
+            worker.kill()
+
+
+class WorkerError(RuntimeError):
+    """Job không hoàn thành vì worker bị dừng (quá thời gian, vượt bộ nhớ, crash)"""
+
+    def __init__(self, message: str, duration: float = 0.0):
+        super().__init__(message)
+        self.duration = duration
+
+
+def _rss_bytes(pid: int) -> Optional[int]:
+    """RSS hiện tại của process (Linux /proc), None nếu không đọc được"""
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _apply_address_space_limit(limit: Optional[int]):
+    """Giới hạn cứng vùng nhớ ảo của worker (chỉ Unix), vượt thì MemoryError"""
+    if not limit:
+        return
+    try:
+        import resource
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    except (ImportError, ValueError, OSError) as e:
+        logger.debug(f"Không đặt được RLIMIT_AS: {e}")
+
+
+def _worker_main(conn, address_space_limit: Optional[int]):
+    """Vòng lặp của worker process: nhận (job_id, fn, args), trả (job_id, ok, value)"""
+    if hasattr(os, 'setpgrp'):
+        # Nhóm process riêng: kill worker thì kill luôn các process con của job
+        os.setpgrp()
+    _apply_address_space_limit(address_space_limit)
+    parent = os.getppid()
+    while True:
+        try:
+            # Worker fork giữ cả đầu Pipe của process cha nên cha bị kill (crash,
+            # SIGKILL) thì recv() không bao giờ nhận EOF: tự kiểm tra cha còn sống
+            while not conn.poll(_PARENT_CHECK_INTERVAL):
+                if os.getppid() != parent:
+                    return
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+        job_id, fn, args = message
+        try:
+            reply = (job_id, True, fn(*args))
+        except BaseException as e:
+            reply = (job_id, False, WorkerError(f"{type(e).__name__}: {e}"))
+        try:
+            conn.send(reply)
+        except Exception as e:
+            conn.send((job_id, False, WorkerError(f"Không gửi được kết quả: {e}")))
+
+
+class _Worker:
+    """Một worker process và job nó đang chạy"""
+
+    def __init__(self, ctx, address_space_limit: Optional[int]):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main,
+                                   args=(child_conn, address_space_limit))
+        self.process.start()
+        child_conn.close()
+        self.job: Optional[Tuple[int, Future]] = None
+        self.started = 0.0
+
+    def kill(self):
+        if hasattr(os, 'killpg'):
+            try:
+                os.killpg(self.process.pid, signal.SIGKILL)
+            except OSError:
+                pass  # worker chưa kịp tạo nhóm process hoặc đã thoát
+        try:
+            self.process.kill()
+            self.process.join(1)
+        except Exception:
+            pass
+        self.conn.close()
+
+
+class SupervisedPool:
+    """
+    Pool worker process với timeout và giới hạn bộ nhớ cho từng job
+
+    Dùng như Executor: submit(fn, *args) -> Future. Job bị kill thì Future
+    kết thúc bằng WorkerError, pool tự tạo worker mới và chạy tiếp hàng đợi.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, timeout: Optional[float] = None,
+                 memory_limit: Optional[int] = None, poll_interval: float = 0.5):
+        """
+        Args:
+            max_workers: Số worker process (None = số CPU)
+            timeout: Thời gian tối đa mỗi job (giây), None = không giới hạn
+            memory_limit: RSS tối đa mỗi worker (byte), None = không giới hạn.
+                Vùng nhớ ảo (RLIMIT_AS) được chặn cứng ở 2 lần mức này để một lần
+                cấp phát đột biến giữa hai lần kiểm tra báo MemoryError ngay.
+            poll_interval: Chu kỳ kiểm tra timeout/RSS (giây)
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.poll_interval = poll_interval
+        self._address_space_limit = memory_limit * 2 if memory_limit else None
+
+        self._ctx = multiprocessing.get_context()
+        self._pending: Deque[Tuple[int, Future, Callable, tuple]] = deque()
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._shutdown = False
+        self._wake_reader, self._wake_writer = self._ctx.Pipe(duplex=False)
+        self._workers: List[_Worker] = []
+        _live_pools.add(self)
+        self._thread = threading.Thread(target=self._supervise, name='worker-pool', daemon=True)
+        self._thread.start()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """Đưa job vào hàng đợi (fn và args phải pickle được)"""
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Pool đã dừng")
+            self._pending.append((next(self._ids), future, fn, args))
+        self._wake()
+        return future
+
+    def shutdown(self, wait: bool = True):
+        """
+        Dừng pool
+
+        Args:
+            wait: True = chờ mọi job trong hàng đợi chạy xong,
+                False = huỷ các job chưa chạy (job đang chạy vẫn chạy nốt)
+        """
+        with self._lock:
+            self._shutdown = True
+            if not wait:
+                while self._pending:
+                    self._pending.popleft()[1].cancel()
+        self._wake()
+        if wait:
+            self._thread.join()
+
+    def _wake(self):
+        try:
+            self._wake_writer.send_bytes(b'')
+        except OSError:
+            pass
+
+    # ------------------------------------------------------------------
+    # Thread giám sát
+    # ------------------------------------------------------------------
+
+    def _supervise(self):
+        try:
+            while True:
+                self._dispatch()
+                busy = [w for w in self._workers if w.job is not None]
+                with self._lock:
+                    if self._shutdown and not self._pending and not busy:
+                        break
+
+                waitables = [self._wake_reader]
+                for worker in self._workers:
+                    waitables.append(worker.process.sentinel)
+                    if worker.job is not None:
+                        waitables.append(worker.conn)
+                has_limits = busy and (self.timeout or self.memory_limit)
+                ready = wait(waitables, self.poll_interval if has_limits else None)
+
+                if self._wake_reader in ready:
+                    while self._wake_reader.poll():
+                        self._wake_reader.recv_bytes()
+                for worker in list(self._workers):
+                    if worker.job is not None and worker.conn in ready:
+                        self._collect(worker)
+                    if worker.process.sentinel in ready and not worker.process.is_alive():
+                        self._replace(worker, "Worker dừng đột ngột "
+                                              f"(exit code {worker.process.exitcode})")
+                self._check_limits()
+        except Exception as e:
+            logger.error(f"Lỗi thread giám sát worker: {e}", exc_info=True)
+        finally:
+            self._stop_workers()
+
+    def _dispatch(self):
+        """Giao job trong hàng đợi cho các worker rảnh (tạo worker nếu còn thiếu)"""
+        while True:
+            worker = next((w for w in self._workers if w.job is None), None)
+            if worker is None and len(self._workers) < self.max_workers:
+                with self._lock:
+                    if not self._pending:
+                        return
+                worker = _Worker(self._ctx, self._address_space_limit)
+                self._workers.append(worker)
+            if worker is None:
+                return
+            with self._lock:
+                if not self._pending:
+                    return
+                job_id, future, fn, args = self._pending.popleft()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                worker.conn.send((job_id, fn, args))
+            except Exception as e:
+                future.set_exception(WorkerError(f"Không gửi được job cho worker: {e}"))
+                self._replace(worker, None)
+                continue
+            worker.job = (job_id, future)
+            worker.started = time.monotonic()
+
+    def _collect(self, worker: _Worker):
+        """Nhận kết quả job từ worker"""
+        try:
+            job_id, ok, value = worker.conn.recv()
+        except (EOFError, OSError):
+            return  # worker chết, sentinel sẽ xử lý
+        current_id, future = worker.job
+        worker.job = None
+        if job_id != current_id:
+            return
+        if ok:
+            future.set_result(value)
+        else:
+            future.set_exception(value)
+
+    def _check_limits(self):
+        """Kill worker có job quá thời gian hoặc vượt RSS"""
+        now = time.monotonic()
+        for worker in list(self._workers):
+            if worker.job is None:
+                continue
+            elapsed = now - worker.started
+            if self.timeout and elapsed > self.timeout:
+                self._replace(worker, f"Quá thời gian cho phép ({self.timeout:g}s)")
+                continue
+            if self.memory_limit:
+                rss = _rss_bytes(worker.process.pid)
+                if rss is not None and rss > self.memory_limit:
+                    self._replace(worker, f"Vượt giới hạn bộ nhớ "
+                                          f"({rss / 1024 ** 2:.0f}MB > "
+                                          f"{self.memory_limit / 1024 ** 2:.0f}MB)")
+
+    def _replace(self, worker: _Worker, reason: Optional[str]):
+        """Kill worker, báo lỗi job của nó (nếu có) và bỏ khỏi pool"""
+        job = worker.job
+        elapsed = time.monotonic() - worker.started if job else 0.0
+        worker.job = None
+        worker.kill()
+        if worker in self._workers:
+            self._workers.remove(worker)
+        if job is not None and reason:
+            logger.warning(f"Kill worker pid {worker.process.pid}: {reason}")
+            job[1].set_exception(WorkerError(reason, elapsed))
+
+    def _stop_workers(self):
+        for worker in self._workers:
+            try:
+                worker.conn.send(None)
+            except Exception:
+                pass
+        for worker in self._workers:
+            worker.process.join(2)
+            if worker.process.is_alive():
+                worker.kill()
+            else:
+                worker.conn.close()
+        self._workers.clear()
+        with self._lock:
+            while self._pending:
+                self._pending.popleft()[1].cancel()
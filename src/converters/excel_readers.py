@@ -0,0 +1,384 @@
+"""
+Đọc workbook Excel qua nhiều backend: openpyxl (.xlsx), xlrd (.xls) và csv (.csv/.tsv)
+
+Converter chỉ làm việc với SheetData. Mỗi dòng là list ô có cùng thuộc tính
+như ô openpyxl (value, has_style, style_id, number_format) nên file .xls đi
+chung pipeline dòng với .xlsx. CSV không có định dạng ô nên dòng là list chuỗi
+(SheetData.plain), converter bỏ qua bước style/number format. Sheet được nạp
+khi cần và giải phóng ngay khi converter chuyển sang sheet kế tiếp.
+"""
+import csv
+import datetime
+import io
+import unicodedata
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, NamedTuple, Sequence, Union
+
+from ..logging.logger_setup import get_logger
+from ..io.file_handler import FileHandler
+from ..io.memory_io import peek, stream_buffer
+from .excel_styles import ExcelStyleCache, XlrdStyleCache
+from .number_format import EXCEL_EPOCH
+from .spans import SpanIndex
+
+logger = get_logger(__name__)
+
+# File trên đĩa hoặc stream nhị phân seek được (memory_io.open_input)
+WorkbookSource = Union[Path, BinaryIO]
+
+# Chữ ký file OLE2 (định dạng BIFF .xls đời cũ)
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP_MAGIC = b'PK'
+EXCEL_EPOCH_1904 = datetime.datetime(1904, 1, 1)
+
+CSV_SUFFIXES = ('.csv', '.tsv')
+# Phần đầu file dùng để đoán encoding và ký tự phân cách
+_CSV_SAMPLE_BYTES = 64 * 1024
+
+
+class SheetData(NamedTuple):
+    """Một sheet đã mở: tên, các dòng ô (đọc dần) và vùng gộp ô"""
+    name: str
+    rows: Iterable[Sequence]
+    spans: SpanIndex
+    plain: bool = False  # dòng là list chuỗi hiển thị sẵn, không có style (CSV)
+
+
+class WorkbookReader(ABC):
+    """Giao diện chung của các backend đọc workbook"""
+
+    epoch: datetime.datetime = EXCEL_EPOCH
+
+    @property
+    @abstractmethod
+    def sheet_names(self) -> List[str]:
+        """Tên các sheet theo thứ tự"""
+
+    def iter_sheets(self) -> Iterator[SheetData]:
+        """Lần lượt từng sheet, sheet trước được giải phóng khi lấy sheet sau"""
+        for index in range(len(self.sheet_names)):
+            try:
+                yield self.read_sheet(index)
+            finally:
+                self.release_sheet(index)
+
+    @abstractmethod
+    def read_sheet(self, index: int) -> SheetData:
+        """Mở một sheet theo thứ tự (từ 0)"""
+
+    def release_sheet(self, index: int):
+        """Giải phóng sheet đã dùng xong (backend không hỗ trợ thì bỏ qua)"""
+
+    @abstractmethod
+    def style_cache(self, font_regular: str, font_bold: str) -> ExcelStyleCache:
+        """Cache style ô dùng chung cho mọi sheet của workbook"""
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class ReadOnlyCellView:
+    """Ô openpyxl chế độ read_only, thêm style_id / has_style như ô thường (converter cache theo id)"""
+
+    __slots__ = ('_cell',)
+
+    def __init__(self, cell):
+        self._cell = cell
+
+    @property
+    def style_id(self) -> int:
+        return getattr(self._cell, '_style_id', 0)
+
+    @property
+    def has_style(self) -> bool:
+        # EmptyCell (ô trống giữa dòng ở chế độ read_only) không có has_style
+        return getattr(self._cell, 'has_style', False)
+
+    def __getattr__(self, name):
+        return getattr(self._cell, name)
+
+
+class OpenpyxlReader(WorkbookReader):
+    """
+    Đọc .xlsx / .xlsm bằng openpyxl
+
+    read_only=True (xem trước) đọc dòng dần từ file zip nên chỉ tốn thời gian cho
+    các dòng thật sự được lấy, nhưng openpyxl không có vùng gộp ô ở chế độ này.
+    """
+
+    def __init__(self, path: WorkbookSource, read_only: bool = False):
+        from openpyxl import load_workbook
+        self.read_only = read_only
+        self.wb = load_workbook(path, read_only=read_only, data_only=True, rich_text=True)
+        self.epoch = self.wb.epoch
+
+    @property
+    def sheet_names(self) -> List[str]:
+        # Chỉ worksheet, chart sheet không có ô để dựng bảng
+        return [ws.title for ws in self.wb.worksheets]
+
+    def read_sheet(self, index: int) -> SheetData:
+        ws = self.wb.worksheets[index]
+        if self.read_only:
+            rows = ([ReadOnlyCellView(cell) for cell in row] for row in ws.iter_rows())
+            return SheetData(ws.title, rows, SpanIndex())
+        return SheetData(ws.title, ws.iter_rows(), SpanIndex.from_worksheet(ws))
+
+    def style_cache(self, font_regular: str, font_bold: str) -> ExcelStyleCache:
+        return ExcelStyleCache(self.wb, font_regular, font_bold)
+
+    def close(self):
+        self.wb.close()
+
+
+class XlrdCell:
+    """Ô của file .xls, giả các thuộc tính ô openpyxl mà converter dùng"""
+
+    __slots__ = ('value', 'style_id', '_book')
+    has_style = True
+
+    def __init__(self, value, style_id: int, book):
+        self.value = value
+        self.style_id = style_id
+        self._book = book
+
+    @property
+    def number_format(self) -> str:
+        # Chỉ được đọc khi gặp XF mới (NumberFormatCache cache theo style_id)
+        book = self._book
+        fmt = book.format_map.get(book.xf_list[self.style_id].format_key)
+        return fmt.format_str if fmt is not None else 'General'
+
+
+class XlrdReader(WorkbookReader):
+    """
+    Đọc .xls (BIFF) bằng xlrd
+
+    Mở với on_demand=True nên chỉ sheet đang xử lý nằm trong bộ nhớ,
+    formatting_info=True để có number format, style ô và vùng gộp.
+    """
+
+    def __init__(self, path: WorkbookSource):
+        try:
+            import xlrd
+        except ImportError:
+            logger.error("Chưa cài xlrd - không đọc được file .xls (pip install xlrd)")
+            raise
+        self._xlrd = xlrd
+        if hasattr(path, 'read'):
+            # xlrd chỉ đọc được cả file trong bộ nhớ
+            self.book = xlrd.open_workbook(file_contents=stream_buffer(path), on_demand=True,
+                                           formatting_info=True)
+        else:
+            self.book = xlrd.open_workbook(str(path), on_demand=True, formatting_info=True)
+        self.epoch = EXCEL_EPOCH_1904 if self.book.datemode else EXCEL_EPOCH
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self.book.sheet_names()
+
+    def read_sheet(self, index: int) -> SheetData:
+        sheet = self.book.sheet_by_index(index)
+        spans = SpanIndex()
+        for row1, row2, col1, col2 in sheet.merged_cells:  # row2/col2 không tính
+            spans.add(row1, col1, row2 - 1, col2 - 1)
+        return SheetData(sheet.name, self._iter_rows(sheet), spans)
+
+    def release_sheet(self, index: int):
+        self.book.unload_sheet(index)
+
+    def _iter_rows(self, sheet) -> Iterator[List[XlrdCell]]:
+        xlrd = self._xlrd
+        book = self.book
+        empty = (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK)
+        for r in range(sheet.nrows):
+            row = []
+            for cell in sheet.row(r):
+                ctype, value = cell.ctype, cell.value
+                if ctype in empty:
+                    value = None
+                elif ctype == xlrd.XL_CELL_BOOLEAN:
+                    value = bool(value)
+                elif ctype == xlrd.XL_CELL_ERROR:
+                    value = xlrd.error_text_from_code.get(value, '#N/A')
+                # XL_CELL_DATE giữ số serial, number format của ô sẽ in ra ngày
+                row.append(XlrdCell(value, cell.xf_index, book))
+            yield row
+
+    def style_cache(self, font_regular: str, font_bold: str) -> ExcelStyleCache:
+        return XlrdStyleCache(self.book, font_regular, font_bold)
+
+    def close(self):
+        self.book.release_resources()
+
+
+class CsvReader(WorkbookReader):
+    """
+    Đọc .csv / .tsv bằng module csv: một sheet, đọc dần từng dòng
+
+    Encoding theo BOM / UTF-8 / Windows-1258 (FileHandler.detect_text_encoding),
+    file đoán là UTF-8 chuyển sang Windows-1258 nếu phần sau không phải UTF-8;
+    ký tự phân cách: tab với .tsv, còn lại đoán từ phần đầu file.
+    """
+
+    def __init__(self, path: WorkbookSource):
+        self._path = path
+        if hasattr(path, 'read'):
+            sample = peek(path, _CSV_SAMPLE_BYTES)
+            name = getattr(path, 'name', None)
+            self._name = Path(name).stem if isinstance(name, str) else 'CSV'
+            suffix = Path(name).suffix.lower() if isinstance(name, str) else ''
+        else:
+            with open(path, 'rb') as f:
+                sample = f.read(_CSV_SAMPLE_BYTES)
+            self._name = Path(path).stem
+            suffix = Path(path).suffix.lower()
+        self.encoding = FileHandler.detect_text_encoding(sample)
+        text = sample.decode(self.encoding, errors='ignore')
+        lines = text.splitlines()
+        if len(sample) == _CSV_SAMPLE_BYTES and len(lines) > 1:
+            lines.pop()  # dòng cuối của mẫu có thể bị cắt dở
+        self.delimiter = FileHandler.detect_delimiter(lines, suffix)
+        self._text = None
+        logger.info(f"CSV: encoding {self.encoding}, phân cách {self.delimiter!r}")
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return [self._name]
+
+    def read_sheet(self, index: int) -> SheetData:
+        return SheetData(self._name, self._iter_rows(), SpanIndex(), plain=True)
+
+    def _iter_rows(self) -> Iterator[List[str]]:
+        if self.encoding == 'utf-8':
+            # UTF-8 chỉ được đoán từ phần đầu file: dòng phía sau vẫn có thể là
+            # Windows-1258, khi đó đổi encoding thay vì thay ký tự bằng '�'
+            if hasattr(self._path, 'read'):
+                self._path.seek(0)
+                raw = self._path
+            else:
+                raw = self._text = open(self._path, 'rb')
+            lines = _Utf8FallbackLines(raw)
+            rows = csv.reader(lines, delimiter=self.delimiter)
+            for row in rows:
+                if lines.fallback:
+                    row = [unicodedata.normalize('NFC', value) for value in row]
+                yield row
+            return
+        if hasattr(self._path, 'read'):
+            self._path.seek(0)
+            # Không đóng stream của người gọi khi đọc xong (xem close)
+            self._text = io.TextIOWrapper(self._path, encoding=self.encoding,
+                                          errors='replace', newline='')
+        else:
+            self._text = open(self._path, 'r', encoding=self.encoding,
+                              errors='replace', newline='')
+        rows = csv.reader(self._text, delimiter=self.delimiter)
+        if self.encoding == 'cp1258':
+            # Windows-1258 ghi dấu thanh bằng ký tự tổ hợp, dựng lại chữ có dấu để font hiển thị đúng
+            rows = ([unicodedata.normalize('NFC', value) for value in row] for row in rows)
+        yield from rows
+
+    def release_sheet(self, index: int):
+        self.close()
+
+    def style_cache(self, font_regular: str, font_bold: str) -> ExcelStyleCache:
+        # Dòng CSV không có ô có style, cache chỉ để giữ giao diện chung
+        return ExcelStyleCache(None, font_regular, font_bold)
+
+    def close(self):
+        if self._text is None:
+            return
+        if hasattr(self._path, 'read'):
+            self._text.detach()
+        else:
+            self._text.close()
+        self._text = None
+
+
+class _Utf8FallbackLines:
+    """
+    Các dòng (giữ ký tự xuống dòng, như newline='') của file UTF-8, chuyển
+    sang Windows-1258 từ chỗ gặp byte UTF-8 không hợp lệ đầu tiên
+    """
+
+    def __init__(self, raw: BinaryIO, chunk_size: int = 1024 * 1024):
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._pending = b''  # ký tự nhiều byte bị cắt ở cuối khối trước
+        self.fallback = False
+
+    def __iter__(self) -> Iterator[str]:
+        carry = ''
+        while True:
+            chunk = self._raw.read(self._chunk_size)
+            final = not chunk
+            lines = io.StringIO(carry + self._decode(chunk, final), newline='').readlines()
+            carry = ''
+            if not final and lines and not lines[-1].endswith('\n'):
+                carry = lines.pop()  # dòng chưa hết (hoặc '\r' mà '\n' nằm ở khối sau)
+            yield from lines
+            if final:
+                return
+
+    def _decode(self, chunk: bytes, final: bool) -> str:
+        data = self._pending + chunk
+        self._pending = b''
+        if self.fallback:
+            return data.decode('cp1258', errors='replace')
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            head = data[:e.start].decode('utf-8')
+            if not final and e.reason == 'unexpected end of data':
+                self._pending = data[e.start:]
+                return head
+            logger.warning("CSV: gặp byte không phải UTF-8, đọc phần còn lại bằng Windows-1258")
+            self.fallback = True
+            return head + data[e.start:].decode('cp1258', errors='replace')
+
+
+def is_delimited_text(path: WorkbookSource) -> bool:
+    """File có phải CSV/TSV không: theo đuôi file, stream không tên thì theo nội dung"""
+    name = getattr(path, 'name', None) if hasattr(path, 'read') else str(path)
+    if isinstance(name, str) and Path(name).suffix.lower() in CSV_SUFFIXES:
+        return True
+    if hasattr(path, 'read') and not isinstance(name, str):
+        # xlsx là zip, xls là OLE2, còn lại coi là văn bản
+        return not peek(path, len(OLE2_MAGIC)).startswith((ZIP_MAGIC, OLE2_MAGIC))
+    return False
+
+
+def is_legacy_xls(path: WorkbookSource) -> bool:
+    """File có phải .xls (OLE2/BIFF) không, xét nội dung chứ không chỉ đuôi file"""
+    if hasattr(path, 'read'):
+        return peek(path, len(OLE2_MAGIC)) == OLE2_MAGIC
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(OLE2_MAGIC)) == OLE2_MAGIC
+    except OSError:
+        return Path(path).suffix.lower() == '.xls'
+
+
+def open_workbook_reader(path: WorkbookSource, read_only: bool = False) -> WorkbookReader:
+    """
+    Chọn backend phù hợp cho file Excel
+
+    Args:
+        path: File hoặc stream nhị phân
+        read_only: Đọc dòng dần, bỏ vùng gộp ô (xem trước; xlrd luôn nạp từng sheet)
+    """
+    if is_legacy_xls(path):
+        logger.info("Định dạng .xls (BIFF) - đọc bằng xlrd")
+        return XlrdReader(path)
+    if is_delimited_text(path):
+        return CsvReader(path)
+    return OpenpyxlReader(path, read_only)
@@ -0,0 +1,335 @@
+"""
+Chuyển định dạng ô Excel (font, màu nền, căn lề, viền) sang lệnh TableStyle
+
+Style được resolve một lần cho mỗi style id của openpyxl, các ô kề nhau cùng
+style được gộp thành lệnh theo vùng chữ nhật để số lệnh TableStyle luôn nhỏ.
+"""
+import colorsys
+import re
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from reportlab.lib import colors
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+
+# Bảng màu theme mặc định của Office, thứ tự theo chỉ số theme của Excel
+# (lt1, dk1, lt2, dk2, accent1..6, hlink, folHlink)
+DEFAULT_THEME_COLORS = [
+    'FFFFFF', '000000', 'E7E6E6', '44546A', '4472C4', 'ED7D31',
+    'A5A5A5', 'FFC000', '5B9BD5', '70AD47', '0563C1', '954F72',
+]
+
+# Độ dày viền Excel -> point
+BORDER_WIDTHS = {
+    'hair': 0.25, 'thin': 0.5, 'dotted': 0.5, 'dashed': 0.5, 'dashDot': 0.5,
+    'dashDotDot': 0.5, 'slantDashDot': 0.75, 'medium': 1.0, 'mediumDashed': 1.0,
+    'mediumDashDot': 1.0, 'mediumDashDotDot': 1.0, 'double': 1.5, 'thick': 1.5,
+}
+
+H_ALIGN = {'left': 'LEFT', 'center': 'CENTER', 'centerContinuous': 'CENTER',
+           'right': 'RIGHT', 'justify': 'LEFT', 'distributed': 'CENTER'}
+V_ALIGN = {'top': 'TOP', 'center': 'MIDDLE', 'bottom': 'BOTTOM'}
+
+# (width, color) cho từng cạnh
+BorderSide = Optional[Tuple[float, colors.Color]]
+
+# Trường của CellStyle -> lệnh TableStyle tương ứng
+_COMMANDS = {
+    'font_name': 'FONTNAME', 'font_size': 'FONTSIZE', 'text_color': 'TEXTCOLOR',
+    'background': 'BACKGROUND', 'align': 'ALIGN', 'valign': 'VALIGN',
+    'top': 'LINEABOVE', 'bottom': 'LINEBELOW', 'left': 'LINEBEFORE', 'right': 'LINEAFTER',
+}
+
+
+class CellStyle(NamedTuple):
+    """Style đã resolve của một ô, None ở từng trường = giữ mặc định của bảng"""
+    font_name: Optional[str] = None
+    font_size: Optional[float] = None
+    text_color: Optional[colors.Color] = None
+    background: Optional[colors.Color] = None
+    align: Optional[str] = None
+    valign: Optional[str] = None
+    top: BorderSide = None
+    bottom: BorderSide = None
+    left: BorderSide = None
+    right: BorderSide = None
+
+
+_EMPTY_STYLE = CellStyle()
+
+
+class ExcelStyleCache:
+    """Resolve style của ô openpyxl, mỗi style id chỉ resolve một lần"""
+
+    def __init__(self, wb, font_regular: str, font_bold: str, font_size: float = 8):
+        """
+        Args:
+            wb: Workbook openpyxl
+            font_regular: Font thường đã đăng ký
+            font_bold: Font đậm đã đăng ký
+            font_size: Cỡ chữ mặc định của bảng PDF
+        """
+        self.font_regular = font_regular
+        self.font_bold = font_bold
+        self.font_size = font_size
+        self.theme_colors = self._load_theme_colors(getattr(wb, 'loaded_theme', None))
+        self.indexed_colors = list(getattr(wb, '_colors', None) or [])
+        # Cỡ chữ gốc của workbook (thường 11pt) được co về font_size
+        self.base_font_size = self._default_font_size(wb)
+
+        self._by_id: Dict[int, Optional[CellStyle]] = {}
+        self._interned: Dict[CellStyle, CellStyle] = {}
+        self._colors: Dict[tuple, Optional[colors.Color]] = {}
+
+    def style_of(self, cell) -> Optional[CellStyle]:
+        """
+        Style của một ô
+
+        Returns:
+            Optional[CellStyle]: None nếu ô không có định dạng riêng. Các style
+            giống nhau dùng chung một object nên có thể so sánh bằng `is`.
+        """
+        if not cell.has_style:
+            return None
+        style_id = cell.style_id
+        try:
+            return self._by_id[style_id]
+        except KeyError:
+            style = self._resolve(cell)
+            if style is not None:
+                style = self._interned.setdefault(style, style)
+            self._by_id[style_id] = style
+            return style
+
+    def _resolve(self, cell) -> Optional[CellStyle]:
+        font, fill, alignment, border = cell.font, cell.fill, cell.alignment, cell.border
+
+        font_name = self.font_bold if font is not None and font.b else None
+        font_size = None
+        if font is not None and font.sz and self.base_font_size:
+            size = round(self.font_size * float(font.sz) / self.base_font_size, 1)
+            if size != self.font_size:
+                font_size = size
+        text_color = self._color(font.color) if font is not None else None
+        if text_color is not None and text_color.hexval() == '0x000000':
+            text_color = None
+
+        background = None
+        if getattr(fill, 'patternType', None) == 'solid':
+            background = self._color(fill.fgColor)
+
+        align = valign = None
+        if alignment is not None:
+            align = H_ALIGN.get(alignment.horizontal)
+            valign = V_ALIGN.get(alignment.vertical)
+
+        sides = [None, None, None, None]
+        if border is not None:
+            for i, side in enumerate((border.top, border.bottom, border.left, border.right)):
+                if side is not None and side.style:
+                    color = self._color(side.color) or colors.black
+                    sides[i] = (BORDER_WIDTHS.get(side.style, 0.5), color)
+
+        style = CellStyle(font_name, font_size, text_color, background, align, valign, *sides)
+        return None if style == _EMPTY_STYLE else style
+
+    def _color(self, color) -> Optional[colors.Color]:
+        """Chuyển openpyxl Color (rgb / indexed / theme + tint) sang màu ReportLab"""
+        if color is None:
+            return None
+        key = (color.type, color.value, color.tint)
+        if key in self._colors:
+            return self._colors[key]
+
+        hex_rgb = None
+        if color.type == 'rgb' and isinstance(color.rgb, str):
+            argb = color.rgb
+            # Alpha 00 ở fgColor mặc định nghĩa là "không màu"
+            if len(argb) == 8 and argb != '00000000':
+                hex_rgb = argb[2:]
+        elif color.type == 'indexed':
+            idx = color.indexed
+            if self.indexed_colors and 0 <= idx < len(self.indexed_colors):
+                hex_rgb = self.indexed_colors[idx][-6:]
+        elif color.type == 'theme' and 0 <= color.theme < len(self.theme_colors):
+            hex_rgb = self.theme_colors[color.theme]
+
+        result = None
+        if hex_rgb and re.fullmatch(r'[0-9A-Fa-f]{6}', hex_rgb):
+            result = self._apply_tint(hex_rgb, color.tint or 0.0)
+        self._colors[key] = result
+        return result
+
+    @staticmethod
+    def _apply_tint(hex_rgb: str, tint: float) -> colors.Color:
+        """Áp dụng tint của Excel lên độ sáng (HLS)"""
+        r, g, b = (int(hex_rgb[i:i + 2], 16) / 255 for i in (0, 2, 4))
+        if tint:
+            h, l, s = colorsys.rgb_to_hls(r, g, b)
+            l = l * (1 + tint) if tint < 0 else l * (1 - tint) + tint
+            r, g, b = colorsys.hls_to_rgb(h, l, s)
+        return colors.Color(r, g, b)
+
+    @staticmethod
+    def _load_theme_colors(theme_xml: Optional[bytes]) -> List[str]:
+        """Đọc bảng màu từ theme1.xml của workbook, lỗi thì dùng bảng mặc định"""
+        if not theme_xml:
+            return DEFAULT_THEME_COLORS
+        try:
+            found = {}
+            for name in ('dk1', 'lt1', 'dk2', 'lt2', 'accent1', 'accent2', 'accent3',
+                         'accent4', 'accent5', 'accent6', 'hlink', 'folHlink'):
+                m = re.search(
+                    rb'<a:' + name.encode() + rb'>\s*<a:(?:srgbClr val|sysClr [^>]*?lastClr)="([0-9A-Fa-f]{6})"',
+                    theme_xml)
+                if m:
+                    found[name] = m.group(1).decode()
+            order = ['lt1', 'dk1', 'lt2', 'dk2', 'accent1', 'accent2', 'accent3',
+                     'accent4', 'accent5', 'accent6', 'hlink', 'folHlink']
+            return [found.get(n, d) for n, d in zip(order, DEFAULT_THEME_COLORS)]
+        except Exception as e:
+            logger.warning(f"Không đọc được theme màu: {e}")
+            return DEFAULT_THEME_COLORS
+
+    @staticmethod
+    def _default_font_size(wb) -> float:
+        try:
+            return float(wb._fonts[0].sz or 11)
+        except (AttributeError, IndexError, TypeError, ValueError):
+            return 11.0
+
+
+# Mã căn lề / kiểu viền trong XF record của BIFF (.xls)
+XLS_H_ALIGN = {1: 'LEFT', 2: 'CENTER', 3: 'RIGHT', 5: 'LEFT', 6: 'CENTER', 7: 'CENTER'}
+XLS_V_ALIGN = {0: 'TOP', 1: 'MIDDLE', 2: 'BOTTOM'}
+XLS_BORDER_WIDTHS = {
+    1: 0.5, 2: 1.0, 3: 0.5, 4: 0.5, 5: 1.5, 6: 1.5, 7: 0.25,
+    8: 1.0, 9: 0.5, 10: 1.0, 11: 0.5, 12: 1.0, 13: 0.75,
+}
+_XLS_AUTO_COLOR = 0x7FFF
+
+
+class XlrdStyleCache(ExcelStyleCache):
+    """Resolve style từ XF record của file .xls (xlrd mở với formatting_info=True)"""
+
+    def __init__(self, book, font_regular: str, font_bold: str, font_size: float = 8):
+        super().__init__(book, font_regular, font_bold, font_size)
+        self.book = book
+        if book.font_list:
+            self.base_font_size = book.font_list[0].height / 20 or 11.0
+
+    def _resolve(self, cell) -> Optional[CellStyle]:
+        book = self.book
+        xf = book.xf_list[cell.style_id]
+        font = book.font_list[xf.font_index]
+
+        font_name = self.font_bold if font.bold or font.weight >= 700 else None
+        font_size = None
+        if font.height and self.base_font_size:
+            size = round(self.font_size * font.height / 20 / self.base_font_size, 1)
+            if size != self.font_size:
+                font_size = size
+        text_color = self._palette(font.colour_index)
+        if text_color is not None and text_color.hexval() == '0x000000':
+            text_color = None
+
+        background = None
+        if xf.background.fill_pattern == 1:
+            background = self._palette(xf.background.pattern_colour_index)
+
+        align = XLS_H_ALIGN.get(xf.alignment.hor_align)
+        valign = XLS_V_ALIGN.get(xf.alignment.vert_align)
+
+        border = xf.border
+        sides = []
+        for line_style, color_index in (
+                (border.top_line_style, border.top_colour_index),
+                (border.bottom_line_style, border.bottom_colour_index),
+                (border.left_line_style, border.left_colour_index),
+                (border.right_line_style, border.right_colour_index)):
+            if line_style:
+                color = self._palette(color_index) or colors.black
+                sides.append((XLS_BORDER_WIDTHS.get(line_style, 0.5), color))
+            else:
+                sides.append(None)
+
+        style = CellStyle(font_name, font_size, text_color, background, align, valign, *sides)
+        return None if style == _EMPTY_STYLE else style
+
+    def _palette(self, index: int) -> Optional[colors.Color]:
+        """Màu theo chỉ số palette của workbook .xls (None = màu tự động)"""
+        key = ('xls', index)
+        if key in self._colors:
+            return self._colors[key]
+        rgb = None if index == _XLS_AUTO_COLOR else self.book.colour_map.get(index)
+        result = colors.Color(*(v / 255 for v in rgb)) if rgb else None
+        self._colors[key] = result
+        return result
+
+
+class StyleRangeCoalescer:
+    """
+    Gộp các ô kề nhau thành lệnh TableStyle theo vùng chữ nhật, xử lý theo từng dòng
+
+    Mỗi thuộc tính (font, màu nền, viền...) được gộp riêng: mỗi dòng tách thành
+    các đoạn ngang cùng giá trị, đoạn nào trùng cột và giá trị với dòng trên thì
+    kéo dài xuống. Nhờ vậy một cột tô màu xen kẽ không làm vỡ vùng viền của cả
+    bảng. Độ phức tạp tuyến tính theo số ô.
+    """
+
+    def __init__(self):
+        # Mỗi thuộc tính: (col_start, col_end, value) -> row_start
+        self._open: List[Dict[tuple, int]] = [{} for _ in CellStyle._fields]
+        self._prev: Optional[List[Optional[CellStyle]]] = None
+        self._rows = 0
+        self.commands: List[tuple] = []
+
+    def add_row(self, styles: List[Optional[CellStyle]]):
+        """Thêm style của một dòng (theo thứ tự dòng trong bảng PDF)"""
+        row = self._rows
+        self._rows += 1
+
+        # Dòng giống hệt dòng trên (trường hợp phổ biến) -> mọi vùng tự kéo dài
+        prev = self._prev
+        if prev is not None and len(prev) == len(styles) and all(
+                a is b for a, b in zip(prev, styles)):
+            return
+        self._prev = styles
+
+        for attr, open_ranges in enumerate(self._open):
+            still_open = {}
+            values = [None if s is None else s[attr] for s in styles]
+            col, n = 0, len(values)
+            while col < n:
+                value = values[col]
+                end = col
+                while end + 1 < n and values[end + 1] == value:
+                    end += 1
+                if value is not None:
+                    key = (col, end, value)
+                    still_open[key] = open_ranges.pop(key, row)
+                col = end + 1
+            self._close(attr, open_ranges, row - 1)
+            self._open[attr] = still_open
+
+    def finish(self) -> List[tuple]:
+        """Đóng các vùng còn mở, trả về danh sách lệnh TableStyle"""
+        for attr, open_ranges in enumerate(self._open):
+            self._close(attr, open_ranges, self._rows - 1)
+        self._open = [{} for _ in CellStyle._fields]
+        return self.commands
+
+    def _close(self, attr: int, ranges: Dict[tuple, int], last_row: int):
+        field = CellStyle._fields[attr]
+        op = _COMMANDS[field]
+        for (col_start, col_end, value), row_start in ranges.items():
+            start, end = (col_start, row_start), (col_end, last_row)
+            if field in ('top', 'bottom', 'left', 'right'):
+                self.commands.append((op, start, end, value[0], value[1]))
+            else:
+                self.commands.append((op, start, end, value))
+                if field == 'font_size':
+                    self.commands.append(('LEADING', start, end, round(value * 1.2, 1)))
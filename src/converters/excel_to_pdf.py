@@ -4,25 +4,48 @@ Hỗ trợ Unicode đầy đủ cho tiếng Việt
 """
 import os
 import tempfile
+from bisect import bisect_left
+from itertools import islice
 import urllib.request
 from pathlib import Path
-from typing import Optional, List, Tuple
+from typing import BinaryIO, Iterator, Optional, List, Tuple, Union
+from xml.sax.saxutils import escape
 
-from openpyxl import load_workbook
+from openpyxl.cell.rich_text import CellRichText
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, PageBreak, Paragraph, Spacer
+from reportlab.platypus import SimpleDocTemplate, TableStyle, PageBreak, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 
 from ..logging.logger_setup import get_logger
+from ..logging.memory_tracker import checkpoint
 from ..io.file_handler import FileHandler
+from ..io.memory_io import InputSource, open_input, pdf_result, pdf_target, source_name
+from ..io.preflight import preflight
+from .excel_readers import SheetData, WorkbookReader, WorkbookSource, open_workbook_reader
+from .excel_styles import ExcelStyleCache, StyleRangeCoalescer
+from .fragments import Bookmark, pypdf_available, render_fragments, resolve_workers
+from .number_format import NumberFormatCache
+from .output_split import PartedDocTemplate, PartLimits, configured_part_limits
+from .oversize import remap_commands, split_paragraph, split_text_lines
+from .preview import PREVIEW_PAGES, ROWS_PER_PAGE, PreviewDocTemplate
+from .spans import SpanIndex
+from .table_model import SheetTable, WindowedTable
+from .text_wrap import TextWrapper
 
 logger = get_logger(__name__)
 
+# Căn lề ngang của ô (lệnh ALIGN) -> alignment của Paragraph
+_PARAGRAPH_ALIGN = {'LEFT': TA_LEFT, 'CENTER': TA_CENTER, 'RIGHT': TA_RIGHT}
+
+# Chiều cao tối đa một dòng bảng: khung trang landscape A4 trừ chỗ cho tiêu đề
+# sheet / dòng header lặp lại (ô cao hơn được tách thành nhiều dòng)
+_MAX_ROW_HEIGHT = (landscape(A4)[1] - 45) * 0.8
+
 
 class FontManager:
     """Quản lý font Unicode"""
@@ -98,11 +121,63 @@ class FontManager:
         return 'Helvetica', 'Helvetica-Bold'
 
 
+class _LazyFlowables(list):
+    """
+    List flowables tự nạp thêm từ iterator khi sắp cạn
+    
+    Vòng build của ReportLab chỉ dùng len(), [0], del [0] và chèn phần split vào
+    đầu list, nên có thể sinh flowables dần thay vì dựng hết từ trước.
+    """
+    
+    def __init__(self, chunks: Iterator[List]):
+        super().__init__()
+        self._chunks = chunks
+    
+    def __len__(self):
+        while not list.__len__(self):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self.extend(chunk)
+        return list.__len__(self)
+    
+    def __bool__(self):
+        return len(self) > 0
+
+
 class ExcelToPDFConverter:
     """Class chuyển đổi Excel sang PDF"""
     
-    def __init__(self):
+    def __init__(self, workers: int = 1, part_limits: Optional[PartLimits] = None):
+        """
+        Args:
+            workers: Số process dựng các sheet song song (1 = tuần tự, 0 = số CPU).
+                Cần pypdf để ghép các phần, không có thì tự dựng tuần tự.
+            part_limits: Chia kết quả thành nhiều file theo số trang / số dòng /
+                dung lượng (None = theo WORDTOPDF_PART_LIMITS, không đặt thì một file)
+        """
         self.font_regular, self.font_bold = FontManager.register_fonts()
+        self.workers = resolve_workers(workers)
+        self.part_limits = part_limits if part_limits is not None else configured_part_limits()
+        self.styles = self._create_styles()
+        self._cell_paragraph_styles = {}
+        self.max_rows: Optional[int] = None  # xem trước: số dòng đọc tối đa mỗi sheet
+    
+    def _create_styles(self) -> dict:
+        """Tạo các style cho PDF"""
+        base_styles = getSampleStyleSheet()
+        return {
+            'Title': ParagraphStyle(
+                'CustomTitle',
+                parent=base_styles['Heading1'],
+                fontSize=14,
+                fontName=self.font_bold,
+                textColor=colors.HexColor('#2C3E50'),
+                spaceAfter=12,
+                alignment=TA_CENTER
+            ),
+            'Normal': base_styles['Normal'],
+        }
     
     def convert(self, input_path: Path, output_path: Optional[Path] = None) -> Path:
         """
@@ -113,132 +188,439 @@ class ExcelToPDFConverter:
             output_path: Đường dẫn file PDF output (tùy chọn)
             
         Returns:
-            Path: Đường dẫn file PDF đã tạo
+            Path: Đường dẫn file PDF đã tạo (phần đầu tiên nếu kết quả được chia
+                thành <tên>.part001.pdf, <tên>.part002.pdf...)
         """
-        output_path = FileHandler.ensure_output_path(output_path, input_path, '.pdf')
+        output_path = FileHandler.ensure_output_path(output_path, input_path, new_suffix='.pdf')
         
         logger.info(f"Đang đọc Excel: {input_path.name}")
-        wb = load_workbook(input_path, data_only=True)
         
-        # Tạo PDF document
-        doc = SimpleDocTemplate(
-            str(output_path),
-            pagesize=landscape(A4),
-            rightMargin=25,
-            leftMargin=25,
-            topMargin=25,
-            bottomMargin=20
-        )
+        if self.part_limits:
+            # Các phần được ghi lần lượt trong lúc build, không ghép fragment song song
+            parts = self._build(input_path, output_path, part_limits=self.part_limits)
+            if len(parts) > 1:
+                logger.info(f"Đã tạo {len(parts)} phần PDF: {parts[0].name} ... {parts[-1].name}")
+            else:
+                logger.info(f"Đã tạo PDF: {output_path}")
+            return parts[0]
         
-        elements = self._process_workbook(wb)
+        if self.workers > 1:
+            sheet_count = preflight(input_path).sheet_count or 0
+            if sheet_count > 1 and pypdf_available():
+                return self._convert_parallel(input_path, output_path, sheet_count)
+            if sheet_count > 1:
+                logger.warning("Chưa cài pypdf - dựng các sheet tuần tự")
         
-        logger.info("Đang tạo PDF...")
-        doc.build(elements)
+        self._build(input_path, output_path)
         logger.info(f"Đã tạo PDF: {output_path}")
         
         return output_path
     
-    def _process_workbook(self, wb) -> List:
-        """Xử lý workbook và tạo elements cho PDF"""
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=14,
-            fontName=self.font_bold,
-            textColor=colors.HexColor('#2C3E50'),
-            spaceAfter=12,
-            alignment=TA_CENTER
-        )
+    def convert_stream(self, source: InputSource,
+                       output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        """
+        Chuyển Excel nằm trong bộ nhớ sang PDF, không qua file tạm
         
-        sheet_count = len(wb.sheetnames)
-        logger.info(f"Tìm thấy {sheet_count} sheet(s)")
+        Các sheet luôn được dựng tuần tự (dựng song song cần file trên đĩa để
+        worker process tự mở).
         
-        for idx, sheet_name in enumerate(wb.sheetnames):
-            ws = wb[sheet_name]
-            logger.info(f"Xử lý sheet {idx+1}/{sheet_count}: {sheet_name}")
+        Args:
+            source: Nội dung file Excel: bytes, bytearray, memoryview, mmap hoặc
+                file object nhị phân
+            output: Stream nhận PDF (None = trả về bytes)
             
-            # Tiêu đề sheet
-            elements.append(Paragraph(f"<b>{sheet_name}</b>", title_style))
-            elements.append(Spacer(1, 0.15*inch))
+        Returns:
+            Optional[bytes]: Nội dung PDF, None nếu đã ghi vào output
+        """
+        logger.info(f"Đang đọc Excel: {source_name(source)}")
+        target = pdf_target(output)
+        with open_input(source) as stream:
+            self._build(stream, target)
+        logger.info("Đã tạo PDF trong bộ nhớ")
+        return pdf_result(target)
+    
+    def preview(self, source: Union[Path, InputSource], pages: int = PREVIEW_PAGES,
+                output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        """
+        Dựng nhanh vài trang đầu để xem trước
+        
+        Chỉ đọc tối đa pages * ROWS_PER_PAGE dòng mỗi sheet (đọc dần, không nạp
+        cả workbook) và dừng layout sau pages trang. Vùng gộp ô không được giữ
+        (openpyxl không có ở chế độ đọc dần).
+        
+        Args:
+            source: File Excel hoặc nội dung trong bộ nhớ (xem convert_stream)
+            pages: Số trang tối đa
+            output: Stream nhận PDF (None = trả về bytes)
             
-            # Xử lý data
-            table = self._create_table(ws)
-            if table:
-                elements.append(table)
-            else:
-                elements.append(Paragraph("<i>Sheet trống</i>", styles['Normal']))
+        Returns:
+            Optional[bytes]: Nội dung PDF, None nếu đã ghi vào output
+        """
+        target = pdf_target(output)
+        if isinstance(source, (str, Path)):
+            self._build(Path(source), target, pages)
+        else:
+            with open_input(source) as stream:
+                self._build(stream, target, pages)
+        return pdf_result(target)
+    
+    def _build(self, source: WorkbookSource, target, preview_pages: Optional[int] = None,
+               part_limits: Optional[PartLimits] = None) -> List:
+        """
+        Dựng cả workbook (hoặc preview_pages trang đầu) thành PDF (file hoặc stream)
+        
+        Returns:
+            List: Các file đã ghi khi chia phần (part_limits), không thì [target]
+        """
+        if part_limits:
+            doc = PartedDocTemplate(target, part_limits, self.font_regular, **self._page_layout())
+        else:
+            doc = self._new_document(target, preview_pages)
+        self.max_rows = preview_pages * ROWS_PER_PAGE if preview_pages else None
+        
+        try:
+            with open_workbook_reader(source, read_only=bool(preview_pages)) as reader:
+                checkpoint('excel.open')
+                elements = self._process_workbook(reader)
+                
+                logger.info("Đang tạo PDF...")
+                doc.build(elements)
+        finally:
+            self.max_rows = None
+        checkpoint('excel.write')
+        return doc.parts if part_limits else [target]
+    
+    def _convert_parallel(self, input_path: Path, output_path: Path, sheet_count: int) -> Path:
+        """Dựng mỗi sheet thành một PDF riêng trên nhiều process rồi ghép theo thứ tự"""
+        workers = min(self.workers, sheet_count)
+        logger.info(f"Dựng {sheet_count} sheet trên {workers} process...")
+        tasks = [(input_path, index) for index in range(sheet_count)]
+        render_fragments(_render_sheet_fragment, tasks, workers, output_path)
+        logger.info(f"Đã tạo PDF: {output_path}")
+        return output_path
+    
+    @staticmethod
+    def _page_layout() -> dict:
+        """Khổ giấy (landscape A4) và lề trang"""
+        return dict(
+            pagesize=landscape(A4),
+            rightMargin=25,
+            leftMargin=25,
+            topMargin=25,
+            bottomMargin=20
+        )
+    
+    def _new_document(self, output_path, max_pages: Optional[int] = None) -> SimpleDocTemplate:
+        """PDF document cho file kết quả, một fragment hoặc stream"""
+        layout = self._page_layout()
+        target = output_path if hasattr(output_path, 'write') else str(output_path)
+        if max_pages:
+            return PreviewDocTemplate(target, max_pages, **layout)
+        return SimpleDocTemplate(target, **layout)
+    
+    def _process_workbook(self, reader: WorkbookReader) -> List:
+        """
+        Xử lý workbook và tạo elements cho PDF
+        
+        Elements được sinh dần theo từng sheet trong lúc build: sheet kế tiếp chỉ
+        được đọc khi các trang của sheet trước đã vẽ xong, sheet cũ được reader
+        giải phóng nên bộ nhớ chỉ phụ thuộc sheet lớn nhất.
+        """
+        return _LazyFlowables(self._iter_sheet_elements(reader))
+    
+    def _iter_sheet_elements(self, reader: WorkbookReader) -> Iterator[List]:
+        """Elements của từng sheet, ngắt trang giữa các sheet"""
+        sheet_count = len(reader.sheet_names)
+        logger.info(f"Tìm thấy {sheet_count} sheet(s)")
+        
+        # Cache style/number format dùng chung cho mọi sheet (style id là của workbook)
+        style_cache = reader.style_cache(self.font_regular, self.font_bold)
+        number_formats = NumberFormatCache(epoch=reader.epoch)
+        
+        for idx, sheet in enumerate(reader.iter_sheets()):
+            checkpoint(f'excel.read:{sheet.name}')
+            logger.info(f"Xử lý sheet {idx+1}/{sheet_count}: {sheet.name}")
+            elements = self._sheet_elements(sheet, idx, style_cache, number_formats)
+            checkpoint(f'excel.table:{sheet.name}')
             
             # Page break giữa các sheet
-            if idx < len(wb.sheetnames) - 1:
+            if idx < sheet_count - 1:
                 elements.append(PageBreak())
+            
+            yield elements
+            # Build chỉ lấy sheet kế tiếp khi đã vẽ hết các trang của sheet này
+            checkpoint(f'excel.layout:{sheet.name}')
+    
+    def _sheet_elements(self, sheet: SheetData, index: int, style_cache: ExcelStyleCache,
+                        number_formats: NumberFormatCache) -> List:
+        """Elements của một sheet: mục outline, tiêu đề, bảng"""
+        elements = [Bookmark(sheet.name, f"sheet{index}")]
+        
+        # Tiêu đề sheet
+        elements.append(Paragraph(f"<b>{escape(sheet.name)}</b>", self.styles['Title']))
+        elements.append(Spacer(1, 0.15*inch))
+        
+        # Xử lý data
+        table = self._create_table(sheet, style_cache, number_formats)
+        if table:
+            elements.append(table)
+        else:
+            elements.append(Paragraph("<i>Sheet trống</i>", self.styles['Normal']))
         
         return elements
     
-    def _create_table(self, ws) -> Optional[Table]:
-        """Tạo bảng từ worksheet"""
-        data = []
-        max_cols = 0
-        row_count = 0
+    def _create_table(self, sheet: SheetData, style_cache: ExcelStyleCache,
+                      number_formats: NumberFormatCache) -> Optional[WindowedTable]:
+        """Tạo bảng từ sheet (openpyxl, xlrd hoặc csv)"""
+        table = SheetTable()
+        coalescer = StyleRangeCoalescer()
+        style_of = style_cache.style_of
+        format_of = number_formats.formatter_for_cell
+        spans = sheet.spans
+        rich_cells = {}  # (dòng PDF, cột) -> markup của ô rich text
         
         # Thu thập dữ liệu
         # max_excel_rows = 0 trong config = không giới hạn
-        for row_idx, row in enumerate(ws.iter_rows(values_only=True)):
-            
-            row_data = []
-            for cell in row:
-                if cell is None:
-                    row_data.append('')
-                else:
-                    cell_str = str(cell)
-                    if len(cell_str) > 120:
-                        cell_str = cell_str[:117] + '...'
-                    row_data.append(cell_str)
-            
-            if any(row_data):
-                data.append(row_data)
-                max_cols = max(max_cols, len(row_data))
-                row_count += 1
+        rows = sheet.rows if self.max_rows is None else islice(sheet.rows, self.max_rows)
+        if sheet.plain:
+            # CSV: dòng đã là chuỗi hiển thị, không có style / rich text
+            for row_idx, row_data in enumerate(rows):
+                if any(row_data):
+                    table.add_row(row_data, row_idx)
+        else:
+            for row_idx, row in enumerate(rows):
+                
+                row_data = []
+                rich = None
+                for cell in row:
+                    value = cell.value
+                    if value is None:
+                        row_data.append('')
+                    elif isinstance(value, CellRichText):
+                        row_data.append(str(value))
+                        rich = rich or {}
+                        rich[len(row_data) - 1] = value
+                    else:
+                        row_data.append(format_of(cell)(value))
+                
+                if any(row_data):
+                    if rich:
+                        for col, value in rich.items():
+                            rich_cells[(table.row_count, col)] = self._rich_text_markup(value)
+                    cell_styles = [style_of(cell) for cell in row]
+                    coalescer.add_row(cell_styles)
+                    table.add_row(row_data, row_idx, cell_styles if any(cell_styles) else None)
         
-        logger.info(f"  → {row_count} dòng, {max_cols} cột")
+        max_cols = table.col_count
+        logger.info(f"  → {table.row_count} dòng, {max_cols} cột")
         
-        if not data or max_cols == 0:
+        if not table.row_count or max_cols == 0:
             return None
         
-        # Cân bằng số cột
-        for row in data:
-            while len(row) < max_cols:
-                row.append('')
+        # Ô gộp nhiều cột (tiêu đề...) không dùng để tính độ rộng cột
+        kept_rows = table.source_rows  # chỉ số dòng Excel (từ 0) của từng dòng trong bảng PDF
+        skip_cells = set()
+        for row, col in spans.wide_anchors():
+            pos = bisect_left(kept_rows, row)
+            if pos < len(kept_rows) and kept_rows[pos] == row:
+                skip_cells.add((pos, col))
         
         # Tính độ rộng cột
-        col_widths = self._calculate_column_widths(data, max_cols)
+        col_widths = self._calculate_column_widths(table, skip_cells)
+        
+        # Ngắt dòng theo độ rộng cột (thay cho cắt '...' như trước)
+        cell_commands = coalescer.finish()
+        self._wrap_cells(table, col_widths, spans, legacy_header=not cell_commands)
+        for (row, col), markup in rich_cells.items():
+            table.set_object(row, col, Paragraph(
+                markup, self._cell_paragraph_style(table.style(row, col))))
+        
+        span_commands = spans.span_commands(kept_rows, max_cols - 1) if spans else []
+        
+        # Ô cao hơn khung trang (hàng nghìn dòng) được tách thành nhiều dòng nối
+        # tiếp, ReportLab không chia được một dòng bảng giữa hai trang
+        source_count = table.row_count
+        row_map = self._split_tall_rows(table, col_widths, spans)
+        if row_map:
+            logger.info(f"  → tách dòng quá cao: {source_count} -> {len(row_map)} dòng")
+            cell_commands = remap_commands(cell_commands, row_map)
+            span_commands = remap_commands(span_commands, row_map)
+        table.freeze()
+        
+        # Tạo bảng: mỗi trang chỉ dựng Table cho các dòng của trang đó
+        commands = self._get_table_style(cell_commands).getCommands() + span_commands
+        # Dòng đầu bị tách thì không lặp lại làm header (mỗi mảnh cao gần cả trang)
+        header = not (row_map and len(row_map) > 1 and row_map[1] == 0)
+        return WindowedTable(table, col_widths, commands, header=header)
+    
+    def _wrap_cells(self, table: SheetTable, col_widths: List[float], spans: SpanIndex,
+                    legacy_header: bool = False):
+        """
+        Ngắt dòng nội dung ô (tại chỗ) cho vừa độ rộng cột
         
-        # Tạo bảng
-        table = Table(data, colWidths=col_widths, repeatRows=1)
-        table.setStyle(self._get_table_style())
+        Args:
+            table: Dữ liệu bảng, ô được thay bằng chuỗi đã chèn '\\n'
+            col_widths: Độ rộng cột (point)
+            spans: Vùng gộp ô, ô trên-trái dùng tổng độ rộng các cột được gộp
+            legacy_header: Dòng đầu là header xanh (font đậm cỡ 9)
+        """
+        padding = 10  # LEFTPADDING + RIGHTPADDING
+        default_wrapper = TextWrapper.get(self.font_regular, 8)
+        header_wrapper = TextWrapper.get(self.font_bold, 9) if legacy_header else default_wrapper
+        wrappers = {0: default_wrapper}  # mã style -> wrapper
+        wrapped = {}  # (mã chuỗi, wrapper, độ rộng) -> mã chuỗi đã ngắt dòng
+        kept_rows = table.source_rows
         
-        return table
+        for col, column in enumerate(table.columns):
+            style_column = table.style_columns[col] if table.style_columns else None
+            for row_idx, code in enumerate(column):
+                if not code:
+                    continue
+                width = col_widths[col]
+                if spans:
+                    end = spans.end_of(kept_rows[row_idx], col)
+                    if end is not None:
+                        width = sum(col_widths[col:end[1] + 1])
+                
+                style_code = style_column[row_idx] if style_column is not None else 0
+                if style_code:
+                    wrapper = wrappers.get(style_code)
+                    if wrapper is None:
+                        style = table.styles[style_code]
+                        wrapper = wrappers[style_code] = TextWrapper.get(
+                            style.font_name or self.font_regular, style.font_size or 8)
+                else:
+                    wrapper = header_wrapper if row_idx == 0 else default_wrapper
+                
+                # Giá trị lặp lại chỉ ngắt dòng một lần
+                key = (code, wrapper, width)
+                new_code = wrapped.get(key)
+                if new_code is None:
+                    new_code = wrapped[key] = table.intern(
+                        wrapper.wrap(table.strings[code], width - padding))
+                column[row_idx] = new_code
     
-    def _calculate_column_widths(self, data: List[List[str]], max_cols: int) -> List[float]:
-        """Tính toán độ rộng cột thông minh"""
+    def _split_tall_rows(self, table: SheetTable, col_widths: List[float],
+                         spans: SpanIndex) -> Optional[List[int]]:
+        """
+        Tách các dòng có ô cao hơn _MAX_ROW_HEIGHT (sửa table tại chỗ)
+        
+        Returns:
+            Optional[List[int]]: Dòng cũ của từng dòng mới, None nếu không tách
+        """
+        padding = 10  # LEFTPADDING + RIGHTPADDING
+        kept_rows = table.source_rows
+        
+        def leading_of(style) -> float:
+            # Ô có cỡ chữ riêng có LEADING = 1.2 cỡ chữ, còn lại là leading mặc định
+            # của Table (12pt, FONTSIZE không đổi leading)
+            return style.font_size * 1.2 if style is not None and style.font_size else 12
+        
+        def split_cell(row: int, col: int, value) -> list:
+            end = spans.end_of(kept_rows[row], col) if spans else None
+            if end is not None and end[0] > kept_rows[row]:
+                return [value]  # ô gộp nhiều dòng: các phần sẽ lại bị gộp chung
+            if isinstance(value, Paragraph):
+                width = sum(col_widths[col:(end[1] if end else col) + 1]) - padding
+                return split_paragraph(value, width, _MAX_ROW_HEIGHT)
+            return split_text_lines(value, leading_of(table.style(row, col)), _MAX_ROW_HEIGHT)
+        
+        def max_lines(style) -> int:
+            return max(1, int(_MAX_ROW_HEIGHT // leading_of(style)))
+        
+        return table.split_rows(split_cell, max_lines)
+    
+    def _rich_text_markup(self, value: CellRichText) -> str:
+        """Chuyển ô rich text (nhiều đoạn định dạng khác nhau) sang markup Paragraph"""
+        parts = []
+        for block in value:
+            if isinstance(block, str):
+                parts.append(escape(block))
+                continue
+            text = escape(block.text or '')
+            font = block.font
+            if font is not None:
+                if font.b:
+                    text = f"<b>{text}</b>"
+                if font.i:
+                    text = f"<i>{text}</i>"
+                if font.u:
+                    text = f"<u>{text}</u>"
+                if font.strike:
+                    text = f"<strike>{text}</strike>"
+                rgb = getattr(font.color, 'rgb', None) if font.color is not None else None
+                if isinstance(rgb, str) and len(rgb) >= 6:
+                    text = f'<font color="#{rgb[-6:]}">{text}</font>'
+            parts.append(text)
+        return ''.join(parts).replace('\n', '<br/>')
+    
+    def _cell_paragraph_style(self, style=None) -> ParagraphStyle:
+        """ParagraphStyle cho ô rich text, cùng font/cỡ chữ/căn lề với ô thường"""
+        key = style
+        cached = self._cell_paragraph_styles.get(key)
+        if cached is not None:
+            return cached
+        
+        font_size = (style.font_size if style is not None else None) or 8
+        align = style.align if style is not None else None
+        cached = self._cell_paragraph_styles[key] = ParagraphStyle(
+            f'ExcelCell{len(self._cell_paragraph_styles)}',
+            fontName=(style.font_name if style is not None else None) or self.font_regular,
+            boldFontName=self.font_bold,
+            fontSize=font_size,
+            leading=font_size * 1.2,
+            textColor=(style.text_color if style is not None else None) or colors.black,
+            alignment=_PARAGRAPH_ALIGN.get(align, TA_LEFT),
+        )
+        return cached
+    
+    def _calculate_column_widths(self, table: SheetTable,
+                                 skip_cells: Optional[set] = None) -> List[float]:
+        """Tính toán độ rộng cột theo độ rộng thật của chữ (font đã đăng ký)"""
         page_width = landscape(A4)[0] - 50
         col_widths = []
+        skip_cells = skip_cells or set()
+        text_width = TextWrapper.get(self.font_regular, 8).text_width
+        strings = table.strings
+        widths = {}  # mã chuỗi -> độ rộng dòng dài nhất
         
-        for col_idx in range(max_cols):
-            max_len = 0
-            for row in data[:min(30, len(data))]:
-                if col_idx < len(row):
-                    cell_text = str(row[col_idx])
-                    # Ký tự Unicode chiếm nhiều space hơn
-                    ascii_count = sum(1 for c in cell_text if ord(c) < 128)
-                    unicode_count = len(cell_text) - ascii_count
-                    effective_len = ascii_count + unicode_count * 1.5
-                    max_len = max(max_len, effective_len)
+        # Đo mọi dòng (ô bị ngắt theo độ rộng này), nhưng mỗi chuỗi khác nhau
+        # của cột chỉ đo một lần nhờ từ điển chuỗi của bảng
+        skipped = {}
+        for row_idx, col_idx in skip_cells:
+            skipped.setdefault(col_idx, []).append(row_idx)
+        for col_idx, column in enumerate(table.columns):
+            codes = set(column)
+            codes.discard(0)
+            for row_idx in skipped.get(col_idx, ()):
+                code = column[row_idx]
+                if code in codes and column.count(code) == 1:
+                    codes.discard(code)
+            max_width = 0
+            for code in codes:
+                width = widths.get(code)
+                if width is None:
+                    width = widths[code] = max(
+                        text_width(line) for line in strings[code].split('\n'))
+                if width > max_width:
+                    max_width = width
             
-            width = min(max(max_len * 6, 40), 180)
-            col_widths.append(width)
+            col_widths.append(max(max_width + 10, 40))
+        
+        # Cột dài bị giới hạn 180pt, phần trang còn trống được chia lại cho
+        # các cột đó để chữ không bị ngắt dòng khi trang còn chỗ
+        natural = col_widths
+        col_widths = [min(w, 180) for w in natural]
+        spare = page_width - sum(col_widths)
+        while spare > 0.5:
+            wanting = [i for i, w in enumerate(col_widths) if natural[i] > w]
+            if not wanting:
+                break
+            share = spare / len(wanting)
+            for i in wanting:
+                grow = min(share, natural[i] - col_widths[i])
+                col_widths[i] += grow
+                spare -= grow
         
         # Scale nếu quá rộng
         total = sum(col_widths)
@@ -247,8 +629,29 @@ class ExcelToPDFConverter:
         
         return col_widths
     
-    def _get_table_style(self) -> TableStyle:
-        """Tạo style cho bảng"""
+    def _get_table_style(self, cell_commands: Optional[List[tuple]] = None) -> TableStyle:
+        """
+        Tạo style cho bảng
+        
+        Args:
+            cell_commands: Lệnh style lấy từ định dạng ô Excel (đã gộp theo vùng).
+                Sheet không có định dạng riêng thì dùng style mặc định header xanh.
+        """
+        if cell_commands:
+            return TableStyle([
+                ('FONTNAME', (0, 0), (-1, -1), self.font_regular),
+                ('FONTSIZE', (0, 0), (-1, -1), 8),
+                ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('TOPPADDING', (0, 0), (-1, -1), 4),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+                ('LEFTPADDING', (0, 0), (-1, -1), 5),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+                # Lưới mờ như khi xem trong Excel, viền thật của ô vẽ đè lên
+                ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#D5D8DC')),
+            ] + cell_commands)
+        
         return TableStyle([
             # Header row
             ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
@@ -282,17 +685,76 @@ class ExcelToPDFConverter:
         ])
 
 
+# Trạng thái của process dựng fragment: workbook chỉ mở một lần cho mọi sheet
+# mà process đó nhận (mỗi lần convert song song dùng một pool process mới)
+_fragment_state: dict = {}
+
+
+def _render_sheet_fragment(input_path: Path, index: int, fragment_path: Path):
+    """Dựng một sheet thành file PDF riêng (chạy trong worker process)"""
+    state = _fragment_state.get(input_path)
+    if state is None:
+        converter = ExcelToPDFConverter()
+        reader = open_workbook_reader(input_path)
+        state = _fragment_state[input_path] = (
+            converter, reader, reader.style_cache(converter.font_regular, converter.font_bold),
+            NumberFormatCache(epoch=reader.epoch))
+    converter, reader, style_cache, number_formats = state
+    if index >= len(reader.sheet_names):
+        return  # chart sheet được pre-flight đếm nhưng không có dữ liệu bảng
+    
+    sheet = reader.read_sheet(index)
+    try:
+        logger.info(f"Xử lý sheet {index+1}: {sheet.name}")
+        elements = converter._sheet_elements(sheet, index, style_cache, number_formats)
+    finally:
+        reader.release_sheet(index)
+    converter._new_document(fragment_path).build(elements)
+
+
 # Hàm helper để sử dụng trực tiếp
-def convert_excel_to_pdf(input_path: Path, output_path: Optional[Path] = None) -> Path:
+def convert_excel_to_pdf(input_path: Path, output_path: Optional[Path] = None,
+                         workers: int = 1, part_limits: Optional[PartLimits] = None) -> Path:
     """
     Chuyển Excel sang PDF
     
     Args:
         input_path: Đường dẫn file Excel
         output_path: Đường dẫn file PDF (tùy chọn)
+        workers: Số process dựng các sheet song song (1 = tuần tự, 0 = số CPU)
+        part_limits: Chia kết quả thành nhiều file (None = theo WORDTOPDF_PART_LIMITS)
+        
+    Returns:
+        Path: Đường dẫn file PDF (phần đầu tiên nếu được chia)
+    """
+    converter = ExcelToPDFConverter(workers, part_limits)
+    return converter.convert(input_path, output_path)
+
+
+def convert_excel_stream(source: InputSource,
+                         output: Optional[BinaryIO] = None) -> Optional[bytes]:
+    """
+    Chuyển Excel trong bộ nhớ sang PDF
+    
+    Args:
+        source: Nội dung file Excel (bytes, memoryview, mmap hoặc file object)
+        output: Stream nhận PDF (None = trả về bytes)
+        
+    Returns:
+        Optional[bytes]: Nội dung PDF, None nếu đã ghi vào output
+    """
+    return ExcelToPDFConverter().convert_stream(source, output)
+
+
+def preview_excel(input_path: Path, pages: int = PREVIEW_PAGES) -> bytes:
+    """
+    PDF xem trước vài trang đầu của file Excel
+    
+    Args:
+        input_path: Đường dẫn file Excel
+        pages: Số trang tối đa
         
     Returns:
-        Path: Đường dẫn file PDF
+        bytes: Nội dung PDF
     """
-    converter = ExcelToPDFConverter()
-    return converter.convert(input_path, output_path)
\ No newline at end of file
+    return ExcelToPDFConverter().preview(input_path, pages)
@@ -0,0 +1,138 @@
+"""
+Dựng PDF theo từng phần (fragment) trên nhiều process rồi ghép lại
+
+Dùng cho workbook nhiều sheet và tài liệu Word dài: mỗi phần được build thành
+một file PDF riêng trong worker, sau đó ghép theo thứ tự bằng pypdf. Outline
+(bookmark) của từng phần được giữ lại nên file ghép có outline liên tục.
+pypdf là tuỳ chọn - không cài thì converter build tuần tự như bình thường.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from reportlab.platypus import Flowable
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+
+def pypdf_available() -> bool:
+    """Có pypdf để ghép fragment không"""
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """Số process dựng fragment (0/None = số CPU)"""
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+
+# Mục outline ghi lại khi dựng fragment: (tiêu đề, trang trong fragment từ 0, cấp, x, y)
+OutlineEntry = Tuple[str, int, int, float, float]
+
+
+class Bookmark(Flowable):
+    """
+    Mục outline trỏ tới vị trí trong trang, không chiếm chỗ khi vẽ
+
+    Có sink thì mục được ghi vào sink thay vì outline của PDF: fragment giữa tài
+    liệu có thể bắt đầu ở cấp con (ReportLab không cho outline nhảy cấp), cấp
+    thật chỉ dựng lại được khi ghép (merge_pdfs).
+    """
+
+    def __init__(self, title: str, key: str, level: int = 0,
+                 sink: Optional[List[OutlineEntry]] = None):
+        super().__init__()
+        self.title = title
+        self.key = key
+        self.level = level
+        self.sink = sink
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        self.canv.bookmarkHorizontal(self.key, 0, 0)
+        if self.sink is None:
+            self.canv.addOutlineEntry(self.title, self.key, self.level)
+            return
+        x, y = self.canv.absolutePosition(0, 0)
+        self.sink.append((self.title, self.canv.getPageNumber() - 1, self.level, x, y))
+
+
+def render_fragments(render: Callable, tasks: Sequence[tuple], workers: int,
+                     output_path: Path) -> int:
+    """
+    Dựng các fragment song song rồi ghép thành một PDF
+
+    Args:
+        render: Hàm module-level render(*task, fragment_path) ghi một fragment
+            (không ghi file nếu phần đó không có nội dung); trả về list
+            OutlineEntry nếu fragment ghi outline ra sink, None nếu outline
+            nằm sẵn trong PDF của fragment
+        tasks: Tham số cho từng fragment, theo thứ tự trang trong PDF cuối
+        workers: Số process
+        output_path: File PDF kết quả
+
+    Returns:
+        int: Số trang của PDF đã ghép
+    """
+    with tempfile.TemporaryDirectory(prefix='wordtopdf_parts_') as tmp:
+        fragments = [Path(tmp) / f"part{i:05d}.pdf" for i in range(len(tasks))]
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            futures = [pool.submit(render, *task, fragment)
+                       for task, fragment in zip(tasks, fragments)]
+            # lỗi ở fragment nào thì raise lỗi đó
+            outlines = [future.result() for future in futures]
+        # Task không có nội dung (VD chart sheet) không ghi fragment
+        kept = [(f, outline) for f, outline in zip(fragments, outlines) if f.exists()]
+        return merge_pdfs([f for f, _ in kept], output_path, [outline for _, outline in kept])
+
+
+def merge_pdfs(fragments: List[Path], output_path: Path,
+               outlines: Optional[Sequence[Optional[List[OutlineEntry]]]] = None) -> int:
+    """
+    Ghép các PDF theo thứ tự, giữ outline của từng file
+
+    Args:
+        fragments: Các file PDF theo thứ tự
+        output_path: File PDF kết quả
+        outlines: Outline ghi ra sink của từng fragment (None = lấy outline
+            trong PDF của fragment); cấp lồng nhau được nối tiếp qua các fragment
+
+    Returns:
+        int: Tổng số trang
+    """
+    from pypdf import PdfWriter
+    from pypdf.generic import Fit
+
+    writer = PdfWriter()
+    parents = []  # mục outline cha theo cấp, nối tiếp giữa các fragment
+    for index, fragment in enumerate(fragments):
+        entries = outlines[index] if outlines else None
+        if entries is None:
+            writer.append(str(fragment))
+            parents = []
+            continue
+        offset = len(writer.pages)
+        writer.append(str(fragment), import_outline=False)
+        for title, page, level, x, y in entries:
+            level = min(level, len(parents))
+            del parents[level:]
+            parents.append(writer.add_outline_item(
+                title, offset + page, parent=parents[-1] if parents else None,
+                fit=Fit.xyz(left=x, top=y)))
+    # Font/ảnh giống hệt nhau ở các fragment chỉ giữ một bản
+    if hasattr(writer, 'compress_identical_objects'):
+        writer.compress_identical_objects(remove_identicals=True, remove_orphans=True)
+    with open(output_path, 'wb') as f:
+        writer.write(f)
+    pages = len(writer.pages)
+    logger.info(f"Đã ghép {len(fragments)} phần, {pages} trang")
+    return pages
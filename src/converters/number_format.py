@@ -0,0 +1,583 @@
+"""
+Hiển thị giá trị ô Excel theo number_format (số, %, tiền tệ, ngày giờ)
+
+Mỗi chuỗi format chỉ được phân tích một lần thành một hàm định dạng và được
+cache lại; một sheet thường chỉ có vài format nên vòng lặp theo dòng chỉ còn
+tra dict và gọi hàm, không phân tích chuỗi format cho từng ô.
+"""
+import datetime
+import math
+import re
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from fractions import Fraction
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+Formatter = Callable[[Any], str]
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+EXCEL_EPOCH = datetime.datetime(1899, 12, 30)
+
+# Format ngày ngắn built-in (numFmtId 14) hiển thị theo locale của máy,
+# với người dùng Việt Nam là ngày/tháng/năm
+SHORT_DATE_FORMATS = {'mm-dd-yy', 'm/d/yyyy', 'm/d/yy'}
+
+_DATE_TOKEN = re.compile(r'AM/PM|am/pm|A/P|a/p|[yY]+|[mM]+|[dD]+|[hH]+|[sS]+|\.0+|.', re.S)
+_CONDITION = re.compile(r'^(<=|>=|<>|<|>|=)\s*(-?[\d.]+)$')
+
+
+def format_general(value: Any) -> str:
+    """Định dạng General: số không lộ sai số nhị phân, ngày theo kiểu dd/mm/yyyy"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if not math.isfinite(value):
+            return str(value)
+        if value.is_integer() and abs(value) < 1e15:
+            return str(int(value))
+        # Excel hiển thị tối đa ~10 chữ số có nghĩa ở General
+        return f"{value:.10g}".replace('e', 'E')
+    if isinstance(value, datetime.datetime):
+        if value.time() == datetime.time(0):
+            return value.strftime('%d/%m/%Y')
+        return value.strftime('%d/%m/%Y %H:%M:%S')
+    if isinstance(value, datetime.date):
+        return value.strftime('%d/%m/%Y')
+    if isinstance(value, datetime.time):
+        return value.strftime('%H:%M:%S')
+    return str(value)
+
+
+def _split_sections(fmt: str) -> List[str]:
+    """Tách format thành các section theo dấu ; (bỏ qua ; trong "..." và [...])"""
+    sections, current = [], []
+    quoted = bracket = escaped = False
+    for ch in fmt:
+        if escaped:
+            escaped = False
+        elif ch == '\\' and not quoted:
+            escaped = True
+        elif ch == '"' and not bracket:
+            quoted = not quoted
+        elif ch == '[' and not quoted:
+            bracket = True
+        elif ch == ']' and not quoted:
+            bracket = False
+        elif ch == ';' and not quoted and not bracket:
+            sections.append(''.join(current))
+            current = []
+            continue
+        current.append(ch)
+    sections.append(''.join(current))
+    return sections
+
+
+def _tokenize(section: str) -> List[Tuple[str, str]]:
+    """
+    Tách section thành token: ('lit', text) chữ hiển thị nguyên văn,
+    ('bracket', nội dung trong []) và ('char', ký tự format)
+    """
+    tokens = []
+    i, n = 0, len(section)
+    while i < n:
+        ch = section[i]
+        if ch == '"':
+            end = section.find('"', i + 1)
+            end = n if end < 0 else end
+            tokens.append(('lit', section[i + 1:end]))
+            i = end + 1
+        elif ch == '\\' and i + 1 < n:
+            tokens.append(('lit', section[i + 1]))
+            i += 2
+        elif ch == '_' and i + 1 < n:
+            tokens.append(('lit', ' '))  # chừa chỗ bằng độ rộng ký tự kế tiếp
+            i += 2
+        elif ch == '*' and i + 1 < n:
+            i += 2  # ký tự lấp đầy ô, không có ý nghĩa khi in
+        elif ch == '[':
+            end = section.find(']', i + 1)
+            end = n if end < 0 else end
+            tokens.append(('bracket', section[i + 1:end]))
+            i = end + 1
+        else:
+            tokens.append(('char', ch))
+            i += 1
+    return tokens
+
+
+def _bracket_literal(content: str) -> Optional[str]:
+    """[$₫-42A] -> '₫'; các bracket khác (màu, điều kiện, [h]) -> None"""
+    if content.startswith('$'):
+        return content[1:].split('-', 1)[0]
+    return None
+
+
+def _is_date_section(tokens: List[Tuple[str, str]]) -> bool:
+    for kind, text in tokens:
+        if kind == 'char' and text in 'dDmMyYhHsS':
+            return True
+        if kind == 'bracket' and text.lower().strip('hms') == '' and text:
+            return True
+    return False
+
+
+class _NumberSection:
+    """Section định dạng số: 0, #, ?, dấu phân cách, %, E+, chữ/tiền tệ xung quanh"""
+
+    def __init__(self, tokens: List[Tuple[str, str]], decimal_sep: str, thousands_sep: str):
+        self.decimal_sep = decimal_sep
+        self.thousands_sep = thousands_sep
+        self.parts: List[Optional[str]] = []  # literal, None = vị trí con số
+        pattern = []
+        percent = 0
+        exp_digits = exp_sign = None
+
+        i = 0
+        while i < len(tokens):
+            kind, text = tokens[i]
+            i += 1
+            if kind == 'lit':
+                self.parts.append(text)
+            elif kind == 'bracket':
+                literal = _bracket_literal(text)
+                if literal:
+                    self.parts.append(literal)
+            elif text in '0#?.,':
+                if not pattern:
+                    self.parts.append(None)
+                pattern.append(text)
+            elif (text in 'eE' and pattern and i < len(tokens)
+                  and tokens[i] in (('char', '+'), ('char', '-'))):
+                exp_sign = tokens[i][1]
+                i += 1
+                exp_digits = 0
+                while i < len(tokens) and tokens[i] == ('char', '0'):
+                    exp_digits += 1
+                    i += 1
+            elif text == '%':
+                percent += 1
+                self.parts.append('%')
+            else:
+                self.parts.append(text)
+
+        pattern = ''.join(pattern)
+        int_part, dot, dec_part = pattern.partition('.')
+        stripped = int_part.rstrip(',')
+        # Dấu phẩy cuối phần nguyên hoặc cuối phần thập phân ('#,##0.0,"K"',
+        # '0.0,,"M"') đều là chia 1000
+        scale_commas = len(int_part) - len(stripped) + len(dec_part) - len(dec_part.rstrip(','))
+        dec_part = dec_part.rstrip(',')
+        self.scale = 1000 ** scale_commas / 100 ** percent
+        self.has_number = bool(pattern)
+        self.group = ',' in stripped
+        self.int_min = stripped.count('0')
+        self.has_dot = bool(dot)
+        self.dec_max = sum(1 for c in dec_part if c in '0#?')
+        self.dec_min = dec_part.count('0') + dec_part.count('?')
+        self.exp_digits = exp_digits
+        self.exp_sign = exp_sign
+        self.quantum = Decimal(1).scaleb(-self.dec_max)
+
+    def render(self, value: float) -> str:
+        number = self._render_number(value / self.scale) if self.has_number else ''
+        return ''.join(number if p is None else p for p in self.parts)
+
+    def _render_number(self, value: float) -> str:
+        exponent = ''
+        if self.exp_digits is not None:
+            exp = int(math.floor(math.log10(abs(value)))) - max(self.int_min, 1) + 1 if value else 0
+            value = value / 10 ** exp
+            sign = '-' if exp < 0 else ('+' if self.exp_sign == '+' else '')
+            exponent = f"E{sign}{abs(exp):0{self.exp_digits}d}"
+
+        # Làm tròn kiểu Excel (0.5 -> lên), không theo banker's rounding của round()
+        try:
+            text = str(Decimal(repr(value)).quantize(self.quantum, rounding=ROUND_HALF_UP))
+        except InvalidOperation:
+            # Số quá lớn so với độ chính xác của Decimal
+            text = f"{value:.{self.dec_max}f}"
+        int_s, _, dec_s = text.lstrip('-').partition('.')
+        if self.dec_max > self.dec_min:
+            dec_s = dec_s[:self.dec_min] + dec_s[self.dec_min:].rstrip('0')
+        if int_s == '0' and self.int_min == 0:
+            int_s = ''
+        int_s = int_s.zfill(self.int_min)
+        if self.group and int_s:
+            int_s = f"{int(int_s):,}".replace(',', self.thousands_sep)
+        if self.has_dot:
+            int_s += self.decimal_sep + dec_s
+        return int_s + exponent
+
+
+def _fraction_slash(tokens: List[Tuple[str, str]]) -> Optional[int]:
+    """Vị trí dấu / của section phân số ('# ?/?', '?/8'...), None nếu không phải"""
+    for i, (kind, text) in enumerate(tokens):
+        if (kind == 'char' and text == '/' and 0 < i < len(tokens) - 1
+                and tokens[i - 1][0] == 'char' and tokens[i - 1][1] in '0#?'
+                and tokens[i + 1][0] == 'char' and tokens[i + 1][1] in '0123456789#?'):
+            return i
+    return None
+
+
+class _FractionSection:
+    """Section phân số: '# ?/?', '# ??/??', '?/?', '# ?/8' (mẫu số cố định)"""
+
+    def __init__(self, tokens: List[Tuple[str, str]], slash: int, thousands_sep: str):
+        self.thousands_sep = thousands_sep
+
+        def literal(kind, text):
+            if kind == 'bracket':
+                return _bracket_literal(text) or ''
+            return text
+
+        # Tử số: chuỗi placeholder liền trước dấu /
+        start = slash
+        while start > 0 and tokens[start - 1][0] == 'char' and tokens[start - 1][1] in '0#?':
+            start -= 1
+        self.num_width = slash - start
+        self.num_pad = '?' in ''.join(text for _, text in tokens[start:slash])
+
+        # Phần nguyên: chuỗi placeholder cuối cùng trước tử số (nếu có)
+        int_end = start
+        while int_end > 0 and not (tokens[int_end - 1][0] == 'char'
+                                   and tokens[int_end - 1][1] in '0#?,'):
+            int_end -= 1
+        int_start = int_end
+        while int_start > 0 and tokens[int_start - 1][0] == 'char' and tokens[int_start - 1][1] in '0#?,':
+            int_start -= 1
+        int_pattern = ''.join(text for _, text in tokens[int_start:int_end])
+        self.has_int = bool(int_pattern)
+        self.int_min = int_pattern.count('0')
+        self.group = ',' in int_pattern
+        self.prefix = ''.join(literal(*t) for t in tokens[:int_start])
+        self.middle = ''.join(literal(*t) for t in tokens[int_end:start])
+
+        # Mẫu số: số cố định ('/8', '/100') hoặc placeholder ('/??' = tối đa 99)
+        end = slash + 1
+        if tokens[end][1] in '123456789':
+            while end < len(tokens) and tokens[end][0] == 'char' and tokens[end][1].isdigit():
+                end += 1
+            self.fixed_den = int(''.join(text for _, text in tokens[slash + 1:end]))
+            self.den_width = 0
+        else:
+            while end < len(tokens) and tokens[end][0] == 'char' and tokens[end][1] in '0#?':
+                end += 1
+            self.fixed_den = None
+            self.den_width = end - slash - 1
+        self.suffix = ''.join(literal(*t) for t in tokens[end:])
+
+    def render(self, value: float) -> str:
+        whole, frac = (int(value), value - int(value)) if self.has_int else (0, value)
+        if self.fixed_den:
+            num, den = int(Decimal(repr(frac * self.fixed_den)).quantize(
+                Decimal(1), rounding=ROUND_HALF_UP)), self.fixed_den
+        else:
+            best = Fraction(repr(frac)).limit_denominator(10 ** self.den_width - 1)
+            num, den = best.numerator, best.denominator
+        if self.has_int and num == den:
+            whole, num = whole + 1, 0
+
+        int_s = ''
+        if self.has_int and (whole or self.int_min):
+            int_s = str(whole).zfill(self.int_min)
+            if self.group:
+                int_s = f"{int(int_s):,}".replace(',', self.thousands_sep)
+        if num == 0 and self.has_int:
+            return self.prefix + (int_s or '0') + self.suffix
+
+        num_s = str(num).rjust(self.num_width) if self.num_pad else str(num)
+        den_s = str(den).ljust(self.den_width)
+        fraction = f"{num_s}/{den_s}"
+        if int_s:
+            fraction = int_s + self.middle + fraction
+        return self.prefix + fraction + self.suffix
+
+
+class _DateSection:
+    """Section định dạng ngày giờ: yyyy, mm, dd, hh, mm, ss, AM/PM, [h]"""
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.items: List[Tuple[str, str]] = []  # ('lit', text) hoặc ('tok', code)
+        for kind, text in tokens:
+            if kind == 'lit':
+                self.items.append(('lit', text))
+            elif kind == 'bracket':
+                if text and text.lower().strip('hms') == '':
+                    self.items.append(('tok', '[' + text.lower()[0] + ']'))
+                else:
+                    literal = _bracket_literal(text)
+                    if literal:
+                        self.items.append(('lit', literal))
+            else:
+                self.items.append(('char', text))
+
+        # Ghép các ký tự liền nhau rồi tách token ngày giờ bằng regex
+        merged: List[Tuple[str, str]] = []
+        for kind, text in self.items:
+            if kind == 'char' and merged and merged[-1][0] == 'char':
+                merged[-1] = ('char', merged[-1][1] + text)
+            else:
+                merged.append((kind, text))
+        items = []
+        for kind, text in merged:
+            if kind != 'char':
+                items.append((kind, text))
+                continue
+            for tok in _DATE_TOKEN.findall(text):
+                lower = tok.lower()
+                if lower in ('am/pm', 'a/p') or lower[0] in 'ymdhs' or lower.startswith('.0'):
+                    items.append(('tok', lower))
+                else:
+                    items.append(('lit', tok))
+        self.hour12 = any(code in ('am/pm', 'a/p') for kind, code in items if kind == 'tok')
+
+        # m/mm là phút nếu đứng sau giờ hoặc trước giây
+        codes = [i for i, (kind, _) in enumerate(items) if kind == 'tok']
+        for pos, idx in enumerate(codes):
+            code = items[idx][1]
+            if code[0] != 'm' or len(code) > 2:
+                continue
+            prev_code = items[codes[pos - 1]][1] if pos > 0 else ''
+            next_code = items[codes[pos + 1]][1] if pos + 1 < len(codes) else ''
+            if prev_code[:1] in ('h', '[') or next_code[:1] == 's':
+                items[idx] = ('tok', 'M' * len(code))  # M = phút
+        self.items = items
+
+    def render(self, value: datetime.datetime, elapsed_days: float) -> str:
+        out = []
+        for kind, code in self.items:
+            if kind == 'lit':
+                out.append(code)
+            else:
+                out.append(self._render_token(code, value, elapsed_days))
+        return ''.join(out)
+
+    def _render_token(self, code: str, v: datetime.datetime, elapsed_days: float) -> str:
+        c = code[0]
+        n = len(code)
+        if c == 'y':
+            return f"{v.year % 100:02d}" if n <= 2 else f"{v.year:04d}"
+        if c == 'm':
+            if n == 1:
+                return str(v.month)
+            if n == 2:
+                return f"{v.month:02d}"
+            name = MONTHS[v.month - 1]
+            return name[:3] if n == 3 else (name[0] if n == 5 else name)
+        if c == 'd':
+            if n <= 2:
+                return f"{v.day:0{n}d}"
+            name = WEEKDAYS[v.weekday()]
+            return name[:3] if n == 3 else name
+        if c == 'h':
+            hour = v.hour
+            if self.hour12:
+                hour = hour % 12 or 12
+            return f"{hour:0{min(n, 2)}d}"
+        if c == 'M':
+            return f"{v.minute:0{min(n, 2)}d}"
+        if c == 's':
+            return f"{v.second:0{min(n, 2)}d}"
+        if c == '.':
+            digits = n - 1
+            return '.' + f"{v.microsecond / 1e6:.{digits}f}"[2:]
+        if c == '[':
+            unit = {'h': 24, 'm': 1440, 's': 86400}[code[1]]
+            return str(int(elapsed_days * unit))
+        if code == 'am/pm':
+            return 'AM' if v.hour < 12 else 'PM'
+        if code == 'a/p':
+            return 'A' if v.hour < 12 else 'P'
+        return code
+
+
+class NumberFormatCache:
+    """Biên dịch number_format của Excel thành hàm định dạng, mỗi format một lần"""
+
+    def __init__(self, epoch: datetime.datetime = EXCEL_EPOCH,
+                 decimal_sep: str = '.', thousands_sep: str = ',',
+                 short_date: str = 'dd/mm/yyyy'):
+        """
+        Args:
+            epoch: Mốc ngày 0 của workbook (1899-12-30, hoặc 1904 trên Mac cũ)
+            decimal_sep: Dấu thập phân khi in
+            thousands_sep: Dấu phân cách hàng nghìn khi in
+            short_date: Format dùng cho ngày ngắn built-in (phụ thuộc locale)
+        """
+        self.epoch = epoch
+        self.decimal_sep = decimal_sep
+        self.thousands_sep = thousands_sep
+        self.short_date = short_date
+        self._compiled: Dict[str, Formatter] = {'General': format_general}
+        self._by_style: Dict[int, Formatter] = {}
+
+    def formatter_for_cell(self, cell) -> Formatter:
+        """Hàm định dạng của ô, tra theo style id nên không đọc number_format mỗi ô"""
+        if not cell.has_style:
+            return format_general
+        style_id = cell.style_id
+        formatter = self._by_style.get(style_id)
+        if formatter is None:
+            formatter = self._by_style[style_id] = self.compile(cell.number_format)
+        return formatter
+
+    def format(self, value: Any, fmt: str) -> str:
+        """
+        Định dạng một giá trị (tiện cho code ngoài vòng lặp chính)
+
+        >>> cache = NumberFormatCache()
+        >>> cache.format(1234567, '#,##0.0,"K"')
+        '1,234.6K'
+        >>> cache.format(1500000, '0.0,,"M"')
+        '1.5M'
+        >>> cache.format(1234567, '#,##0,')
+        '1,235'
+        >>> cache.format(1.75, '# ?/?')
+        '1 3/4'
+        """
+        return self.compile(fmt)(value)
+
+    def compile(self, fmt: Optional[str]) -> Formatter:
+        """
+        Biên dịch (có cache) một chuỗi number_format
+
+        Args:
+            fmt: Chuỗi format Excel VD: '#,##0.00', '0%', 'dd/mm/yyyy'
+
+        Returns:
+            Formatter: Hàm value -> str
+        """
+        fmt = fmt or 'General'
+        formatter = self._compiled.get(fmt)
+        if formatter is None:
+            try:
+                formatter = self._compile(fmt)
+            except Exception as e:
+                logger.warning(f"Không hiểu number format {fmt!r}: {e}")
+                formatter = format_general
+            self._compiled[fmt] = formatter
+        return formatter
+
+    def _compile(self, fmt: str) -> Formatter:
+        if fmt in SHORT_DATE_FORMATS:
+            fmt = self.short_date
+        raw_sections = _split_sections(fmt)
+
+        text_section = None
+        if len(raw_sections) >= 4 or (len(raw_sections) > 1 and '@' in raw_sections[-1]):
+            text_section = raw_sections.pop()
+        elif '@' in raw_sections[0] and len(raw_sections) == 1:
+            text_section = raw_sections[0]
+            raw_sections = ['General']
+
+        sections = []  # (condition, renderer, is_date)
+        for raw in raw_sections:
+            if raw.strip().lower() in ('general', ''):
+                sections.append((None, None, False))
+                continue
+            tokens = _tokenize(raw)
+            condition = None
+            for kind, text in tokens:
+                m = _CONDITION.match(text.strip()) if kind == 'bracket' else None
+                if m:
+                    condition = (m.group(1), float(m.group(2)))
+            slash = _fraction_slash(tokens)
+            if _is_date_section(tokens):
+                sections.append((condition, _DateSection(tokens), True))
+            elif slash is not None:
+                sections.append((condition, _FractionSection(
+                    tokens, slash, self.thousands_sep), False))
+            else:
+                sections.append((condition, _NumberSection(
+                    tokens, self.decimal_sep, self.thousands_sep), False))
+
+        text_render = self._compile_text(text_section) if text_section else None
+        has_conditions = any(cond for cond, _, _ in sections)
+        epoch = self.epoch
+
+        def pick(value: float):
+            """Chọn section theo điều kiện hoặc dấu; trả về (section, giá trị, thêm dấu -)"""
+            if has_conditions:
+                for cond, render, is_date in sections:
+                    if cond and _test(cond, value):
+                        return (cond, render, is_date), abs(value), False
+                rest = [s for s in sections if not s[0]] or sections[-1:]
+                return rest[0], abs(value), value < 0
+            if value < 0 and len(sections) >= 2:
+                return sections[1], -value, False
+            if value == 0 and len(sections) >= 3:
+                return sections[2], value, False
+            return sections[0], value, value < 0 and len(sections) == 1
+
+        def formatter(value: Any) -> str:
+            if value is None:
+                return ''
+            if isinstance(value, str):
+                return text_render(value) if text_render else value
+            if isinstance(value, bool):
+                return format_general(value)
+
+            if isinstance(value, (datetime.datetime, datetime.date, datetime.time, datetime.timedelta)):
+                dt_value, elapsed = _to_datetime(value, epoch)
+                (_, render, is_date) = sections[0]
+                if is_date:
+                    return render.render(dt_value, elapsed)
+                return format_general(value)
+
+            if not isinstance(value, (int, float)):
+                return str(value)
+
+            (_, render, is_date), number, negate = pick(value)
+            if render is None:
+                return format_general(-number if negate else number)
+            if is_date:
+                try:
+                    dt_value = epoch + datetime.timedelta(days=number)
+                except OverflowError:
+                    return format_general(value)
+                return render.render(dt_value, number)
+            text = render.render(abs(number) if negate else number)
+            return ('-' + text if negate else text).strip()
+
+        return formatter
+
+    def _compile_text(self, section: str) -> Formatter:
+        """Section văn bản: '@' được thay bằng giá trị"""
+        parts = []
+        for kind, text in _tokenize(section):
+            if kind == 'char' and text == '@':
+                parts.append(None)
+            elif kind != 'bracket':
+                parts.append(text)
+        return lambda value: ''.join(value if p is None else p for p in parts)
+
+
+def _test(condition: Tuple[str, float], value: float) -> bool:
+    op, bound = condition
+    return {
+        '<': value < bound, '<=': value <= bound, '>': value > bound,
+        '>=': value >= bound, '=': value == bound, '<>': value != bound,
+    }[op]
+
+
+def _to_datetime(value: Any, epoch: datetime.datetime) -> Tuple[datetime.datetime, float]:
+    """Chuyển date/time/timedelta sang (datetime, số ngày kể từ epoch) để render"""
+    if isinstance(value, datetime.timedelta):
+        return epoch + value, value.total_seconds() / 86400
+    if isinstance(value, datetime.time):
+        dt_value = datetime.datetime.combine(epoch.date(), value)
+    elif isinstance(value, datetime.datetime):
+        dt_value = value
+    else:
+        dt_value = datetime.datetime.combine(value, datetime.time(0))
+    return dt_value, (dt_value - epoch).total_seconds() / 86400
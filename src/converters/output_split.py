@@ -0,0 +1,238 @@
+"""
+Chia PDF kết quả thành nhiều phần theo số trang, số dòng bảng hoặc dung lượng
+
+Sheet vài trăm nghìn dòng cho ra một PDF hàng nghìn trang mà trình xem / mail
+server khó mở, và file chỉ được ghi khi build xong. PartedDocTemplate đóng phần
+hiện tại ở đầu trang mới khi đạt giới hạn: canvas được ghi ngay ra
+<tên>.part001.pdf, <tên>.part002.pdf... rồi bỏ đi, nên bộ nhớ các trang đã vẽ
+được trả dần và bên nhận xử lý được phần đầu trong lúc phần sau còn đang dựng.
+Bảng bị cắt giữa hai phần lặp lại dòng header; trang đầu mỗi phần sau có dòng
+chú thích "<sheet> (tiếp theo) - phần N" và mục outline riêng.
+
+Bật bằng biến môi trường WORDTOPDF_PART_LIMITS (VD "pages=500,rows=50000,mb=20")
+hoặc --part-pages / --part-rows / --part-mb của main_batch.py.
+"""
+import os
+import zlib
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfdoc import PDFDocument
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table
+
+from ..logging.logger_setup import get_logger
+from .fragments import Bookmark
+from .table_model import WindowedTable
+
+logger = get_logger(__name__)
+
+PART_LIMITS_ENV = 'WORDTOPDF_PART_LIMITS'
+_MB = 1024 ** 2
+# Chênh lệch cho phép khi tách bảng đúng theo tổng chiều cao các dòng
+_HEIGHT_SLACK = 0.01
+# Mỗi trang thêm object /Page, header stream và mục xref ngoài nội dung trang;
+# mỗi file thêm font nhúng (subset) và outline
+_PAGE_OVERHEAD = 250
+_PART_OVERHEAD = 32 * 1024
+
+
+class PartLimits(NamedTuple):
+    """Giới hạn của mỗi phần PDF (None = không giới hạn theo tiêu chí đó)"""
+    max_pages: Optional[int] = None
+    max_rows: Optional[int] = None  # dòng dữ liệu bảng, không tính header lặp lại
+    max_bytes: Optional[int] = None  # ước lượng theo nội dung trang đã nén
+
+    def __bool__(self):
+        return any(self)
+
+
+def parse_part_limits(text: str) -> PartLimits:
+    """
+    Đọc giới hạn dạng "pages=500,rows=50000,mb=20"
+
+    Args:
+        text: Các cặp key=giá trị cách nhau bởi dấu phẩy (0 = không giới hạn)
+
+    Returns:
+        PartLimits: Giới hạn đã đọc
+
+    Raises:
+        ValueError: Key hoặc giá trị không hợp lệ
+    """
+    values = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        key, _, value = item.partition('=')
+        key = key.strip().lower()
+        if key not in ('pages', 'rows', 'mb'):
+            raise ValueError(f"Giới hạn không hợp lệ: {item} (dùng pages, rows, mb)")
+        number = float(value)
+        if number > 0:
+            values[key] = number
+    return PartLimits(
+        max_pages=int(values['pages']) if 'pages' in values else None,
+        max_rows=int(values['rows']) if 'rows' in values else None,
+        max_bytes=int(values['mb'] * _MB) if 'mb' in values else None,
+    )
+
+
+def configured_part_limits() -> Optional[PartLimits]:
+    """Giới hạn mỗi phần theo WORDTOPDF_PART_LIMITS, None nếu không bật"""
+    value = os.environ.get(PART_LIMITS_ENV, '').strip()
+    if not value:
+        return None
+    try:
+        limits = parse_part_limits(value)
+    except ValueError as e:
+        logger.warning(f"{PART_LIMITS_ENV}={value} không hợp lệ, không chia phần: {e}")
+        return None
+    return limits or None
+
+
+def enable_part_limits(pages: int = 0, rows: int = 0, mb: float = 0):
+    """Bật chia phần cho process này và các worker tạo sau đó"""
+    os.environ[PART_LIMITS_ENV] = f"pages={pages},rows={rows},mb={mb}"
+
+
+def part_path(output_path: Path, index: int) -> Path:
+    """File của phần thứ index (từ 1): bao_cao.pdf -> bao_cao.part001.pdf"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.part{index:03d}{output_path.suffix}")
+
+
+class PartBreak(PageBreak):
+    """Sang trang và đóng phần hiện tại, trang mới thuộc phần kế tiếp"""
+
+
+def _split_table_rows(table: Table, rows: int, width: float, height: float) -> List[Table]:
+    """
+    Tách bảng sau rows dòng đầu (tính cả header) theo đúng cách ReportLab tách
+    bảng giữa hai trang: phần sau lặp lại header, style / ô gộp được chia theo
+
+    Returns:
+        List[Table]: [phần đầu, phần sau], ít hơn 2 phần nếu không tách được
+    """
+    table.wrap(width, height)
+    return table.split(width, sum(table._rowHeights[:rows]) + _HEIGHT_SLACK)
+
+
+class PartedDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate ghi kết quả thành nhiều file, mỗi file một phần"""
+
+    def __init__(self, output_path: Path, limits: PartLimits,
+                 caption_font: str = 'Helvetica', **kw):
+        """
+        Args:
+            output_path: File PDF kết quả (chỉ có một phần thì dùng đúng tên này)
+            limits: Giới hạn mỗi phần
+            caption_font: Font dòng chú thích đầu phần (tên sheet có thể có dấu)
+        """
+        self.output_path = Path(output_path)
+        super().__init__(str(part_path(self.output_path, 1)), **kw)
+        self.limits = limits
+        self.caption_font = caption_font
+        self.parts: List[Path] = []  # các file đã ghi, theo thứ tự
+        self._section = None  # mục outline gần nhất (tên sheet) cho chú thích phần sau
+        self._part_pages = 0
+        self._part_rows = 0
+        self._part_bytes = _PART_OVERHEAD
+        self._part_break = False
+        self._continued = False
+
+    def build(self, flowables, **kw):
+        super().build(flowables, **kw)
+        self.parts.append(part_path(self.output_path, len(self.parts) + 1))
+        if len(self.parts) == 1:
+            os.replace(self.parts[0], self.output_path)
+            self.parts = [self.output_path]
+        else:
+            self._log_part(self.parts[-1])
+
+    def filterFlowables(self, flowables):
+        # Bảng vượt số dòng còn lại của phần: tách đúng tại giới hạn
+        first = flowables[0]
+        if not self.limits.max_rows:
+            return
+        left = self.limits.max_rows - self._part_rows
+        if isinstance(first, WindowedTable) and 0 < left < first.row_count:
+            pieces = first.split_rows(left)
+            if len(pieces) == 2:
+                flowables[0:1] = [pieces[0], PartBreak(), pieces[1]]
+        elif isinstance(first, Table) and 0 < left < first._nrows - first.repeatRows:
+            pieces = _split_table_rows(first, first.repeatRows + left, self.width, self.height)
+            if len(pieces) == 2:
+                flowables[0:1] = [pieces[0], PartBreak(), pieces[1]]
+
+    def afterFlowable(self, flowable):
+        if isinstance(flowable, Bookmark):
+            self._section = flowable.title
+        elif isinstance(flowable, Table):
+            # Mỗi mảnh bảng trên một trang có repeatRows dòng header đứng đầu
+            self._part_rows += max(flowable._nrows - flowable.repeatRows, 0)
+        elif isinstance(flowable, WindowedTable):
+            self._part_rows += flowable.row_count
+        elif isinstance(flowable, PartBreak):
+            self._part_break = True
+
+    def handle_pageBegin(self):
+        # Trang trước đã showPage xong, trang mới chưa vẽ gì
+        if self._part_pages and self._part_full():
+            self._next_part()
+        self._part_pages += 1
+        super().handle_pageBegin()
+
+    def handle_pageEnd(self):
+        if self.limits.max_bytes:
+            # Nội dung trang được nén khi ghi file, nén thử để ước lượng kích thước
+            content = '\n'.join(self.canv._code).encode('utf-8', 'replace')
+            size = len(zlib.compress(content))
+            if rl_config.useA85:
+                size = size * 5 // 4  # ReportLab mã hoá thêm ASCII85 sau khi nén
+            self._part_bytes += size + _PAGE_OVERHEAD
+        super().handle_pageEnd()
+
+    def beforePage(self):
+        if self._continued:
+            self._continued = False
+            self._draw_caption()
+
+    def _part_full(self) -> bool:
+        limits = self.limits
+        return bool(self._part_break
+                    or (limits.max_pages and self._part_pages >= limits.max_pages)
+                    or (limits.max_rows and self._part_rows >= limits.max_rows)
+                    or (limits.max_bytes and self._part_bytes >= limits.max_bytes))
+
+    def _next_part(self):
+        """Ghi phần hiện tại ra đĩa và mở canvas cho phần kế tiếp"""
+        path = part_path(self.output_path, len(self.parts) + 1)
+        self.canv.save()
+        self.parts.append(path)
+        self._log_part(path)
+        # build() giữ canvas đầu tiên tới cuối: bỏ các trang đã ghi để trả bộ nhớ
+        self.canv._doc = PDFDocument()
+        self.canv = self._makeCanvas(filename=str(part_path(self.output_path, len(self.parts) + 1)))
+        self.canv._doctemplate = self
+        self._part_pages = self._part_rows = 0
+        self._part_bytes = _PART_OVERHEAD
+        self._part_break = False
+        self._continued = True
+
+    def _draw_caption(self):
+        """Chú thích và mục outline ở trang đầu của phần tiếp theo"""
+        index = len(self.parts) + 1
+        text = f"{self._section} (tiếp theo) - phần {index}" if self._section else f"Phần {index}"
+        canv = self.canv
+        canv.saveState()
+        canv.setFont(self.caption_font, 8)
+        canv.setFillColor(colors.HexColor('#7F8C8D'))
+        canv.drawString(self.leftMargin, self.pagesize[1] - self.topMargin + 8, text)
+        canv.restoreState()
+        if self._section:
+            key = f"part{index}"
+            canv.bookmarkHorizontal(key, 0, self.pagesize[1])
+            canv.addOutlineEntry(self._section, key, 0)
+
+    def _log_part(self, path: Path):
+        logger.info(f"💾 Đã ghi phần {len(self.parts)}: {path.name}")
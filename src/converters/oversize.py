@@ -0,0 +1,202 @@
+"""
+Chia trước nội dung lớn hơn một trang: đoạn văn rất dài, ô bảng hàng nghìn dòng
+
+ReportLab không chia được một dòng bảng cao hơn khung trang (LayoutError
+"too large on page"), còn Paragraph dài nhiều trang bị ngắt dòng lại toàn bộ
+phần còn lại ở mỗi trang nên thời gian tăng theo bình phương độ dài. Ở đây
+nội dung được chia thành các phần vừa một trang trước khi build, định dạng
+của từng đoạn được giữ nguyên.
+"""
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from reportlab.platypus import Flowable, Paragraph
+
+# Đoạn văn Word dài hơn ngưỡng này được chia (~ dưới một trang A4 chữ 11pt)
+MAX_PARAGRAPH_CHARS = 3000
+
+# Run: (text, bold, italic)
+Run = Tuple[str, bool, bool]
+
+
+def _cut_pieces(items: Sequence[tuple], max_chars: int) -> List[List[tuple]]:
+    """
+    Chia dãy (text, payload) thành các phần không quá max_chars ký tự
+
+    Cắt ưu tiên ở xuống dòng, sau đó ở khoảng trắng, từ dài hơn cả phần mới
+    bị cắt giữa chừng. Đoạn bị cắt giữ payload (định dạng) ở cả hai phần.
+    """
+    pieces: List[List[tuple]] = []
+    piece: List[tuple] = []
+    count = 0
+    for text, payload in items:
+        while count + len(text) > max_chars:
+            room = max_chars - count
+            cut = text.rfind('\n', 0, room + 1)
+            if cut <= 0:
+                cut = text.rfind(' ', 0, room + 1)
+            if cut <= 0:
+                if piece:
+                    # Không có chỗ cắt trong phần còn trống: sang phần mới
+                    pieces.append(piece)
+                    piece, count = [], 0
+                    continue
+                cut = room
+            piece.append((text[:cut], payload))
+            pieces.append(piece)
+            piece, count = [], 0
+            text = text[cut + 1:] if text[cut] in '\n ' else text[cut:]
+        piece.append((text, payload))
+        count += len(text)
+    if piece or not pieces:
+        pieces.append(piece)
+    return pieces
+
+
+def split_runs(runs: Sequence[Run], max_chars: int = MAX_PARAGRAPH_CHARS) -> List[List[Run]]:
+    """Chia các run (text, bold, italic) của một đoạn thành các phần không quá max_chars"""
+    items = [(text, (bold, italic)) for text, bold, italic in runs]
+    return [[(text, bold, italic) for text, (bold, italic) in piece if text]
+            for piece in _cut_pieces(items, max_chars)]
+
+
+def split_text_lines(text: str, line_height: float, max_height: float) -> List[str]:
+    """Chia chuỗi đã ngắt dòng ('\\n') thành các phần cao không quá max_height"""
+    max_lines = max(1, int(max_height // line_height))
+    lines = text.split('\n')
+    if len(lines) <= max_lines:
+        return [text]
+    return ['\n'.join(lines[i:i + max_lines]) for i in range(0, len(lines), max_lines)]
+
+
+def split_paragraph(para: Paragraph, width: float, max_height: float) -> List[Paragraph]:
+    """
+    Chia Paragraph (ô rich text) thành các phần cao không quá max_height
+
+    Paragraph.split ngắt dòng lại toàn bộ phần còn lại sau mỗi lần chia nên chỉ
+    dùng cho phần nhỏ: đoạn được đo một lần rồi chia frag (giữ định dạng) theo
+    tỉ lệ chiều cao, mỗi phần khoảng 3/4 max_height.
+    """
+    items = [(getattr(frag, 'text', ''), frag) for frag in para.frags]  # wrap() thay frags
+    _, height = para.wrap(width, max_height)
+    if height <= max_height:
+        return [para]
+    total = sum(len(text) for text, _ in items)
+    max_chars = max(1, int(total * max_height * 0.75 / height))
+
+    pieces = []
+    for piece in _cut_pieces(items, max_chars):
+        frags = [frag if text == getattr(frag, 'text', '') else frag.clone(text=text)
+                 for text, frag in piece]
+        if not frags:
+            continue
+        part = para.__class__('', para.style, frags=frags)
+        # Phần vẫn cao hơn (chữ to, nhiều xuống dòng): chia tiếp bằng ReportLab
+        while True:
+            parts = part.split(width, max_height) if part.wrap(width, max_height)[1] > max_height \
+                else [part]
+            pieces.append(parts[0])
+            if len(parts) < 2:
+                break
+            part = parts[1]
+    return pieces or [para]
+
+
+def split_flowables(flowables: Sequence[Flowable], width: float,
+                    max_height: float) -> List[List[Flowable]]:
+    """
+    Chia nội dung một ô (list flowable) thành các nhóm cao không quá max_height
+
+    Flowable được xếp lần lượt vào nhóm, Paragraph cao hơn max_height được chia
+    bằng split_paragraph (giữ định dạng), flowable khác (bảng lồng) bằng
+    split() của ReportLab; không chia được thì để nguyên một nhóm.
+    """
+    pieces: List[List[Flowable]] = []
+    piece: List[Flowable] = []
+    used = 0.0
+    for flowable in flowables:
+        _, height = flowable.wrap(width, max_height)
+        parts = [(flowable, height)]
+        if height > max_height:
+            if isinstance(flowable, Paragraph):
+                split = split_paragraph(flowable, width, max_height)
+            else:
+                split = []
+                rest = flowable
+                while True:
+                    halves = rest.split(width, max_height)
+                    if len(halves) < 2:
+                        split.append(rest)
+                        break
+                    split.append(halves[0])
+                    rest = halves[1]
+            parts = [(part, part.wrap(width, max_height)[1]) for part in split]
+        for part, height in parts:
+            if piece and used + height > max_height:
+                pieces.append(piece)
+                piece, used = [], 0.0
+            piece.append(part)
+            used += height
+    if piece or not pieces:
+        pieces.append(piece)
+    return pieces
+
+
+def split_tall_rows(data: List[list],
+                    split_cell: Callable[[int, int, object], List]) -> Optional[List[int]]:
+    """
+    Tách dòng bảng quá cao thành nhiều dòng nối tiếp (sửa data tại chỗ)
+
+    Args:
+        data: Dữ liệu bảng
+        split_cell: split_cell(row, col, value) -> các phần của ô (một phần nếu vừa)
+
+    Returns:
+        Optional[List[int]]: row_map[dòng mới] = dòng cũ, None nếu không dòng nào bị tách
+    """
+    new_data = []
+    row_map = []
+    changed = False
+    for r, row in enumerate(data):
+        parts = [split_cell(r, c, value) if value else [value] for c, value in enumerate(row)]
+        count = max(len(p) for p in parts) if parts else 1
+        changed = changed or count > 1
+        for i in range(count):
+            new_data.append([p[i] if i < len(p) else '' for p in parts])
+            row_map.append(r)
+    if not changed:
+        return None
+    data[:] = new_data
+    return row_map
+
+
+def remap_commands(commands: Sequence[tuple], row_map: List[int]) -> List[tuple]:
+    """
+    Chuyển lệnh TableStyle theo chỉ số dòng cũ sang bảng đã tách dòng
+
+    Lệnh trên một vùng dòng phủ luôn các dòng nối tiếp. SPAN trong một dòng
+    được lặp cho từng dòng nối tiếp (mỗi dòng giữ một phần nội dung ô gộp).
+    Chỉ số âm (tính từ cuối) giữ nguyên. Lệnh bắt đầu sau dòng cuối của bảng
+    (VD style dòng dữ liệu '(0, 1)' trên bảng chỉ có một dòng) bị bỏ, lệnh kết
+    thúc sau dòng cuối được cắt về dòng cuối.
+    """
+    first = {}
+    last = {}
+    for new, old in enumerate(row_map):
+        first.setdefault(old, new)
+        last[old] = new
+    end = len(row_map) - 1
+
+    result = []
+    for command in commands:
+        name, (c1, r1), (c2, r2) = command[0], command[1], command[2]
+        rest = tuple(command[3:])
+        if r1 >= 0 and r1 not in first:
+            continue
+        if name == 'SPAN' and r1 == r2 and r1 >= 0:
+            for new in range(first[r1], last[r1] + 1):
+                result.append((name, (c1, new), (c2, new)) + rest)
+            continue
+        new_r1 = first[r1] if r1 >= 0 else r1
+        new_r2 = last.get(r2, end) if r2 >= 0 else r2
+        result.append((name, (c1, new_r1), (c2, new_r2)) + rest)
+    return result
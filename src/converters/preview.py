@@ -0,0 +1,38 @@
+"""
+Chế độ xem trước: chỉ dựng vài trang đầu của tài liệu
+
+Converter đọc giới hạn đầu vào (vài chục dòng mỗi sheet, vài chục paragraph
+đầu) và dựng bằng PreviewDocTemplate: layout dừng ngay khi sang trang thứ
+pages + 1, phần còn lại của tài liệu không được đọc hay đo kích thước.
+"""
+from reportlab.platypus import SimpleDocTemplate
+
+PREVIEW_PAGES = 2
+# Ước lượng trên của số dòng bảng / paragraph vừa một trang: đọc thừa một ít
+# rẻ hơn nhiều so với việc trang xem trước bị thiếu nội dung
+ROWS_PER_PAGE = 60
+PARAGRAPHS_PER_PAGE = 40
+
+
+class _PageLimitReached(Exception):
+    """Đã đủ số trang xem trước"""
+
+
+class PreviewDocTemplate(SimpleDocTemplate):
+    """SimpleDocTemplate dừng layout sau max_pages trang"""
+
+    def __init__(self, filename, max_pages: int = PREVIEW_PAGES, **kw):
+        super().__init__(filename, **kw)
+        self.max_pages = max_pages
+
+    def handle_pageBegin(self):
+        # Trang max_pages đã showPage xong, trang mới chưa vẽ gì
+        if self.page >= self.max_pages:
+            raise _PageLimitReached()
+        super().handle_pageBegin()
+
+    def build(self, flowables, **kw):
+        try:
+            super().build(flowables, **kw)
+        except _PageLimitReached:
+            self.canv.save()
@@ -0,0 +1,79 @@
+"""
+Chỉ mục vùng gộp ô (merged cells) dùng chung cho bảng Excel và Word
+"""
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+Cell = Tuple[int, int]  # (row, col), đánh số từ 0
+
+
+class SpanIndex:
+    """
+    Chỉ mục các vùng gộp ô của một bảng
+
+    Xây một lần cho mỗi bảng, sau đó tra cứu ô bất kỳ trong O(1) nên bảng có
+    hàng nghìn vùng gộp cũng không phải quét lại danh sách vùng cho từng ô.
+    Chỉ lưu ô trên-trái -> ô dưới-phải của mỗi vùng: vùng gộp rất lớn
+    (VD A1:Z100000) không tốn bộ nhớ theo số ô bị che.
+    """
+
+    def __init__(self):
+        self._anchors: Dict[Cell, Cell] = {}  # ô trên-trái -> ô dưới-phải
+
+    def __len__(self) -> int:
+        return len(self._anchors)
+
+    def __bool__(self) -> bool:
+        return bool(self._anchors)
+
+    def add(self, row1: int, col1: int, row2: int, col2: int):
+        """Thêm vùng gộp (row1, col1) .. (row2, col2), bỏ qua vùng chỉ có một ô"""
+        if row2 < row1 or col2 < col1 or (row1 == row2 and col1 == col2):
+            return
+        self._anchors[(row1, col1)] = (row2, col2)
+
+    @classmethod
+    def from_worksheet(cls, ws) -> 'SpanIndex':
+        """Tạo chỉ mục từ ws.merged_cells của openpyxl (toạ độ Excel đánh số từ 1)"""
+        index = cls()
+        merged = getattr(ws, 'merged_cells', None)
+        for rng in getattr(merged, 'ranges', ()):
+            index.add(rng.min_row - 1, rng.min_col - 1, rng.max_row - 1, rng.max_col - 1)
+        return index
+
+    def end_of(self, row: int, col: int) -> Optional[Cell]:
+        """Ô dưới-phải nếu (row, col) là ô trên-trái của một vùng gộp"""
+        return self._anchors.get((row, col))
+
+    def wide_anchors(self) -> Iterable[Cell]:
+        """Các ô trên-trái của vùng gộp trải nhiều cột"""
+        return (a for a, end in self._anchors.items() if end[1] > a[1])
+
+    def span_commands(self, kept_rows: Optional[List[int]] = None,
+                      max_col: Optional[int] = None) -> List[tuple]:
+        """
+        Sinh lệnh SPAN cho ReportLab Table
+
+        Args:
+            kept_rows: Danh sách (tăng dần) chỉ số dòng gốc được giữ lại trong bảng
+                PDF, dòng thứ i của bảng là dòng gốc kept_rows[i]. None = giữ nguyên.
+            max_col: Chỉ số cột cuối của bảng, vùng vượt quá bị cắt bớt
+
+        Returns:
+            List[tuple]: ('SPAN', (col1, row1), (col2, row2)) theo toạ độ bảng PDF
+        """
+        commands = []
+        for (row1, col1), (row2, col2) in self._anchors.items():
+            if kept_rows is not None:
+                # Map sang dòng PDF: dòng giữ lại đầu tiên / cuối cùng trong vùng
+                start = bisect_left(kept_rows, row1)
+                end = bisect_right(kept_rows, row2) - 1
+                if start > end:
+                    continue
+                row1, row2 = start, end
+            if max_col is not None:
+                col2 = min(col2, max_col)
+            if row1 == row2 and col1 == col2:
+                continue
+            commands.append(('SPAN', (col1, row1), (col2, row2)))
+        return commands
@@ -0,0 +1,360 @@
+"""
+Bảng trung gian dạng cột cho sheet Excel lớn
+
+Thay cho List[List[str]] (một list mỗi dòng, một str mỗi ô): mỗi cột là một
+array('I') mã chuỗi trỏ vào từ điển chuỗi chung của bảng, nên giá trị lặp lại
+(tên lớp, "Đạt", ngày...) chỉ được lưu một lần và mỗi ô chỉ tốn 4 byte. Style
+ô cũng được mã hoá theo cột, dòng Excel gốc nằm trong array. Ô trống là mã 0
+nên dòng ngắn hơn không phải đệm thêm ''.
+
+WindowedTable vẽ bảng theo từng cửa sổ dòng: mỗi trang chỉ dựng ReportLab Table
+cho các dòng của trang đó (kèm header lặp lại). Một Table chứa cả sheet bị
+ReportLab đo lại và chép toàn bộ phần còn lại ở mỗi lần tách trang, bảng hàng
+chục nghìn dòng vì vậy tốn thời gian bậc hai và giữ một CellStyle cho mỗi ô.
+"""
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Set
+
+from reportlab.platypus import Flowable, Table, TableStyle
+
+# Số dòng của cửa sổ đầu tiên (cửa sổ sau theo số dòng vừa một trang)
+_FIRST_WINDOW = 64
+# Lệnh style được chia theo dải dòng để mỗi cửa sổ chỉ xét lệnh gần nó
+_BAND_ROWS = 64
+# Header cao hơn phần này của khung trang không được lặp lại ở trang sau
+# (trang tiếp theo gần như chỉ còn chỗ cho header)
+_MAX_HEADER_SHARE = 0.25
+
+
+class SheetTable:
+    """Bảng dạng cột: chuỗi mã hoá từ điển, style và dòng gốc lưu trong array"""
+
+    def __init__(self):
+        self.strings: List[str] = ['']  # mã -> chuỗi, mã 0 = ô trống
+        self._codes: Dict[str, int] = {'': 0}
+        self.styles: list = [None]  # mã -> CellStyle, mã 0 = không định dạng
+        self._style_codes: Dict[int, int] = {}  # id(style) -> mã (style được giữ trong self.styles)
+        self.columns: List[array] = []  # mã chuỗi từng ô, theo cột
+        self.style_columns: List[array] = []  # mã style từng ô (rỗng nếu bảng không có style)
+        self.source_rows = array('I')  # dòng Excel (từ 0) của từng dòng bảng
+        self.objects: Dict[int, Dict[int, object]] = {}  # dòng -> {cột: Paragraph}, thưa
+        self.row_count = 0
+
+    @property
+    def col_count(self) -> int:
+        return len(self.columns)
+
+    def intern(self, text: str) -> int:
+        """Mã của chuỗi trong từ điển (thêm mới nếu chưa có)"""
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self.strings)
+            self.strings.append(text)
+        return code
+
+    def add_row(self, values: Sequence[str], source_row: int,
+                styles: Optional[Sequence] = None):
+        """
+        Thêm một dòng
+
+        Args:
+            values: Chuỗi hiển thị từng ô
+            source_row: Dòng Excel (từ 0)
+            styles: Style từng ô (None = cả dòng không định dạng)
+        """
+        row = self.row_count
+        while len(self.columns) < len(values):
+            # Cột mới: các dòng trước là ô trống
+            self.columns.append(array('I', [0]) * row)
+            if self.style_columns:
+                self.style_columns.append(array('I', [0]) * row)
+        if styles is not None and not self.style_columns:
+            self.style_columns = [array('I', [0]) * row for _ in self.columns]
+
+        intern = self.intern
+        n = len(values)
+        for col, column in enumerate(self.columns):
+            column.append(intern(values[col]) if col < n else 0)
+        if self.style_columns:
+            n = len(styles) if styles is not None else 0
+            for col, column in enumerate(self.style_columns):
+                column.append(self._style_code(styles[col]) if col < n else 0)
+        self.source_rows.append(source_row)
+        self.row_count += 1
+
+    def _style_code(self, style) -> int:
+        if style is None:
+            return 0
+        code = self._style_codes.get(id(style))
+        if code is None:
+            code = self._style_codes[id(style)] = len(self.styles)
+            self.styles.append(style)
+        return code
+
+    def text(self, row: int, col: int) -> str:
+        return self.strings[self.columns[col][row]]
+
+    def set_text(self, row: int, col: int, text: str):
+        self.columns[col][row] = self.intern(text)
+
+    def style(self, row: int, col: int):
+        """Style của ô (None = không định dạng)"""
+        if not self.style_columns:
+            return None
+        return self.styles[self.style_columns[col][row]]
+
+    def set_object(self, row: int, col: int, value):
+        """Đặt ô là flowable (Paragraph rich text) thay cho chuỗi"""
+        self.objects.setdefault(row, {})[col] = value
+
+    def row_values(self, row: int) -> list:
+        """Các ô của dòng như một dòng data của ReportLab Table"""
+        strings = self.strings
+        values = [strings[column[row]] for column in self.columns]
+        extra = self.objects.get(row) if self.objects else None
+        if extra:
+            for col, value in extra.items():
+                values[col] = value
+        return values
+
+    def split_rows(self, split_cell: Callable[[int, int, object], list],
+                   max_lines: Callable[[object], int]) -> Optional[List[int]]:
+        """
+        Tách các dòng có ô quá cao thành nhiều dòng nối tiếp (như
+        oversize.split_tall_rows nhưng chỉ gọi split_cell cho dòng có ô nghi ngờ)
+
+        Args:
+            split_cell: split_cell(row, col, value) -> các phần của ô
+            max_lines: max_lines(style) -> số dòng chữ tối đa của ô có style này
+
+        Returns:
+            Optional[List[int]]: row_map[dòng mới] = dòng cũ, None nếu không tách
+        """
+        line_counts: Dict[int, int] = {}
+        limits: Dict[int, int] = {}
+        tall: Set[int] = set(self.objects)
+        for col, column in enumerate(self.columns):
+            style_column = self.style_columns[col] if self.style_columns else None
+            for row, code in enumerate(column):
+                if not code:
+                    continue
+                lines = line_counts.get(code)
+                if lines is None:
+                    lines = line_counts[code] = self.strings[code].count('\n') + 1
+                style_code = style_column[row] if style_column is not None else 0
+                limit = limits.get(style_code)
+                if limit is None:
+                    limit = limits[style_code] = max_lines(self.styles[style_code])
+                if lines > limit:
+                    tall.add(row)
+
+        pieces = {}
+        for row in sorted(tall):
+            parts = [split_cell(row, col, value) if value else [value]
+                     for col, value in enumerate(self.row_values(row))]
+            if max(len(p) for p in parts) > 1:
+                pieces[row] = parts
+        if not pieces:
+            return None
+
+        columns = [array('I') for _ in self.columns]
+        style_columns = [array('I') for _ in self.style_columns]
+        source_rows = array('I')
+        objects: Dict[int, Dict[int, object]] = {}
+        row_map: List[int] = []
+        done = 0
+        for row in sorted(pieces) + [self.row_count]:
+            # Các dòng không bị tách: chép nguyên đoạn
+            for new, old in zip(columns, self.columns):
+                new.extend(old[done:row])
+            for new, old in zip(style_columns, self.style_columns):
+                new.extend(old[done:row])
+            source_rows.extend(self.source_rows[done:row])
+            for old in range(done, row):
+                if old in self.objects:
+                    objects[len(row_map)] = self.objects[old]
+                row_map.append(old)
+            if row == self.row_count:
+                break
+            parts = pieces[row]
+            for i in range(max(len(p) for p in parts)):
+                for col, part in enumerate(parts):
+                    value = part[i] if i < len(part) else ''
+                    if isinstance(value, str):
+                        columns[col].append(self.intern(value))
+                    else:
+                        columns[col].append(0)
+                        objects.setdefault(len(row_map), {})[col] = value
+                for new, old in zip(style_columns, self.style_columns):
+                    new.append(old[row])
+                source_rows.append(self.source_rows[row])
+                row_map.append(row)
+            done = row + 1
+
+        self.columns, self.style_columns = columns, style_columns
+        self.source_rows, self.objects = source_rows, objects
+        self.row_count = len(row_map)
+        return row_map
+
+    def freeze(self):
+        """Bỏ từ điển tra ngược khi không còn thêm chuỗi mới (chỉ còn đọc để vẽ)"""
+        self._codes = {}
+        self._style_codes = {}
+
+
+class _WindowCommands:
+    """Lệnh TableStyle theo toạ độ cả bảng, cắt ra cho từng cửa sổ dòng"""
+
+    def __init__(self, commands: Sequence[tuple], nrows: int, ncols: int, header: bool = True):
+        self.fixed: List[tuple] = []  # lệnh có header hoặc phủ nhiều dải: xét ở mọi cửa sổ
+        self.bands: Dict[int, List[tuple]] = {}
+        self.no_cut: Set[int] = set()  # dòng r mà một vùng gộp nối r với r + 1
+        for command in commands:
+            (c1, r1), (c2, r2) = command[1], command[2]
+            c1, c2 = (c + ncols if c < 0 else c for c in (c1, c2))
+            r1, r2 = (r + nrows if r < 0 else r for r in (r1, r2))
+            resolved = (command[0], (c1, r1), (c2, r2)) + tuple(command[3:])
+            if command[0] == 'SPAN' and r1 >= (1 if header else 0):
+                self.no_cut.update(range(r1, r2))
+            if r1 == 0 or r2 - r1 > 4 * _BAND_ROWS:
+                self.fixed.append(resolved)
+            else:
+                for band in range(r1 // _BAND_ROWS, r2 // _BAND_ROWS + 1):
+                    self.bands.setdefault(band, []).append(resolved)
+
+    def window(self, start: int, stop: int, header: bool = True) -> List[tuple]:
+        """Lệnh cho bảng gồm dòng 0 (header, nếu có) và các dòng start..stop-1"""
+        commands = []
+        seen = set()
+        for command in self.fixed:
+            commands.extend(_clip(command, start, stop, header))
+        for band in range(start // _BAND_ROWS, (stop - 1) // _BAND_ROWS + 1):
+            for command in self.bands.get(band, ()):
+                if id(command) not in seen:
+                    seen.add(id(command))
+                    commands.extend(_clip(command, start, stop, header))
+        return commands
+
+
+def _clip(command: tuple, start: int, stop: int, header: bool = True) -> List[tuple]:
+    """Phần của lệnh nằm trong header (nếu có) và các dòng start..stop-1 (toạ độ cửa sổ)"""
+    name, (c1, r1), (c2, r2) = command[:3]
+    rest = command[3:]
+    base = 1 if header else 0  # dòng đầu cửa sổ trong Table
+    low, high = max(r1, start, base), min(r2, stop - 1)
+    if r1 == 0 and header:
+        if name == 'SPAN':
+            # Phần dưới header của ô gộp không lặp lại ở các trang sau
+            return [(name, (c1, 0), (c2, 0))] if c1 < c2 else []
+        # Header liền với dòng đầu cửa sổ như khi ReportLab tách bảng
+        return [(name, (c1, 0), (c2, high - start + 1 if low <= high else 0)) + rest]
+    if low > high or (name == 'SPAN' and r1 < start):
+        return []
+    return [(name, (c1, low - start + base), (c2, high - start + base)) + rest]
+
+
+class WindowedTable(Flowable):
+    """
+    Bảng vẽ từ SheetTable theo từng cửa sổ dòng, dòng 0 là header lặp lại ở đầu
+    mỗi trang (như Table(repeatRows=1))
+
+    header=False (dòng đầu đã bị tách thành nhiều dòng vì quá cao) thì dòng 0 là
+    dòng dữ liệu bình thường. Header cao hơn _MAX_HEADER_SHARE khung trang chỉ
+    vẽ ở trang đầu.
+    """
+
+    def __init__(self, table: SheetTable, col_widths: List[float], commands: Sequence[tuple],
+                 start: Optional[int] = None, stop: Optional[int] = None,
+                 window: int = _FIRST_WINDOW, header: bool = True,
+                 _index: Optional[_WindowCommands] = None):
+        """
+        Args:
+            table: Dữ liệu bảng
+            col_widths: Độ rộng cột (point)
+            commands: Lệnh TableStyle theo toạ độ cả bảng
+            start, stop: Các dòng dữ liệu mà phần bảng này vẽ (start mặc định
+                là dòng đầu sau header)
+            window: Số dòng dựng thử ở cửa sổ đầu
+            header: Vẽ dòng 0 làm header ở đầu phần bảng này
+        """
+        super().__init__()
+        self.table = table
+        self.col_widths = col_widths
+        self.header = header
+        self.start = (1 if header else 0) if start is None else start
+        self.stop = table.row_count if stop is None else stop
+        self.window = window
+        self.hAlign = 'CENTER'  # như Table
+        self._index = _index or _WindowCommands(commands, table.row_count, table.col_count,
+                                                header)
+        self._fitted = None  # ((availWidth, availHeight), Table)
+
+    @property
+    def row_count(self) -> int:
+        """Số dòng dữ liệu (không tính header) của phần bảng này"""
+        return self.stop - self.start
+
+    def _part(self, start: int, stop: int, window: int,
+              header: Optional[bool] = None) -> 'WindowedTable':
+        header = self.header if header is None else header
+        return WindowedTable(self.table, self.col_widths, (), start, stop, window, header,
+                             self._index)
+
+    def _cut(self, row: int) -> int:
+        """Điểm cắt gần nhất từ row trở đi không nằm giữa một vùng gộp"""
+        while row < self.stop and row - 1 in self._index.no_cut:
+            row += 1
+        return row
+
+    def _make_table(self, stop: int) -> Table:
+        rows = self.table
+        data = [rows.row_values(r) for r in range(self.start, stop)]
+        if self.header:
+            data.insert(0, rows.row_values(0))
+        table = Table(data, colWidths=self.col_widths, repeatRows=1 if self.header else 0)
+        table.setStyle(TableStyle(self._index.window(self.start, stop, self.header)))
+        return table
+
+    def _fit(self, availWidth, availHeight) -> Table:
+        """Table của cửa sổ nhỏ nhất cao hơn khung (hoặc chứa hết các dòng còn lại)"""
+        if self._fitted is not None and self._fitted[0] == (availWidth, availHeight):
+            return self._fitted[1]
+        rows = self.window
+        while True:
+            stop = self._cut(min(self.start + rows, self.stop))
+            table = self._make_table(stop)
+            _, height = table.wrap(availWidth, availHeight)
+            if height > availHeight or stop >= self.stop:
+                break
+            rows *= 2
+        self._fitted = ((availWidth, availHeight), table)
+        return table
+
+    def wrap(self, availWidth, availHeight):
+        table = self._fit(availWidth, availHeight)
+        self.width, self.height = table._width, table._height
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        table = self._fit(availWidth, availHeight)
+        pieces = table.split(availWidth, availHeight)
+        if len(pieces) != 2:
+            return pieces
+        drawn = pieces[0]._nrows - (1 if self.header else 0)
+        if drawn <= 0:
+            return []
+        # Header quá cao không lặp lại: trang sau không còn chỗ cho dòng dữ liệu
+        header = self.header and table._rowHeights[0] <= availHeight * _MAX_HEADER_SHARE
+        # Cửa sổ kế tiếp lấy theo số dòng vừa trang này, dư một ít
+        return [pieces[0], self._part(self.start + drawn, self.stop, drawn + drawn // 8 + 1,
+                                      header)]
+
+    def split_rows(self, rows: int) -> List['WindowedTable']:
+        """Tách sau rows dòng dữ liệu (dời xuống nếu rơi vào giữa vùng gộp)"""
+        cut = self._cut(self.start + rows)
+        if cut >= self.stop:
+            return [self]
+        return [self._part(self.start, cut, self.window), self._part(cut, self.stop, self.window)]
+
+    def draw(self):
+        self._fitted[1].drawOn(self.canv, 0, 0)
@@ -0,0 +1,100 @@
+"""
+Ngắt dòng nhanh cho ô bảng dựa trên độ rộng ký tự của font đã đăng ký
+
+Độ rộng từng ký tự được đo một lần rồi cache, ô bảng nhận về chuỗi đã chèn
+'\\n' nên ReportLab vẽ như chuỗi thường, không phải dựng Paragraph cho mỗi ô.
+"""
+from typing import Dict, List, Tuple
+
+from reportlab.pdfbase import pdfmetrics
+
+
+class _WidthCache(dict):
+    """Dict ký tự -> độ rộng (point), tự đo ký tự chưa có"""
+
+    def __init__(self, font_name: str, font_size: float):
+        super().__init__()
+        self._measure = pdfmetrics.getFont(font_name).stringWidth
+        self._size = font_size
+
+    def __missing__(self, ch: str) -> float:
+        width = self[ch] = self._measure(ch, self._size)
+        return width
+
+
+class TextWrapper:
+    """Ngắt dòng theo độ rộng thật của chữ (font + cỡ chữ cố định)"""
+
+    _instances: Dict[Tuple[str, float], 'TextWrapper'] = {}
+
+    def __init__(self, font_name: str, font_size: float):
+        self.font_name = font_name
+        self.font_size = font_size
+        self._widths = _WidthCache(font_name, font_size)
+        self._space = self._widths[' ']
+
+    @classmethod
+    def get(cls, font_name: str, font_size: float) -> 'TextWrapper':
+        """Lấy wrapper dùng chung cho (font, cỡ chữ), cache độ rộng được giữ lại"""
+        key = (font_name, font_size)
+        wrapper = cls._instances.get(key)
+        if wrapper is None:
+            wrapper = cls._instances[key] = cls(font_name, font_size)
+        return wrapper
+
+    def text_width(self, text: str) -> float:
+        """Độ rộng của chuỗi một dòng (point)"""
+        return sum(map(self._widths.__getitem__, text))
+
+    def wrap(self, text: str, max_width: float) -> str:
+        """
+        Ngắt dòng chuỗi cho vừa max_width
+
+        Args:
+            text: Nội dung ô
+            max_width: Độ rộng tối đa mỗi dòng (point)
+
+        Returns:
+            str: Chuỗi đã chèn '\\n' (trả nguyên chuỗi nếu đã vừa)
+        """
+        if '\n' not in text and self.text_width(text) <= max_width:
+            return text
+        return '\n'.join(self.wrap_lines(text, max_width))
+
+    def wrap_lines(self, text: str, max_width: float) -> List[str]:
+        """Ngắt dòng theo từ (greedy), từ dài hơn một dòng bị cắt theo ký tự"""
+        widths = self._widths
+        space = self._space
+        max_width = max(max_width, 1.0)
+        lines: List[str] = []
+
+        for paragraph in text.split('\n'):
+            words = paragraph.split(' ')
+            line: List[str] = []
+            line_width = 0.0
+            for word in words:
+                word_width = sum(map(widths.__getitem__, word))
+                extra = word_width + (space if line else 0.0)
+                if line and line_width + extra <= max_width:
+                    line.append(word)
+                    line_width += extra
+                    continue
+                if line:
+                    lines.append(' '.join(line))
+                    line, line_width = [], 0.0
+                if word_width <= max_width:
+                    line, line_width = [word], word_width
+                    continue
+                # Từ dài hơn cả dòng (URL, mã...): cắt theo ký tự
+                chunk, chunk_width = [], 0.0
+                for ch in word:
+                    w = widths[ch]
+                    if chunk and chunk_width + w > max_width:
+                        lines.append(''.join(chunk))
+                        chunk, chunk_width = [], 0.0
+                    chunk.append(ch)
+                    chunk_width += w
+                line, line_width = ([''.join(chunk)], chunk_width) if chunk else ([], 0.0)
+            lines.append(' '.join(line))
+
+        return lines
@@ -0,0 +1,359 @@
+"""
+Ảnh nhúng trong file Word: trích xuất, khử trùng lặp, thu nhỏ và cache
+
+Mỗi ảnh (theo nội dung) chỉ được xử lý một lần: thu nhỏ về đúng DPI cho kích
+thước lớn nhất nó được đặt trong tài liệu rồi ghi vào thư mục cache. Mọi chỗ
+tham chiếu cùng vẽ một file nên ReportLab chỉ nhúng một XObject cho mỗi ảnh.
+Cache được dọn theo tuổi và tổng dung lượng; chuyển đổi trong bộ nhớ
+(convert_stream) giữ ảnh đã xử lý trong RAM, không ghi gì ra đĩa.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image as PILImage
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+EMU_PER_POINT = 12700
+DEFAULT_DPI = 150
+CACHE_DIR = Path(tempfile.gettempdir()) / 'wordtopdf_images'
+# Giới hạn cache ảnh: file lâu không dùng hơn CACHE_MAX_AGE bị xoá, sau đó xoá
+# file cũ nhất cho tới khi tổng dung lượng dưới CACHE_MAX_BYTES
+CACHE_MAX_BYTES = 512 * 1024 ** 2
+CACHE_MAX_AGE = 7 * 24 * 3600
+# File tạm bỏ dở (process bị kill khi đang ghi) cũ hơn chừng này thì xoá
+_STALE_TEMP_AGE = 3600
+
+# Ảnh lớn hơn kích thước cần không quá ngưỡng này thì giữ nguyên, không nén lại
+_DOWNSCALE_THRESHOLD = 1.25
+_JPEG_QUALITY = 85
+
+# Thư mục cache đã dọn trong process này (mỗi process chỉ dọn một lần)
+_pruned = set()
+_prune_lock = threading.Lock()
+
+# Ảnh đã xử lý: đường dẫn trong cache hoặc ảnh trong bộ nhớ
+ImageSource = Union[str, ImageReader]
+
+
+def prune_cache(cache_dir: Path = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES,
+                max_age: float = CACHE_MAX_AGE) -> int:
+    """
+    Dọn cache ảnh: xoá file quá tuổi rồi file cũ nhất cho tới khi dưới max_bytes
+
+    Tuổi tính theo mtime, được cập nhật mỗi lần ảnh trong cache được dùng lại.
+
+    Args:
+        cache_dir: Thư mục cache
+        max_bytes: Tổng dung lượng tối đa
+        max_age: Số giây tối đa từ lần dùng cuối
+
+    Returns:
+        int: Số file đã xoá
+    """
+    now = time.time()
+    entries = []
+    try:
+        with os.scandir(cache_dir) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                if entry.is_file():
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+    except OSError:
+        return 0
+
+    removed = 0
+    total = sum(size for _, size, _ in entries)
+    for mtime, size, path in sorted(entries):
+        age = now - mtime
+        if path.endswith('.tmp'):
+            expired = age > _STALE_TEMP_AGE
+        else:
+            expired = age > max_age or total > max_bytes
+        if not expired:
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    if removed:
+        logger.info(f"🧹 Đã dọn {removed} ảnh trong cache {cache_dir}")
+    return removed
+
+
+def _prune_once(cache_dir: Path):
+    """Dọn cache lần đầu process dùng thư mục này"""
+    with _prune_lock:
+        if cache_dir in _pruned:
+            return
+        _pruned.add(cache_dir)
+    prune_cache(cache_dir)
+
+
+def _encode_image(blob: bytes, target: Tuple[int, int],
+                  name: str) -> Optional[Tuple[bytes, str]]:
+    """
+    Thu nhỏ + nén lại một ảnh
+
+    Args:
+        blob: Nội dung file ảnh gốc trong package .docx
+        target: Kích thước tối đa (pixel) cần cho chỗ đặt lớn nhất
+        name: Tên ảnh cho log
+
+    Returns:
+        Optional[Tuple[bytes, str]]: (nội dung ảnh, đuôi file), None nếu không đọc được ảnh
+    """
+    try:
+        img = PILImage.open(io.BytesIO(blob))
+        img_format = img.format
+        width, height = img.size
+        too_big = (width > target[0] * _DOWNSCALE_THRESHOLD
+                   or height > target[1] * _DOWNSCALE_THRESHOLD)
+
+        has_alpha = img.mode in ('RGBA', 'LA', 'PA') or (
+            img.mode == 'P' and 'transparency' in img.info)
+        ext = '.png' if has_alpha or img_format == 'PNG' else '.jpg'
+
+        if not too_big and img_format in ('JPEG', 'PNG') and (
+                img_format == 'PNG' or img.mode in ('RGB', 'L', 'CMYK')):
+            # Đã đủ nhỏ và ReportLab đọc trực tiếp được: chép nguyên bản
+            return blob, ext
+        if too_big:
+            img.draft('RGB', target)  # JPEG: giải mã thẳng ở độ phân giải thấp
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+            img.thumbnail(target, PILImage.LANCZOS)
+        else:
+            img = img.convert('RGBA' if has_alpha else 'RGB')
+        out = io.BytesIO()
+        if ext == '.png':
+            img.save(out, 'PNG', optimize=True)
+        else:
+            img.save(out, 'JPEG', quality=_JPEG_QUALITY, optimize=True)
+        return out.getvalue(), ext
+    except Exception as e:
+        logger.warning(f"Không đọc được ảnh {name}: {e}")
+        return None
+
+
+def _render_image(blob: bytes, target: Tuple[int, int], cache_base: Path) -> Optional[str]:
+    """
+    Thu nhỏ + nén lại một ảnh và ghi vào cache (chạy trong worker thread)
+
+    Args:
+        blob: Nội dung file ảnh gốc trong package .docx
+        target: Kích thước tối đa (pixel) cần cho chỗ đặt lớn nhất
+        cache_base: Đường dẫn cache chưa có đuôi file
+
+    Returns:
+        Optional[str]: Đường dẫn file ảnh đã xử lý, None nếu không đọc được ảnh
+    """
+    for ext in ('.jpg', '.png'):
+        cached = cache_base.with_suffix(ext)
+        try:
+            os.utime(cached)  # đánh dấu vừa dùng (prune_cache xoá theo mtime)
+        except OSError:
+            continue
+        return str(cached)
+
+    encoded = _encode_image(blob, target, cache_base.name)
+    if encoded is None:
+        return None
+    data, ext = encoded
+
+    # Ghi ra file tạm rồi đổi tên để tiến trình khác không đọc phải file dở
+    cache_path = cache_base.with_suffix(ext)
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, cache_path)
+    return str(cache_path)
+
+
+def _render_image_in_memory(blob: bytes, target: Tuple[int, int],
+                            name: str) -> Optional[ImageReader]:
+    """Như _render_image nhưng giữ ảnh đã xử lý trong bộ nhớ"""
+    encoded = _encode_image(blob, target, name)
+    if encoded is None:
+        return None
+    return ImageReader(io.BytesIO(encoded[0]))
+
+
+class ImageStore:
+    """
+    Kho ảnh của một lần chuyển đổi
+
+    Gọi add() cho mọi chỗ đặt ảnh khi duyệt tài liệu, process() một lần trước
+    khi build PDF; WordImage.draw() mới chờ kết quả nên việc nén ảnh chạy song
+    song với phần dựng layout còn lại.
+    """
+
+    def __init__(self, dpi: int = DEFAULT_DPI, cache_dir: Optional[Path] = CACHE_DIR,
+                 max_workers: Optional[int] = None):
+        """
+        Args:
+            dpi: Độ phân giải ảnh theo kích thước đặt
+            cache_dir: Thư mục cache ảnh đã xử lý (None = giữ trong bộ nhớ, không ghi đĩa)
+            max_workers: Số thread xử lý ảnh
+        """
+        self.dpi = dpi
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        self._blobs: Dict[str, bytes] = {}
+        self._sizes: Dict[str, Tuple[float, float]] = {}  # kích thước đặt lớn nhất (point)
+        self._blob_digests: Dict[int, str] = {}  # id(part) -> digest, tránh hash lại
+        self._futures: Dict[str, Future] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def add(self, image_part, width: float, height: float) -> str:
+        """
+        Ghi nhận một chỗ đặt ảnh
+
+        Args:
+            image_part: ImagePart của python-docx
+            width, height: Kích thước đặt trong tài liệu (point)
+
+        Returns:
+            str: Digest nội dung ảnh (ảnh giống nhau ở part khác nhau vẫn trùng)
+        """
+        digest = self._blob_digests.get(id(image_part))
+        if digest is None:
+            blob = image_part.blob
+            digest = hashlib.sha1(blob).hexdigest()
+            self._blob_digests[id(image_part)] = digest
+            self._blobs.setdefault(digest, blob)
+        old_w, old_h = self._sizes.get(digest, (0.0, 0.0))
+        self._sizes[digest] = (max(old_w, width), max(old_h, height))
+        return digest
+
+    def process(self):
+        """Đưa các ảnh chưa xử lý vào worker (thu nhỏ theo DPI, ghi cache)"""
+        pending = [d for d in self._blobs if d not in self._futures]
+        if not pending:
+            return
+        if self.cache_dir is not None:
+            # Dọn trước khi xử lý: không xoá mất ảnh vừa lấy ra từ cache
+            _prune_once(self.cache_dir)
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='word-image')
+        for digest in pending:
+            width, height = self._sizes[digest]
+            target = (max(1, round(width / 72 * self.dpi)),
+                      max(1, round(height / 72 * self.dpi)))
+            name = f"{digest}_{target[0]}x{target[1]}"
+            if self.cache_dir is None:
+                self._futures[digest] = self._executor.submit(
+                    _render_image_in_memory, self._blobs[digest], target, name)
+            else:
+                self._futures[digest] = self._executor.submit(
+                    _render_image, self._blobs[digest], target, self.cache_dir / name)
+        logger.info(f"Đang xử lý {len(pending)} ảnh")
+
+    def path_for(self, digest: str) -> Optional[ImageSource]:
+        """Ảnh đã xử lý: đường dẫn trong cache hoặc ImageReader trong bộ nhớ (chờ worker nếu chưa xong)"""
+        future = self._futures.get(digest)
+        if future is None:
+            self.process()
+            future = self._futures.get(digest)
+            if future is None:
+                return None
+        return future.result()
+
+    def close(self):
+        """Dừng worker, giải phóng nội dung ảnh gốc"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._blobs.clear()
+        self._blob_digests.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+def fit_size(width: float, height: float, max_width: Optional[float] = None,
+             max_height: Optional[float] = None) -> Tuple[float, float]:
+    """Thu nhỏ (giữ tỉ lệ) cho vừa khung, không phóng to"""
+    scale = 1.0
+    if max_width and width > max_width:
+        scale = max_width / width
+    if max_height and height * scale > max_height:
+        scale = max_height / height
+    return width * scale, height * scale
+
+
+class WordImage(Flowable):
+    """Ảnh trong PDF với kích thước đặt trong tài liệu Word"""
+
+    def __init__(self, store: ImageStore, digest: str, width: float, height: float):
+        super().__init__()
+        self.store = store
+        self.digest = digest
+        self.imageWidth = width
+        self.imageHeight = height
+        self.hAlign = 'CENTER'
+
+    def wrap(self, availWidth, availHeight):
+        scale = min(1.0, availWidth / self.imageWidth) if self.imageWidth else 1.0
+        self.drawWidth = self.imageWidth * scale
+        self.drawHeight = self.imageHeight * scale
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        path = self.store.path_for(self.digest)
+        if path:
+            self.canv.drawImage(path, 0, 0, self.drawWidth, self.drawHeight, mask='auto')
+
+
+def paragraph_images(para, store: ImageStore, max_width: Optional[float] = None,
+                     max_height: Optional[float] = None) -> List[WordImage]:
+    """
+    Lấy các ảnh nhúng (w:drawing) trong một paragraph python-docx
+
+    Ảnh liên kết ngoài (r:link) và ảnh không đọc được part bị bỏ qua.
+    """
+    images = []
+    related_parts = None
+    for drawing in para._p.xpath('.//w:drawing'):
+        embeds = drawing.xpath('.//a:blip/@r:embed')
+        extents = drawing.xpath('./*/wp:extent')
+        if not embeds or not extents:
+            continue
+        if related_parts is None:
+            related_parts = para.part.related_parts
+        image_part = related_parts.get(embeds[0])
+        if image_part is None or not hasattr(image_part, 'blob'):
+            continue
+        width = int(extents[0].get('cx', 0)) / EMU_PER_POINT
+        height = int(extents[0].get('cy', 0)) / EMU_PER_POINT
+        if width <= 0 or height <= 0:
+            continue
+        # Ảnh vượt khung trang được thu nhỏ trước, DPI tính theo kích thước thật khi vẽ
+        width, height = fit_size(width, height, max_width, max_height)
+        digest = store.add(image_part, width, height)
+        images.append(WordImage(store, digest, width, height))
+    return images
@@ -0,0 +1,112 @@
+"""
+Style paragraph của tài liệu Word: phân giải một lần cho cả tài liệu
+
+python-docx tra lại styles part mỗi lần đọc para.style. Ở đây styles.xml được
+duyệt một lần, kế thừa basedOn / outline level / numbering được phân giải sẵn
+cho từng style id nên mỗi paragraph chỉ còn một lần tra dict. Heading nhận theo
+outline level của style (đúng cả với style tên bản địa như "Tiêu đề 1"), tên
+style chỉ dùng khi không có outline level.
+"""
+import re
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from docx.oxml.ns import qn
+from reportlab.lib.styles import ParagraphStyle
+
+# Tên heading: tên dựng sẵn Word lưu trong styles.xml ("heading 1") và tên bản địa
+_HEADING_NAME = re.compile(r'(?:heading|tiêu đề)\s*(\d)', re.IGNORECASE)
+_LIST_NAME = re.compile(r'list|bullet|danh sách', re.IGNORECASE)
+
+# outlineLvl 9 = "Body Text" (không phải heading)
+_BODY_TEXT_LEVEL = 9
+
+# Cấp outline -> style PDF (heading sâu hơn hiển thị như đoạn thường)
+_HEADING_STYLES = ('Heading1', 'Heading2', 'Heading3')
+
+
+class ResolvedStyle(NamedTuple):
+    """Style PDF của một style Word"""
+    style: ParagraphStyle
+    outline_level: Optional[int]  # 0 = Heading 1, None = không phải heading
+    bullet: bool
+
+
+class _RawStyle(NamedTuple):
+    name: str
+    based_on: Optional[str]
+    outline_level: Optional[int]  # khai báo trực tiếp trong w:pPr
+    numbered: bool
+
+
+def _child_val(element, tag: str) -> Optional[str]:
+    child = element.find(qn(tag))
+    return child.get(qn('w:val')) if child is not None else None
+
+
+class WordStyleResolver:
+    """Bảng style id -> ResolvedStyle của một tài liệu"""
+
+    def __init__(self, doc, styles: Dict[str, ParagraphStyle]):
+        """
+        Args:
+            doc: Document python-docx
+            styles: Style PDF của converter ('Normal', 'Heading1'..'Heading3', 'Bullet')
+        """
+        self._styles = styles
+        raw: Dict[str, _RawStyle] = {}
+        default_id = None
+        for element in doc.styles.element.findall(qn('w:style')):
+            if element.get(qn('w:type')) != 'paragraph':
+                continue
+            style_id = element.get(qn('w:styleId'))
+            ppr = element.find(qn('w:pPr'))
+            level = _child_val(ppr, 'w:outlineLvl') if ppr is not None else None
+            raw[style_id] = _RawStyle(
+                name=_child_val(element, 'w:name') or style_id or '',
+                based_on=_child_val(element, 'w:basedOn'),
+                outline_level=int(level) if level and level.isdigit() else None,
+                numbered=ppr is not None and ppr.find(qn('w:numPr')) is not None,
+            )
+            if element.get(qn('w:default')) in ('1', 'true'):
+                default_id = style_id
+
+        self._resolved = {style_id: self._resolve(style_id, raw) for style_id in raw}
+        self.default = self._resolved.get(default_id) or ResolvedStyle(
+            styles['Normal'], None, False)
+
+    def resolve(self, para) -> ResolvedStyle:
+        """Style PDF của một paragraph python-docx"""
+        ppr = para._p.pPr
+        style_id = ppr.style if ppr is not None else None
+        return self._resolved.get(style_id, self.default)
+
+    def _resolve(self, style_id: str, raw: Dict[str, _RawStyle]) -> ResolvedStyle:
+        level, numbered, list_name = self._inherit(style_id, raw)
+        if level is not None and level < len(_HEADING_STYLES):
+            return ResolvedStyle(self._styles[_HEADING_STYLES[level]], level, False)
+        if numbered or list_name:
+            return ResolvedStyle(self._styles['Bullet'], None, True)
+        return ResolvedStyle(self._styles['Normal'], None, False)
+
+    @staticmethod
+    def _inherit(style_id: str, raw: Dict[str, _RawStyle]) -> Tuple[Optional[int], bool, bool]:
+        """Outline level, có numbering, tên kiểu list - theo chuỗi basedOn"""
+        level = None
+        numbered = list_name = False
+        seen = set()
+        while style_id in raw and style_id not in seen:  # basedOn vòng tròn thì dừng
+            seen.add(style_id)
+            style = raw[style_id]
+            if level is None:
+                if style.outline_level is not None:
+                    level = style.outline_level
+                else:
+                    match = _HEADING_NAME.search(style.name)
+                    if match:
+                        level = int(match.group(1)) - 1
+            numbered = numbered or style.numbered
+            list_name = list_name or bool(_LIST_NAME.search(style.name))
+            style_id = style.based_on
+        if level == _BODY_TEXT_LEVEL:
+            level = None
+        return level, numbered, list_name
@@ -0,0 +1,197 @@
+"""
+Đọc bảng Word trực tiếp từ XML w:tbl
+
+python-docx dựng lại lưới ô cho mỗi row.cells và cell.text làm phẳng bảng
+lồng nhau. Ở đây mỗi w:tbl được duyệt đúng một lần: gridSpan / vMerge thành
+SpanIndex, độ rộng cột lấy từ w:tblGrid, nội dung ô giữ thứ tự paragraph
+(kèm đậm/nghiêng từng run) và bảng lồng nhau.
+"""
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+from docx.oxml.ns import qn
+
+from .spans import SpanIndex
+
+TWIPS_PER_POINT = 20
+
+# Run: (text, bold, italic)
+Run = Tuple[str, bool, bool]
+
+_W_P = qn('w:p')
+_W_R = qn('w:r')
+_W_RPR = qn('w:rPr')
+_W_T = qn('w:t')
+_W_TBL = qn('w:tbl')
+_W_TR = qn('w:tr')
+_W_TC = qn('w:tc')
+_W_SDT = qn('w:sdt')
+_W_SDT_CONTENT = qn('w:sdtContent')
+_W_VAL = qn('w:val')
+_FALSE_VALUES = ('0', 'false', 'off')
+
+# Phần tử chứa run trong paragraph (link, sửa đổi được chấp nhận, smart tag...)
+_RUN_CONTAINERS = {qn('w:hyperlink'), qn('w:ins'), qn('w:smartTag'),
+                   qn('w:fldSimple'), qn('w:customXml')}
+# Phần tử trong run -> ký tự tương ứng
+_RUN_SPECIAL = {qn('w:tab'): ' ', qn('w:br'): '\n', qn('w:cr'): '\n',
+                qn('w:noBreakHyphen'): '-'}
+
+
+class WordTable(NamedTuple):
+    """Lưới ô của một bảng Word"""
+    rows: List[List[Optional['WordCell']]]  # None = ô bị gộp che hoặc không có
+    spans: SpanIndex
+    col_widths: List[float]  # point, theo w:tblGrid ([] nếu không khai báo)
+
+    @property
+    def col_count(self) -> int:
+        return max((len(row) for row in self.rows), default=0)
+
+
+class WordCell(NamedTuple):
+    """Nội dung một ô theo thứ tự: paragraph (list run) hoặc bảng lồng"""
+    content: List[Union[List[Run], WordTable]]
+
+    @property
+    def is_plain(self) -> bool:
+        """Chỉ có chữ thường (không định dạng, không bảng lồng)"""
+        return all(isinstance(block, list) and not any(b or i for _, b, i in block)
+                   for block in self.content)
+
+    @property
+    def text(self) -> str:
+        """Chữ của các paragraph, mỗi paragraph một dòng"""
+        return '\n'.join(''.join(text for text, _, _ in block)
+                         for block in self.content if isinstance(block, list)).strip()
+
+
+def _on(rpr, tag: str) -> bool:
+    """Thuộc tính bật/tắt của run (w:b, w:i): có mặt và val không phải false"""
+    if rpr is None:
+        return False
+    element = rpr.find(qn(tag))
+    return element is not None and element.get(_W_VAL, '1') not in _FALSE_VALUES
+
+
+def _runs(p) -> List[Run]:
+    """Các run của một paragraph (định dạng trực tiếp như run.bold/run.italic)"""
+    runs = []
+    stack = list(reversed(p))
+    while stack:
+        element = stack.pop()
+        if element.tag in _RUN_CONTAINERS:
+            stack.extend(reversed(element))
+            continue
+        if element.tag != _W_R:
+            continue
+        parts = []
+        for child in element:
+            if child.tag == _W_T:
+                parts.append(child.text or '')
+            elif child.tag in _RUN_SPECIAL:
+                parts.append(_RUN_SPECIAL[child.tag])
+        if parts:
+            rpr = element.find(_W_RPR)
+            runs.append((''.join(parts), _on(rpr, 'w:b'), _on(rpr, 'w:i')))
+    return runs
+
+
+def _cell_content(container) -> List[Union[List[Run], WordTable]]:
+    """Nội dung w:tc (hoặc w:sdtContent) theo thứ tự"""
+    content = []
+    for child in container:
+        if child.tag == _W_P:
+            content.append(_runs(child))
+        elif child.tag == _W_TBL:
+            content.append(parse_table(child))
+        elif child.tag == _W_SDT:
+            sdt_content = child.find(_W_SDT_CONTENT)
+            if sdt_content is not None:
+                content.extend(_cell_content(sdt_content))
+    return content
+
+
+def _rows(tbl):
+    """Các w:tr, kể cả dòng nằm trong content control"""
+    for child in tbl:
+        if child.tag == _W_TR:
+            yield child
+        elif child.tag == _W_SDT:
+            sdt_content = child.find(_W_SDT_CONTENT)
+            if sdt_content is not None:
+                yield from (tr for tr in sdt_content if tr.tag == _W_TR)
+
+
+def _cells(tr):
+    for child in tr:
+        if child.tag == _W_TC:
+            yield child
+        elif child.tag == _W_SDT:
+            sdt_content = child.find(_W_SDT_CONTENT)
+            if sdt_content is not None:
+                yield from (tc for tc in sdt_content if tc.tag == _W_TC)
+
+
+def _int_val(parent, tag: str, default: int = 0) -> int:
+    element = parent.find(qn(tag)) if parent is not None else None
+    try:
+        return int(element.get(_W_VAL)) if element is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_table(tbl) -> WordTable:
+    """
+    Đọc một w:tbl thành lưới ô (một lần duyệt, thời gian tuyến tính theo số ô)
+
+    Args:
+        tbl: Phần tử w:tbl (table._tbl của python-docx)
+
+    Returns:
+        WordTable: Lưới ô, vùng gộp và độ rộng cột
+    """
+    col_widths = []
+    grid = tbl.find(qn('w:tblGrid'))
+    if grid is not None:
+        for col in grid.iterfind(qn('w:gridCol')):
+            try:
+                col_widths.append(int(col.get(qn('w:w'), 0)) / TWIPS_PER_POINT)
+            except ValueError:
+                col_widths.append(0.0)
+
+    rows: List[List[Optional[WordCell]]] = []
+    spans = SpanIndex()
+    # Cột bắt đầu -> [row1, col1, row2, col2] của vùng vMerge đang mở
+    vertical = {}
+    merges = []
+    for r, tr in enumerate(_rows(tbl)):
+        row: List[Optional[WordCell]] = []
+        trpr = tr.find(qn('w:trPr'))
+        row.extend([None] * _int_val(trpr, 'w:gridBefore'))
+        for tc in _cells(tr):
+            c = len(row)
+            tcpr = tc.find(qn('w:tcPr'))
+            colspan = max(1, _int_val(tcpr, 'w:gridSpan', 1))
+            vmerge = tcpr.find(qn('w:vMerge')) if tcpr is not None else None
+            # vMerge không có val = nối tiếp ô phía trên
+            if vmerge is not None and vmerge.get(_W_VAL, 'continue') == 'continue' \
+                    and c in vertical:
+                vertical[c][2] = r
+                row.extend([None] * colspan)
+                continue
+
+            row.append(WordCell(_cell_content(tc)))
+            row.extend([None] * (colspan - 1))
+            merge = [r, c, r, c + colspan - 1]
+            merges.append(merge)
+            if vmerge is not None:
+                vertical[c] = merge
+            else:
+                vertical.pop(c, None)
+        rows.append(row)
+        # vMerge chỉ nối với dòng ngay trên, dòng này không nối tiếp thì đóng vùng
+        vertical = {c: merge for c, merge in vertical.items() if merge[2] == r}
+
+    for row1, col1, row2, col2 in merges:
+        spans.add(row1, col1, row2, col2)
+    return WordTable(rows, spans, col_widths)
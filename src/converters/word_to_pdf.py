@@ -2,10 +2,12 @@
 Word to PDF Converter
 Hỗ trợ Unicode đầy đủ cho tiếng Việt
 """
+import math
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, List, Optional, Tuple, Union
 
 from docx import Document
+from docx.text.paragraph import Paragraph as DocxParagraph
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, Table, TableStyle
@@ -14,18 +16,58 @@ from reportlab.lib.units import inch
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
 
 from ..logging.logger_setup import get_logger
+from ..logging.memory_tracker import checkpoint
 from ..io.file_handler import FileHandler
+from ..io.memory_io import InputSource, open_input, pdf_result, pdf_target, source_name
 from .excel_to_pdf import FontManager
+from .fragments import (Bookmark, OutlineEntry, pypdf_available, render_fragments,
+                        resolve_workers)
+from .oversize import (MAX_PARAGRAPH_CHARS, remap_commands, split_flowables, split_runs,
+                       split_tall_rows, split_text_lines)
+from .preview import PARAGRAPHS_PER_PAGE, PREVIEW_PAGES, PreviewDocTemplate
+from .text_wrap import TextWrapper
+from .word_images import CACHE_DIR, ImageStore, paragraph_images
+from .word_styles import ResolvedStyle, WordStyleResolver
+from .word_tables import WordCell, WordTable, parse_table
 
 logger = get_logger(__name__)
 
+# Khung nội dung trang (A4, lề 72pt) - ảnh lớn hơn được thu nhỏ cho vừa
+FRAME_WIDTH = A4[0] - 144
+FRAME_HEIGHT = A4[1] - 144
+
+# Khối lượng tối thiểu (ký tự, tính cả phần cộng cho mỗi paragraph) của một
+# phần khi dựng song song - phần nhỏ hơn thì chi phí mở lại file lớn hơn lợi ích
+MIN_CHUNK_WEIGHT = 50_000
+_PARAGRAPH_WEIGHT = 100
+
+# Bảng Word
+_TABLE_FONT_SIZE = 10
+_TABLE_LEADING = 12
+_TABLE_PADDING = 6
+_MIN_COL_WIDTH = 30
+# Dòng bảng cao hơn mức này được tách (chừa chỗ cho phần trên của trang)
+_MAX_ROW_HEIGHT = FRAME_HEIGHT * 0.8
+
 
 class WordToPDFConverter:
     """Class chuyển đổi Word sang PDF"""
     
-    def __init__(self):
+    def __init__(self, workers: int = 1):
+        """
+        Args:
+            workers: Số process dựng các phần của tài liệu song song (1 = tuần tự,
+                0 = số CPU). Cần pypdf để ghép, không có thì tự dựng tuần tự.
+                Mỗi phần bắt đầu trang mới nên phân trang có thể khác khi dựng
+                tuần tự (thêm ngắt trang trước Heading 1 / ngắt section tại chỗ cắt).
+        """
         self.font_regular, self.font_bold = FontManager.register_fonts()
+        self.workers = resolve_workers(workers)
         self.styles = self._create_styles()
+        self.images: Optional[ImageStore] = None
+        self._outline_level = -1
+        self._outline_entries: Optional[List[OutlineEntry]] = None
+        self._split_styles = {}
     
     def _create_styles(self) -> dict:
         """Tạo các style cho PDF"""
@@ -95,68 +137,242 @@ class WordToPDFConverter:
         Returns:
             Path: Đường dẫn file PDF đã tạo
         """
-        output_path = FileHandler.ensure_output_path(output_path, input_path, '.pdf')
+        output_path = FileHandler.ensure_output_path(output_path, input_path, new_suffix='.pdf')
         
         logger.info(f"Đang đọc Word: {input_path.name}")
         doc = Document(input_path)
+        checkpoint('word.open')
+        
+        if self.workers > 1:
+            chunks = self._plan_chunks(doc)
+            if len(chunks) > 1 and pypdf_available():
+                return self._convert_parallel(input_path, output_path, chunks)
+            if len(chunks) > 1:
+                logger.warning("Chưa cài pypdf - dựng tài liệu tuần tự")
+        
+        self._render(doc, output_path)
+        logger.info(f"Đã tạo PDF: {output_path}")
+        
+        return output_path
+    
+    def convert_stream(self, source: InputSource,
+                       output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        """
+        Chuyển Word nằm trong bộ nhớ sang PDF, không qua file tạm
+        
+        Tài liệu luôn được dựng tuần tự (dựng song song cần file trên đĩa để
+        worker process tự mở).
+        
+        Args:
+            source: Nội dung file Word: bytes, bytearray, memoryview, mmap hoặc
+                file object nhị phân
+            output: Stream nhận PDF (None = trả về bytes)
+            
+        Returns:
+            Optional[bytes]: Nội dung PDF, None nếu đã ghi vào output
+        """
+        logger.info(f"Đang đọc Word: {source_name(source)}")
+        target = pdf_target(output)
+        with open_input(source) as stream:
+            doc = Document(stream)
+        checkpoint('word.open')
+        
+        self._render(doc, target)
+        logger.info("Đã tạo PDF trong bộ nhớ")
+        return pdf_result(target)
+    
+    def preview(self, source: Union[Path, InputSource], pages: int = PREVIEW_PAGES,
+                output: Optional[BinaryIO] = None) -> Optional[bytes]:
+        """
+        Dựng nhanh vài trang đầu để xem trước
+        
+        Chỉ xử lý tối đa pages * PARAGRAPHS_PER_PAGE paragraph đầu và dừng layout
+        sau pages trang. Bảng (được đặt cuối tài liệu) chỉ có khi tài liệu đủ
+        ngắn để xử lý hết mọi paragraph.
+        
+        Args:
+            source: File Word hoặc nội dung trong bộ nhớ (xem convert_stream)
+            pages: Số trang tối đa
+            output: Stream nhận PDF (None = trả về bytes)
+            
+        Returns:
+            Optional[bytes]: Nội dung PDF, None nếu đã ghi vào output
+        """
+        target = pdf_target(output)
+        if isinstance(source, (str, Path)):
+            doc = Document(str(source))
+        else:
+            with open_input(source) as stream:
+                doc = Document(stream)
+        count = len(doc.element.body.p_lst)
+        end = min(count, pages * PARAGRAPHS_PER_PAGE)
+        self._render(doc, target, 0, end, tables=end == count, max_pages=pages)
+        return pdf_result(target)
+    
+    def _convert_parallel(self, input_path: Path, output_path: Path,
+                          chunks: List[Tuple[int, int, int]]) -> Path:
+        """Dựng từng phần thành PDF riêng trên nhiều process rồi ghép theo thứ tự"""
+        workers = min(self.workers, len(chunks))
+        logger.info(f"Chia tài liệu thành {len(chunks)} phần, dựng trên {workers} process...")
+        # Bảng vẫn nằm cuối tài liệu như khi dựng tuần tự: đi cùng phần cuối
+        tasks = [(input_path, start, end, index == len(chunks) - 1, outline_level)
+                 for index, (start, end, outline_level) in enumerate(chunks)]
+        render_fragments(_render_word_fragment, tasks, workers, output_path)
+        logger.info(f"Đã tạo PDF: {output_path}")
+        return output_path
+    
+    def _plan_chunks(self, doc: Document) -> List[Tuple[int, int, int]]:
+        """
+        Chia paragraph thành các phần để dựng song song
         
-        # Tạo PDF document
-        pdf_doc = SimpleDocTemplate(
-            str(output_path),
+        Chỉ cắt ở ngắt section hoặc trước Heading 1, gom các chương liền nhau cho
+        tới khi đủ khối lượng để phần nào cũng đáng một lần mở file trong worker.
+        Mỗi phần là một PDF riêng nên bắt đầu trang mới: khi dựng tuần tự các
+        chương chạy liền nhau (không có ngắt trang), nên bản song song có thêm
+        ngắt trang ở chỗ cắt và số trang có thể nhiều hơn.
+        
+        Returns:
+            List[Tuple[int, int, int]]: Các khoảng [start, end) chỉ số paragraph
+                kèm cấp outline trước paragraph start (để phần dựng tiếp cấp
+                lồng nhau như khi dựng tuần tự, -1 = chưa có heading)
+        """
+        paragraphs = doc.paragraphs
+        resolver = WordStyleResolver(doc, self.styles)
+        texts = [para.text for para in paragraphs]
+        weights = [len(text) + _PARAGRAPH_WEIGHT for text in texts]
+        target = max(sum(weights) / (self.workers * 2), MIN_CHUNK_WEIGHT)
+        
+        chunks = []
+        start = 0
+        start_level = outline_level = -1
+        weight = 0
+        after_section_break = False
+        for index, para in enumerate(paragraphs):
+            level = resolver.resolve(para).outline_level
+            can_split = after_section_break or level == 0
+            if index > start and can_split and weight >= target:
+                chunks.append((start, index, start_level))
+                start, start_level, weight = index, outline_level, 0
+            weight += weights[index]
+            after_section_break = bool(para._p.xpath('./w:pPr/w:sectPr'))
+            if level is not None and texts[index].strip():
+                # Cùng quy tắc với _bookmark: outline không nhảy cấp
+                outline_level = min(level, outline_level + 1)
+        chunks.append((start, len(paragraphs), start_level))
+        return chunks
+    
+    def _new_document(self, output_path, max_pages: Optional[int] = None) -> SimpleDocTemplate:
+        """PDF document (A4) cho file kết quả, một phần hoặc stream"""
+        layout = dict(
             pagesize=A4,
             rightMargin=72,
             leftMargin=72,
             topMargin=72,
             bottomMargin=72
         )
+        target = output_path if hasattr(output_path, 'write') else str(output_path)
+        if max_pages:
+            return PreviewDocTemplate(target, max_pages, **layout)
+        return SimpleDocTemplate(target, **layout)
+    
+    def _render(self, doc: Document, output_path, start: int = 0,
+                end: Optional[int] = None, tables: bool = True,
+                max_pages: Optional[int] = None, outline_level: Optional[int] = None
+                ) -> Optional[List[OutlineEntry]]:
+        """
+        Dựng paragraph [start, end) (và các bảng) thành một PDF (file hoặc stream)
         
-        elements = self._process_document(doc)
+        Args:
+            outline_level: Cấp outline trước paragraph start khi dựng một phần của
+                tài liệu (None = dựng cả tài liệu, outline nằm trong PDF)
         
-        logger.info("Đang tạo PDF...")
-        pdf_doc.build(elements)
-        logger.info(f"Đã tạo PDF: {output_path}")
+        Returns:
+            Optional[List[OutlineEntry]]: Outline của phần (merge_pdfs dựng lại
+                cấp lồng nhau khi ghép), None nếu outline nằm trong PDF
+        """
+        pdf_doc = self._new_document(output_path, max_pages)
+        self._outline_entries = None if outline_level is None else []
         
-        return output_path
+        # Ảnh được nén trong worker song song với việc dựng layout,
+        # flowable ảnh chỉ chờ kết quả khi vẽ. PDF ra stream (convert_stream,
+        # xem trước) giữ ảnh trong bộ nhớ thay cho cache trên đĩa
+        in_memory = hasattr(output_path, 'write')
+        with ImageStore(cache_dir=None if in_memory else CACHE_DIR) as self.images:
+            elements = self._process_document(
+                doc, start, end, tables, -1 if outline_level is None else outline_level)
+            checkpoint('word.elements')
+            self.images.process()
+            checkpoint('word.images')
+            
+            logger.info("Đang tạo PDF...")
+            pdf_doc.build(elements)
+            checkpoint('word.build')
+        self.images = None
+        return self._outline_entries
     
-    def _process_document(self, doc: Document) -> list:
-        """Xử lý document và tạo elements cho PDF"""
+    def _process_document(self, doc: Document, start: int = 0, end: Optional[int] = None,
+                          tables: bool = True, outline_level: int = -1) -> list:
+        """
+        Xử lý document (paragraph [start, end) và các bảng) và tạo elements cho PDF
+        
+        Args:
+            outline_level: Cấp outline của heading cuối cùng trước paragraph start
+        """
         elements = []
+        # Proxy paragraph chỉ được tạo cho khoảng cần dựng (xem trước tài liệu
+        # hàng chục nghìn đoạn chỉ dùng vài chục đoạn đầu)
+        p_elements = doc.element.body.p_lst
+        resolver = WordStyleResolver(doc, self.styles)
+        self._outline_level = outline_level
         
-        for para in doc.paragraphs:
-            element = self._process_paragraph(para)
-            if element:
-                elements.append(element)
+        for index in range(start, len(p_elements) if end is None else end):
+            para = DocxParagraph(p_elements[index], doc._body)
+            resolved = resolver.resolve(para)
+            flowables = self._process_paragraph(para, resolved)
+            images = self._process_images(para)
+            # Paragraph chỉ chứa ảnh: không cần thêm khoảng trống của dòng rỗng
+            if not (images and isinstance(flowables[0], Spacer)):
+                elements.append(flowables[0])
+                bookmark = self._bookmark(para, resolved, index)
+                if bookmark:
+                    elements.append(bookmark)
+                elements.extend(flowables[1:])
+            elements.extend(images)
         
         # Xử lý tables
-        for table in doc.tables:
-            table_element = self._process_table(table)
-            if table_element:
-                elements.append(table_element)
-                elements.append(Spacer(1, 0.2*inch))
+        if tables:
+            for table in doc.tables:
+                table_element = self._process_table(table)
+                if table_element:
+                    elements.append(table_element)
+                    elements.append(Spacer(1, 0.2*inch))
         
         logger.info(f"Đã xử lý {len(elements)} elements")
         return elements
     
-    def _process_paragraph(self, para) -> Optional[Paragraph]:
-        """Xử lý một paragraph"""
+    def _bookmark(self, para, resolved: ResolvedStyle, index: int) -> Optional[Bookmark]:
+        """Mục outline cho heading (đặt ngay sau heading để cùng trang)"""
+        level = resolved.outline_level
+        text = para.text.strip()
+        if level is None or not text:
+            return None
+        # Outline không được nhảy cấp (VD Heading 3 ngay sau Heading 1)
+        level = min(level, self._outline_level + 1)
+        self._outline_level = level
+        return Bookmark(text, f"p{index}", level, self._outline_entries)
+    
+    def _process_paragraph(self, para, resolved: ResolvedStyle) -> list:
+        """Xử lý một paragraph (đoạn quá dài thành nhiều flowable nối tiếp)"""
         text = para.text.strip()
         if not text:
-            return Spacer(1, 0.1*inch)
-        
-        # Xác định style dựa trên paragraph style
-        style_name = para.style.name
-        
-        if 'Heading 1' in style_name:
-            style = self.styles['Heading1']
-        elif 'Heading 2' in style_name:
-            style = self.styles['Heading2']
-        elif 'Heading 3' in style_name:
-            style = self.styles['Heading3']
-        elif 'List' in style_name or 'Bullet' in style_name:
+            return [Spacer(1, 0.1*inch)]
+        
+        # Style đã phân giải sẵn theo style id (heading, list, đoạn thường)
+        style = resolved.style
+        if len(text) > MAX_PARAGRAPH_CHARS:
+            return self._split_paragraph(para, style)
+        if resolved.bullet:
             text = f"• {text}"
-            style = self.styles['Bullet']
-        else:
-            style = self.styles['Normal']
         
         # Escape HTML special characters
         text = self._escape_html(text)
@@ -164,7 +380,44 @@ class WordToPDFConverter:
         # Áp dụng formatting (bold, italic)
         text = self._apply_formatting(para, text)
         
-        return Paragraph(text, style)
+        return [Paragraph(text, style)]
+    
+    def _split_paragraph(self, para, style: ParagraphStyle) -> List[Paragraph]:
+        """
+        Chia đoạn rất dài (log dán vào, điều khoản dài) thành các đoạn dưới một trang
+        
+        ReportLab ngắt dòng lại toàn bộ phần còn lại của một Paragraph ở mỗi trang,
+        chia trước theo run giữ thời gian dựng tuyến tính và giữ đậm/nghiêng.
+        """
+        runs = [(run.text, run.bold, run.italic) for run in para.runs]
+        if not any(text for text, _, _ in runs):
+            runs = [(para.text, False, False)]  # chữ chỉ nằm trong hyperlink
+        pieces = split_runs(runs)
+        first, middle, last = self._continuation_styles(style)
+        flowables = []
+        for i, piece in enumerate(pieces):
+            piece_style = first if i == 0 else last if i == len(pieces) - 1 else middle
+            flowables.append(Paragraph(self._runs_markup(piece), piece_style))
+        return flowables
+    
+    def _continuation_styles(self, style: ParagraphStyle) -> Tuple[ParagraphStyle, ...]:
+        """Style phần đầu / giữa / cuối của đoạn bị chia (không giãn cách giữa các phần)"""
+        cached = self._split_styles.get(style.name)
+        if cached is None:
+            cached = self._split_styles[style.name] = (
+                ParagraphStyle(f'{style.name}First', parent=style, spaceAfter=0),
+                ParagraphStyle(f'{style.name}Middle', parent=style, spaceBefore=0,
+                               spaceAfter=0, firstLineIndent=0),
+                ParagraphStyle(f'{style.name}Last', parent=style, spaceBefore=0,
+                               firstLineIndent=0),
+            )
+        return cached
+    
+    def _process_images(self, para) -> list:
+        """Ảnh nhúng trong paragraph (đặt sau phần chữ)"""
+        if self.images is None:
+            return []
+        return paragraph_images(para, self.images, FRAME_WIDTH, FRAME_HEIGHT)
     
     def _escape_html(self, text: str) -> str:
         """Escape HTML special characters"""
@@ -176,67 +429,245 @@ class WordToPDFConverter:
     def _apply_formatting(self, para, text: str) -> str:
         """Áp dụng bold/italic formatting"""
         # Kiểm tra runs để áp dụng formatting
+        formatted_text = self._runs_markup(
+            (run.text, run.bold, run.italic) for run in para.runs)
+        return formatted_text if formatted_text else text
+    
+    def _runs_markup(self, runs) -> str:
+        """Markup Paragraph cho các run (text, bold, italic)"""
         formatted_text = ""
-        for run in para.runs:
-            run_text = self._escape_html(run.text)
+        for text, bold, italic in runs:
+            run_text = self._escape_html(text)
             
-            if run.bold and run.italic:
+            if bold and italic:
                 formatted_text += f"<b><i>{run_text}</i></b>"
-            elif run.bold:
+            elif bold:
                 formatted_text += f"<b>{run_text}</b>"
-            elif run.italic:
+            elif italic:
                 formatted_text += f"<i>{run_text}</i>"
             else:
                 formatted_text += run_text
         
-        return formatted_text if formatted_text else text
+        return formatted_text
     
     def _process_table(self, table) -> Optional[Table]:
         """Xử lý bảng từ Word"""
+        return self._build_table(parse_table(table._tbl), FRAME_WIDTH)
+    
+    def _build_table(self, grid: WordTable, max_width: float,
+                     nested: bool = False) -> Optional[Table]:
+        """
+        Dựng bảng PDF từ lưới ô Word
+        
+        Args:
+            grid: Lưới ô đã đọc từ w:tbl
+            max_width: Độ rộng tối đa của bảng (khung trang hoặc ô chứa bảng lồng)
+            nested: Bảng lồng trong ô (không tô màu header)
+        """
+        col_count = grid.col_count
+        if not grid.rows or not col_count:
+            return None
+        
+        col_widths = self._table_col_widths(grid, col_count, max_width)
         data = []
+        for r, row in enumerate(grid.rows):
+            header = r == 0 and not nested
+            data_row = []
+            for c in range(col_count):
+                cell = row[c] if c < len(row) else None
+                if cell is None:
+                    data_row.append('')
+                    continue
+                end = grid.spans.end_of(r, c)
+                width = sum(col_widths[c:(end[1] if end else c) + 1]) - 2 * _TABLE_PADDING
+                data_row.append(self._table_cell(cell, width, header))
+            data.append(data_row)
         
-        for row in table.rows:
-            row_data = []
-            for cell in row.cells:
-                cell_text = cell.text.strip()
-                cell_text = self._escape_html(cell_text)
-                row_data.append(cell_text)
-            data.append(row_data)
+        if nested:
+            commands = [
+                ('FONTNAME', (0, 0), (-1, -1), self.font_regular),
+                ('FONTSIZE', (0, 0), (-1, -1), _TABLE_FONT_SIZE),
+                ('LEADING', (0, 0), (-1, -1), _TABLE_LEADING),
+                ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ]
+        else:
+            commands = [
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+                ('FONTNAME', (0, 0), (-1, 0), self.font_bold),
+                ('FONTNAME', (0, 1), (-1, -1), self.font_regular),
+                ('FONTSIZE', (0, 0), (-1, -1), _TABLE_FONT_SIZE),
+                ('LEADING', (0, 0), (-1, -1), _TABLE_LEADING),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+                ('TOPPADDING', (0, 0), (-1, -1), 6),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1),
+                 [colors.white, colors.HexColor('#ECF0F1')]),
+            ]
+        commands += [('LEFTPADDING', (0, 0), (-1, -1), _TABLE_PADDING),
+                     ('RIGHTPADDING', (0, 0), (-1, -1), _TABLE_PADDING)]
         
-        if not data:
-            return None
+        commands += grid.spans.span_commands()
         
-        # Tạo bảng PDF
-        pdf_table = Table(data)
-        pdf_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3498DB')),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), self.font_bold),
-            ('FONTNAME', (0, 1), (-1, -1), self.font_regular),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('ROWBACKGROUNDS', (0, 1), (-1, -1),
-             [colors.white, colors.HexColor('#ECF0F1')]),
-        ]))
+        # Ô cao hơn khung trang được tách thành nhiều dòng nối tiếp (ô có định
+        # dạng / bảng lồng được chia theo flowable, giữ nguyên định dạng)
+        def split_cell(row: int, col: int, value) -> list:
+            end = grid.spans.end_of(row, col)
+            if end is not None and end[0] > row:
+                return [value]
+            if isinstance(value, str):
+                return split_text_lines(value, _TABLE_LEADING, _MAX_ROW_HEIGHT)
+            width = sum(col_widths[col:(end[1] if end else col) + 1]) - 2 * _TABLE_PADDING
+            if self._cell_height_bound(value, width) <= _MAX_ROW_HEIGHT:
+                return [value]
+            return split_flowables(value, width, _MAX_ROW_HEIGHT)
         
+        row_map = split_tall_rows(data, split_cell)
+        if row_map:
+            commands = remap_commands(commands, row_map)
+        
+        pdf_table = Table(data, colWidths=col_widths)
+        pdf_table.setStyle(TableStyle(commands))
         return pdf_table
+    
+    @staticmethod
+    def _table_col_widths(grid: WordTable, col_count: int, max_width: float) -> List[float]:
+        """Độ rộng cột theo w:tblGrid, thu nhỏ cho vừa max_width"""
+        widths = list(grid.col_widths[:col_count])
+        if len(widths) < col_count or not all(widths):
+            # Không có tblGrid (hoặc thiếu cột): chia đều phần còn trống
+            known = sum(w for w in widths if w)
+            missing = col_count - sum(1 for w in widths if w)
+            fill = max(max_width - known, missing * _MIN_COL_WIDTH) / missing
+            widths = [w or fill for w in widths] + [fill] * (col_count - len(widths))
+        total = sum(widths)
+        if total > max_width:
+            widths = [w * max_width / total for w in widths]
+        return widths
+    
+    def _table_cell(self, cell: WordCell, width: float, header: bool):
+        """Nội dung ô: chuỗi đã ngắt dòng, hoặc list flowable nếu có định dạng / bảng lồng"""
+        if cell.is_plain:
+            font = self.font_bold if header else self.font_regular
+            return TextWrapper.get(font, _TABLE_FONT_SIZE).wrap(cell.text, width)
+        
+        style = self._table_cell_style(header)
+        flowables = []
+        for block in cell.content:
+            if isinstance(block, WordTable):
+                table = self._build_table(block, width, nested=True)
+                if table:
+                    flowables.append(table)
+                continue
+            markup = ''.join(self._run_markup(text, bold, italic) for text, bold, italic in block)
+            if markup.strip():
+                flowables.append(Paragraph(markup, style))
+        return flowables
+    
+    @staticmethod
+    def _cell_height_bound(flowables: list, width: float) -> float:
+        """
+        Chiều cao tối đa có thể của ô flowable, ước lượng không cần wrap (mỗi ký
+        tự rộng tối đa một em); bảng lồng không ước lượng được (vô cùng)
+        """
+        lines = 0
+        for flowable in flowables:
+            if not isinstance(flowable, Paragraph):
+                return float('inf')
+            chars = breaks = 0
+            for frag in flowable.frags:
+                chars += len(getattr(frag, 'text', ''))
+                breaks += bool(getattr(frag, 'lineBreak', False))
+            lines += math.ceil(chars * _TABLE_FONT_SIZE / max(width, 1)) + breaks + 1
+        return lines * _TABLE_LEADING
+    
+    def _run_markup(self, text: str, bold: bool, italic: bool) -> str:
+        """Markup Paragraph cho một run"""
+        text = self._escape_html(text).replace('\n', '<br/>')
+        if italic:
+            text = f"<i>{text}</i>"
+        if bold:
+            text = f"<b>{text}</b>"
+        return text
+    
+    def _table_cell_style(self, header: bool) -> ParagraphStyle:
+        """Style Paragraph trong ô bảng (header chữ trắng đậm)"""
+        key = 'TableHeader' if header else 'TableCell'
+        style = self.styles.get(key)
+        if style is None:
+            style = self.styles[key] = ParagraphStyle(
+                key,
+                fontName=self.font_bold if header else self.font_regular,
+                fontSize=_TABLE_FONT_SIZE,
+                leading=_TABLE_LEADING,
+                textColor=colors.white if header else colors.black,
+            )
+        return style
+
+
+# Trạng thái của process dựng phần: tài liệu chỉ đọc một lần cho mọi phần
+# mà process đó nhận (mỗi lần convert song song dùng một pool process mới)
+_fragment_state: dict = {}
+
+
+def _render_word_fragment(input_path: Path, start: int, end: int, tables: bool,
+                          outline_level: int, fragment_path: Path) -> List[OutlineEntry]:
+    """Dựng paragraph [start, end) thành file PDF riêng (chạy trong worker process)"""
+    state = _fragment_state.get(input_path)
+    if state is None:
+        state = _fragment_state[input_path] = (WordToPDFConverter(), Document(input_path))
+    converter, doc = state
+    logger.info(f"Dựng paragraph {start}-{end - 1}")
+    return converter._render(doc, fragment_path, start, end, tables,
+                             outline_level=outline_level)
 
 
 # Hàm helper để sử dụng trực tiếp
-def convert_word_to_pdf(input_path: Path, output_path: Optional[Path] = None) -> Path:
+def convert_word_to_pdf(input_path: Path, output_path: Optional[Path] = None,
+                        workers: int = 1) -> Path:
     """
     Chuyển Word sang PDF
     
     Args:
         input_path: Đường dẫn file Word
         output_path: Đường dẫn file PDF (tùy chọn)
+        workers: Số process dựng các phần song song (1 = tuần tự, 0 = số CPU),
+            mỗi phần bắt đầu trang mới
         
     Returns:
         Path: Đường dẫn file PDF
     """
-    converter = WordToPDFConverter()
-    return converter.convert(input_path, output_path)
\ No newline at end of file
+    converter = WordToPDFConverter(workers)
+    return converter.convert(input_path, output_path)
+
+
+def convert_word_stream(source: InputSource,
+                        output: Optional[BinaryIO] = None) -> Optional[bytes]:
+    """
+    Chuyển Word trong bộ nhớ sang PDF
+    
+    Args:
+        source: Nội dung file Word (bytes, memoryview, mmap hoặc file object)
+        output: Stream nhận PDF (None = trả về bytes)
+        
+    Returns:
+        Optional[bytes]: Nội dung PDF, None nếu đã ghi vào output
+    """
+    return WordToPDFConverter().convert_stream(source, output)
+
+
+def preview_word(input_path: Path, pages: int = PREVIEW_PAGES) -> bytes:
+    """
+    PDF xem trước vài trang đầu của file Word
+    
+    Args:
+        input_path: Đường dẫn file Word
+        pages: Số trang tối đa
+        
+    Returns:
+        bytes: Nội dung PDF
+    """
+    return WordToPDFConverter().preview(input_path, pages)
@@ -1,38 +1,68 @@
 """
 Giao diện Tkinter cho ứng dụng converter
 """
+import tempfile
 import threading
+import time
 from pathlib import Path
-from typing import List, Callable, Optional
+from typing import Dict, List, Callable, Optional
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 
 from ..logging.logger_setup import get_logger
+from ..logging.memory_tracker import peak_memory, reset_peak_memory, track_memory
+from ..logging.profiler import profile_conversion, profile_folder, write_report
 from ..io.file_handler import FileHandler
+from ..io.pipeline import BackgroundWriter, FilePrefetcher
+from ..io.preflight import PreflightResult, preflight
+from ..batch.engine import SPLIT_KINDS
+from ..batch.journal import batch_key, open_journal, retry_delay
+from ..batch.metrics import DurationModel, format_duration, open_metrics
 
 logger = get_logger(__name__)
 
+# Tài liệu Word có document.xml từ chừng này byte được dựng song song từng phần
+# (WordToPDFConverter._plan_chunks tự quyết định số phần; số paragraph trong
+# docProps/app.xml thường cũ hoặc bằng 0 nên không dùng được)
+PARALLEL_MIN_DOCUMENT_BYTES = 256 * 1024
+
 
 class ConverterUI:
     """Giao diện chung cho converter"""
     
     def __init__(self, root: tk.Tk, title: str, file_types: List[tuple], 
-                 patterns: List[str], converter_func: Callable):
+                 patterns: List[str], converter_func: Callable,
+                 preview_func: Optional[Callable] = None,
+                 stream_func: Optional[Callable] = None):
         """
         Args:
             root: Tkinter root window
             title: Tiêu đề ứng dụng
             file_types: Danh sách file types cho dialog
             patterns: Danh sách pattern cho file search
-            converter_func: Hàm chuyển đổi (input_path, output_path) -> Path
+            converter_func: Hàm chuyển đổi (input_path, output_path, workers=1) -> Path;
+                workbook nhiều sheet / tài liệu Word dài được gọi với workers=0 để
+                dựng các phần song song trên mọi CPU
+            preview_func: Hàm xem trước (input_path) -> bytes PDF vài trang đầu (tùy chọn)
+            stream_func: Hàm chuyển đổi trong bộ nhớ (stream) -> bytes PDF (tùy chọn, có thì
+                file được đọc trước và PDF được ghi nền trong lúc dựng file khác;
+                file dựng song song vẫn đi qua converter_func)
         """
         self.root = root
         self.title = title
         self.file_types = file_types
         self.patterns = patterns
         self.converter_func = converter_func
+        self.preview_func = preview_func
+        self.stream_func = stream_func
         
         self.file_list: List[Path] = []
+        # Kết quả pre-flight của từng file, dùng để dự đoán thời gian
+        self._checks: Dict[Path, PreflightResult] = {}
+        self.metrics = open_metrics()
+        self.model = DurationModel(self.metrics)
+        self.journal = open_journal()
+        self.retries = 2  # số lần thử lại file lỗi
         
         # FIX: Tạo valid_extensions đúng cách - loại bỏ dấu * và chỉ lấy extension
         self.valid_extensions = []
@@ -49,6 +79,7 @@ class ConverterUI:
         self._setup_window()
         self._create_widgets()
         self._log_system_info()
+        self._restore_unfinished()
     
     def _setup_window(self):
         """Thiết lập cửa sổ"""
@@ -144,6 +175,14 @@ class ConverterUI:
             width=15
         ).pack(side=tk.LEFT, padx=5)
         
+        if self.preview_func is not None:
+            ttk.Button(
+                btn_frame,
+                text="👁️ Xem trước",
+                command=self.preview_file,
+                width=13
+            ).pack(side=tk.LEFT, padx=5)
+        
         ttk.Button(
             btn_frame,
             text="🗑️ Xóa",
@@ -252,6 +291,11 @@ class ConverterUI:
         """Thêm file vào danh sách"""
         if path not in self.file_list:
             if FileHandler.validate_file(path, self.valid_extensions):
+                check = preflight(path)
+                if not check.ok:
+                    self.log(f"⚠️ Bỏ qua {path.name}: {check.error}")
+                    return
+                self._checks[path] = check
                 self.file_list.append(path)
                 self.file_listbox.insert(tk.END, str(path))
                 self.log(f"➕ {path.name}")
@@ -262,6 +306,7 @@ class ConverterUI:
     def clear_list(self):
         """Xóa danh sách"""
         self.file_list.clear()
+        self._checks.clear()
         self.file_listbox.delete(0, tk.END)
         self.log("🗑️ Đã xóa danh sách\n")
     
@@ -271,6 +316,35 @@ class ConverterUI:
         FileHandler.open_folder(downloads)
         self.log(f"📥 Đã mở: {downloads}")
     
+    def preview_file(self):
+        """Xem trước vài trang đầu của file đang chọn (hoặc file đầu danh sách)"""
+        if not self.file_list:
+            messagebox.showwarning("Cảnh báo", "Chưa có file nào!")
+            return
+        selection = self.file_listbox.curselection()
+        path = self.file_list[selection[0] if selection else 0]
+        threading.Thread(target=self._preview_thread, args=(path,), daemon=True).start()
+    
+    def _preview_thread(self, path: Path):
+        """Thread xem trước: PDF ghi vào thư mục tạm rồi mở bằng trình xem mặc định"""
+        start = time.perf_counter()
+        try:
+            pdf = self.preview_func(path)
+        except Exception as e:
+            self.log(f"❌ Không xem trước được {path.name}: {e}")
+            logger.error(f"Lỗi xem trước {path}", exc_info=True)
+            return
+        preview_folder = Path(tempfile.gettempdir()) / 'wordtopdf_preview'
+        preview_path = preview_folder / f"{path.stem}.preview.pdf"
+        try:
+            preview_folder.mkdir(parents=True, exist_ok=True)
+            preview_path.write_bytes(pdf)
+        except OSError as e:
+            self.log(f"❌ Không ghi được bản xem trước: {e}")
+            return
+        self.log(f"👁️ Xem trước {path.name} ({time.perf_counter() - start:.2f}s)")
+        FileHandler.open_file(preview_path)
+    
     def convert_files(self):
         """Chuyển đổi các file"""
         if not self.file_list:
@@ -283,34 +357,133 @@ class ConverterUI:
         threading.Thread(target=self._convert_thread, daemon=True).start()
     
     def _convert_thread(self):
-        """Thread chuyển đổi"""
+        """
+        Thread chuyển đổi
+        
+        Ba giai đoạn chồng lên nhau giữa các file: FilePrefetcher đọc trước file kế
+        tiếp, thread này dựng PDF trong bộ nhớ, BackgroundWriter ghi PDF ra đĩa.
+        """
         success = error = 0
         last_file = None  # Lưu file cuối cùng để mở (auto_open_output = true trong config)
         
         # Thư mục lưu PDF mặc định = thư mục wordtopdf (thư mục project)
         output_folder = Path(__file__).parent.parent.parent  # src/interface -> src -> wordtopdf
+        outputs = {path: output_folder / path.with_suffix('.pdf').name for path in self.file_list}
         
         self.log("\n" + "=" * 60)
         self.log(f"🚀 BẮT ĐẦU CHUYỂN ĐỔI {len(self.file_list)} FILE")
         self.log(f"📁 Lưu vào: {output_folder}")
+        
+        # File đã xong ở lần chạy bị gián đoạn trước (cùng danh sách) thì bỏ qua
+        batch_id, completed = self._open_batch(output_folder, outputs)
+        pending = [path for path in self.file_list if path.resolve() not in completed]
+        if completed:
+            self.log(f"♻️ Tiếp tục batch dang dở: {len(completed)} file đã xong")
+            success += len(completed)
+        
+        predicted = {path: self.model.predict(self._checks[path])
+                     for path in pending if path in self._checks}
+        remaining = sum(predicted.values())
+        self.log(f"⏱️ Ước tính: ~{format_duration(remaining)}")
         self.log("=" * 60 + "\n")
         
-        for file_path in self.file_list:
+        attempts: Dict[Path, int] = {}
+        profiles: List[Path] = []  # WORDTOPDF_PROFILE bật thì mỗi file một .pstats
+        lock = threading.Lock()  # finish() chạy cả trên thread ghi
+        prefetcher = FilePrefetcher()
+        writer = BackgroundWriter() if self.stream_func else None
+        for path in pending:
+            prefetcher.submit(path, read=not self._render_in_parts(path))
+        
+        def finish(file_path: Path, result: Optional[Path] = None,
+                   exc: Optional[Exception] = None):
+            """Kết thúc một lần thử: ghi journal, log, xếp lại file lỗi"""
+            nonlocal success, error, last_file, remaining
             try:
-                self.log(f"⏳ Đang xử lý: {file_path.name}")
-                # Lưu PDF vào thư mục wordtopdf thay vì cùng thư mục file gốc
-                output = output_folder / file_path.with_suffix('.pdf').name
-                
-                # Gọi hàm converter
-                result = self.converter_func(file_path, output)
+                with lock:
+                    if exc is None:
+                        if batch_id is not None:
+                            self._journal('mark_done', batch_id, file_path,
+                                          FileHandler.file_hash(result))
+                        self.log(f"   ✅ {file_path.name} → {result.name}\n")
+                        success += 1
+                        last_file = result  # Lưu file cuối
+                    else:
+                        attempts[file_path] = attempts.get(file_path, 0) + 1
+                        if attempts[file_path] <= self.retries:
+                            # File lỗi được xếp lại cuối hàng đợi, chờ đủ backoff mới chạy
+                            delay = retry_delay(attempts[file_path])
+                            self.log(f"   ⚠️ LỖI {file_path.name}: {str(exc)} - "
+                                     f"thử lại sau {delay:g}s\n")
+                            self._journal('mark_failed', batch_id, file_path, str(exc),
+                                          time.time() + delay)
+                            prefetcher.submit(file_path, time.time() + delay,
+                                              read=not self._render_in_parts(file_path))
+                            return
+                        self.log(f"   ❌ LỖI {file_path.name}: {str(exc)}\n")
+                        self._journal('mark_failed', batch_id, file_path, str(exc))
+                        error += 1
+                    remaining -= predicted.get(file_path, 0.0)
+                    if remaining >= 1:
+                        self.log(f"⏱️ Còn lại: ~{format_duration(remaining)}\n")
+            finally:
+                # Lần thử này xong (file thử lại đã được submit thành việc mới)
+                prefetcher.task_done()
+        
+        try:
+            while True:
+                item = prefetcher.get()
+                if item is None:
+                    break
+                file_path = item.path
+                output = outputs[file_path]
+                try:
+                    estimate = predicted.get(file_path)
+                    eta = f" (~{format_duration(estimate)})" if estimate else ""
+                    self.log(f"⏳ Đang xử lý: {file_path.name}{eta}")
+                    self._journal('mark_running', batch_id, file_path)
+                    if item.error is not None:
+                        raise item.error
+                    
+                    # Gọi hàm converter (lưu PDF vào thư mục wordtopdf thay vì cùng thư mục file gốc)
+                    reset_peak_memory()
+                    start = time.perf_counter()
+                    with profile_conversion(file_path) as profile, \
+                            track_memory(file_path) as tracker:
+                        if profile and profile not in profiles:
+                            profiles.append(profile)
+                        if self._render_in_parts(file_path):
+                            # Dựng các sheet / chương song song cần file trên đĩa
+                            data = None
+                            result = self.converter_func(file_path, output, workers=0)
+                        elif writer is not None and item.data is not None:
+                            data = self.stream_func(item.open())
+                        else:
+                            # Không có bản trong bộ nhớ (file quá lớn): converter tự đọc / ghi
+                            data = None
+                            result = self.converter_func(file_path, output)
+                    self._record(file_path, time.perf_counter() - start,
+                                 tracker.peak_rss if tracker else peak_memory())
+                except Exception as e:
+                    logger.error(f"Lỗi chuyển đổi {file_path}: {e}", exc_info=True)
+                    finish(file_path, exc=e)
+                    continue
                 
-                self.log(f"   ✅ → {result.name}\n")
-                success += 1
-                last_file = result  # Lưu file cuối
-            except Exception as e:
-                self.log(f"   ❌ LỖI: {str(e)}\n")
-                logger.error(f"Lỗi chuyển đổi {file_path}: {e}", exc_info=True)
-                error += 1
+                if data is None:
+                    finish(file_path, result)
+                else:
+                    writer.submit(output, data,
+                                  lambda out, exc, path=file_path: finish(path, out, exc))
+        finally:
+            if writer is not None:
+                writer.close()
+            prefetcher.close()
+        
+        if batch_id is not None and not error:
+            self._journal('finish_batch', batch_id)
+        if profiles:
+            report = write_report(profiles, profile_folder())
+            self.log(f"🔥 Báo cáo profile: {report}")
         
         self.progress.stop()
         self.convert_btn.config(state='normal')
@@ -328,10 +501,69 @@ class ConverterUI:
             "Hoàn tất",
             f"✅ Thành công: {success}\n❌ Lỗi: {error}"
         )
+    
+    def _render_in_parts(self, path: Path) -> bool:
+        """Workbook nhiều sheet / tài liệu Word dài: dựng song song qua converter_func"""
+        check = self._checks.get(path)
+        if check is None or check.kind not in SPLIT_KINDS:
+            return False
+        if check.sheet_count is not None:
+            return check.sheet_count > 1
+        # Word: cost = document.xml (giải nén) + ảnh
+        return check.cost - check.image_bytes >= PARALLEL_MIN_DOCUMENT_BYTES
+    
+    def _open_batch(self, output_folder: Path, outputs: Dict[Path, Path]):
+        """Ghi batch vào journal, trả về (id batch, các file đã xong ở lần chạy trước)"""
+        if self.journal is None:
+            return None, set()
+        try:
+            batch_id, resumed = self.journal.open_batch(
+                batch_key(self.file_list, output_folder), 'ui', outputs.items(), supersede=True)
+            return batch_id, self.journal.completed(batch_id) if resumed else set()
+        except Exception as e:
+            logger.warning(f"Không ghi được journal: {e}")
+            return None, set()
+    
+    def _journal(self, method: str, batch_id: Optional[int], *args):
+        """Ghi trạng thái vào journal (bỏ qua nếu không có journal / bị lỗi)"""
+        if self.journal is None or batch_id is None:
+            return
+        try:
+            getattr(self.journal, method)(batch_id, *args)
+        except Exception as e:
+            logger.warning(f"Không ghi được journal: {e}")
+    
+    def _restore_unfinished(self):
+        """Đưa lại vào danh sách các file chưa xong của batch bị gián đoạn lần trước"""
+        if self.journal is None:
+            return
+        try:
+            unfinished = self.journal.unfinished('ui')
+        except Exception as e:
+            logger.warning(f"Không đọc được journal: {e}")
+            return
+        paths = [path for path in unfinished[1] if path.exists()] if unfinished else []
+        if not paths:
+            return
+        self.log(f"♻️ Batch trước bị gián đoạn, còn {len(paths)} file chưa chuyển đổi:")
+        for path in paths:
+            self.add_file(path)
+        self.log("")
+    
+    def _record(self, path: Path, duration: float, peak: int):
+        """Ghi lần chuyển đổi thành công vào lịch sử dự đoán thời gian"""
+        check = self._checks.get(path)
+        if check is None or self.metrics is None:
+            return
+        try:
+            self.metrics.record(check, duration, peak)
+        except Exception as e:
+            logger.warning(f"Không ghi được lịch sử chuyển đổi: {e}")
 
 
 def create_app(title: str, file_types: List[tuple], patterns: List[str],
-               converter_func: Callable) -> ConverterUI:
+               converter_func: Callable, preview_func: Optional[Callable] = None,
+               stream_func: Optional[Callable] = None) -> ConverterUI:
     """
     Tạo ứng dụng converter
     
@@ -340,6 +572,8 @@ def create_app(title: str, file_types: List[tuple], patterns: List[str],
         file_types: Danh sách file types
         patterns: Danh sách pattern
         converter_func: Hàm chuyển đổi
+        preview_func: Hàm xem trước (tùy chọn)
+        stream_func: Hàm chuyển đổi trong bộ nhớ (tùy chọn)
         
     Returns:
         ConverterUI: UI instance
@@ -351,5 +585,6 @@ def create_app(title: str, file_types: List[tuple], patterns: List[str],
         root = tk.Tk()
         logger.warning("tkinterdnd2 chưa cài đặt - không có drag & drop")
     
-    app = ConverterUI(root, title, file_types, patterns, converter_func)
+    app = ConverterUI(root, title, file_types, patterns, converter_func, preview_func,
+                      stream_func)
     return app
\ No newline at end of file
@@ -1,6 +1,10 @@
 """
 Xử lý các thao tác file I/O
 """
+import codecs
+import csv
+import fnmatch
+import hashlib
 import os
 import sys
 import platform
@@ -13,6 +17,10 @@ from ..logging.logger_setup import get_logger
 
 logger = get_logger(__name__)
 
+# File tạm / file khoá không được chuyển đổi: ~$ và .~lock.# của Office /
+# LibreOffice, *.tmp (gồm .<tên>.<id>.tmp do enqueue / BackgroundWriter ghi dở)
+TEMP_FILE_PATTERNS = ['~$*', '.~lock.*#', '*.tmp']
+
 
 class FileHandler:
     """Class xử lý các thao tác file"""
@@ -92,7 +100,37 @@ class FileHandler:
             return False
         
         return True
-    
+
+    @staticmethod
+    def matches_patterns(file_path: Path, patterns: List[str]) -> bool:
+        """
+        Kiểm tra tên file có khớp pattern không (không phân biệt hoa thường)
+
+        Args:
+            file_path: Đường dẫn file
+            patterns: Danh sách pattern VD: ['*.docx', '*.xlsx']
+
+        Returns:
+            bool: True nếu khớp ít nhất một pattern
+        """
+        name = file_path.name.lower()
+        return any(fnmatch.fnmatchcase(name, p.lower()) for p in patterns)
+
+    @staticmethod
+    def is_temp_file(file_path: Path) -> bool:
+        """
+        Kiểm tra file tạm / file khoá (~$file.docx, .~lock.file#, *.tmp)
+
+        File tên bắt đầu bằng dấu chấm khác (VD .report.docx) vẫn là tài liệu thật
+
+        Args:
+            file_path: Đường dẫn file
+
+        Returns:
+            bool: True nếu là file tạm, không nên chuyển đổi
+        """
+        return FileHandler.matches_patterns(file_path, TEMP_FILE_PATTERNS)
+
     @staticmethod
     def open_folder(folder_path: Path):
         """
@@ -216,4 +254,90 @@ class FileHandler:
         
         # Fallback về home directory
         logger.warning(f"Thư mục Downloads không tồn tại, dùng {home}")
-        return home
\ No newline at end of file
+        return home
+    
+    @staticmethod
+    def get_app_data_folder() -> Path:
+        """
+        Lấy thư mục dữ liệu riêng của ứng dụng (lịch sử chuyển đổi, journal...)
+        
+        Windows: %LOCALAPPDATA%\\wordtopdf, macOS: ~/Library/Application Support/wordtopdf,
+        Linux: $XDG_DATA_HOME/wordtopdf (mặc định ~/.local/share/wordtopdf)
+        
+        Returns:
+            Path: Đường dẫn thư mục (đã tạo nếu chưa có)
+        """
+        system = platform.system()
+        if system == "Windows":
+            base = Path(os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local')
+        elif system == "Darwin":
+            base = Path.home() / 'Library' / 'Application Support'
+        else:
+            base = Path(os.environ.get('XDG_DATA_HOME') or Path.home() / '.local' / 'share')
+        
+        folder = base / 'wordtopdf'
+        folder.mkdir(parents=True, exist_ok=True)
+        return folder
+    
+    @staticmethod
+    def file_hash(file_path: Path, chunk_size: int = 1024 * 1024) -> str:
+        """
+        Tính SHA-256 của file (đọc từng khối, không nạp cả file vào RAM)
+        
+        Args:
+            file_path: Đường dẫn file
+            chunk_size: Kích thước mỗi lần đọc (byte)
+            
+        Returns:
+            str: Chuỗi hex SHA-256
+        """
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    @staticmethod
+    def detect_text_encoding(sample: bytes) -> str:
+        """
+        Đoán encoding của file văn bản (CSV/TSV) từ phần đầu file
+        
+        BOM (UTF-8 / UTF-16) được ưu tiên; không có BOM thì là UTF-8 nếu phần đầu
+        giải mã được, không thì Windows-1258 (file tiếng Việt xuất từ Excel cũ).
+        
+        Args:
+            sample: Vài chục KB đầu file (có thể bị cắt giữa một ký tự)
+            
+        Returns:
+            str: Tên encoding dùng được với open()/codecs
+        """
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+        if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+            return 'utf-16'
+        try:
+            # final=False: ký tự nhiều byte bị cắt ở cuối mẫu không tính là lỗi
+            codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return 'cp1258'
+    
+    @staticmethod
+    def detect_delimiter(lines: List[str], suffix: str = '') -> str:
+        """
+        Đoán ký tự phân cách của CSV/TSV từ các dòng đầu file
+        
+        Args:
+            lines: Các dòng đầu (đã giải mã, không có dòng bị cắt dở)
+            suffix: Đuôi file - .tsv luôn phân cách bằng tab
+            
+        Returns:
+            str: Một trong , ; tab | (mặc định dấu phẩy)
+        """
+        if suffix.lower() == '.tsv':
+            return '\t'
+        try:
+            # Sniffer chỉ nhận '\n' làm xuống dòng nên nối lại thay vì dùng nguyên văn bản
+            return csv.Sniffer().sniff('\n'.join(lines[:50]), delimiters=',;\t|').delimiter
+        except csv.Error:
+            return ','
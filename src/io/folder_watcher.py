@@ -0,0 +1,299 @@
+"""
+Theo dõi thư mục - phát hiện file mới/thay đổi để chuyển đổi tự động
+"""
+import ctypes
+import ctypes.util
+import heapq
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from ..logging.logger_setup import get_logger
+from .file_handler import FileHandler
+
+logger = get_logger(__name__)
+
+# (size, mtime_ns) - dùng để biết file đã ghi xong chưa
+Signature = Tuple[int, int]
+
+
+class _Inotify:
+    """Wrapper tối giản cho inotify của Linux (qua ctypes, không cần thư viện ngoài)"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    _EVENT = struct.Struct('iIII')  # wd, mask, cookie, len
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.watches: Dict[int, Path] = {}
+
+    def add_watch(self, folder: Path):
+        """Theo dõi một thư mục (không đệ quy)"""
+        wd = self._add_watch(self.fd, os.fsencode(folder), self.WATCH_MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(folder))
+        self.watches[wd] = folder
+
+    def read_events(self) -> List[Tuple[Optional[Path], int]]:
+        """
+        Đọc hết event đang chờ
+
+        Returns:
+            List[Tuple[Optional[Path], int]]: (đường dẫn, mask); path = None khi tràn hàng đợi
+        """
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(buf):
+                wd, mask, _cookie, length = self._EVENT.unpack_from(buf, offset)
+                offset += self._EVENT.size
+                name = buf[offset:offset + length].rstrip(b'\0')
+                offset += length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    events.append((None, mask))
+                elif mask & self.IN_IGNORED:
+                    self.watches.pop(wd, None)
+                elif name and wd in self.watches:
+                    events.append((self.watches[wd] / os.fsdecode(name), mask))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class FolderWatcher:
+    """
+    Theo dõi một hoặc nhiều thư mục và báo các file đã ghi xong
+
+    Dùng inotify trên Linux (CPU gần như 0 khi rảnh), các hệ khác dùng polling
+    với os.scandir. File chỉ được báo khi (size, mtime) không đổi trong
+    settle_seconds để tránh đọc file đang copy dở.
+    """
+
+    def __init__(self, folders: Iterable[Path], patterns: List[str],
+                 on_ready: Callable[[List[Path]], None],
+                 settle_seconds: float = 2.0, poll_interval: float = 2.0,
+                 recursive: bool = True, use_polling: bool = False):
+        """
+        Args:
+            folders: Các thư mục cần theo dõi
+            patterns: Pattern file VD: ['*.docx', '*.xlsx']
+            on_ready: Callback nhận danh sách file đã ổn định
+            settle_seconds: Thời gian file phải đứng yên trước khi báo
+            poll_interval: Chu kỳ quét khi dùng polling
+            recursive: Theo dõi cả thư mục con
+            use_polling: Bắt buộc dùng polling (VD: thư mục mạng không hỗ trợ inotify)
+        """
+        self.folders = [Path(f).resolve() for f in folders]
+        self.patterns = patterns
+        self.on_ready = on_ready
+        self.settle_seconds = settle_seconds
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max(poll_interval, 10.0)
+        self.recursive = recursive
+        self.use_polling = use_polling
+
+        self._pending: Dict[Path, list] = {}       # path -> [deadline, signature]
+        self._heap: List[Tuple[float, Path]] = []  # (deadline, path), lazy
+        self._reported: Dict[Path, Signature] = {}  # chữ ký lần cuối đã báo
+        self._snapshot: Dict[Path, Signature] = {}  # chỉ dùng cho polling
+        self._stop = threading.Event()
+        self._wake_r, self._wake_w = os.pipe()
+
+    def stop(self):
+        """Dừng vòng lặp run() (an toàn khi gọi từ thread khác)"""
+        self._stop.set()
+        try:
+            os.write(self._wake_w, b'x')
+        except OSError:
+            pass  # run() đã kết thúc và đóng pipe
+
+    def run(self):
+        """Vòng lặp theo dõi, block cho đến khi stop()"""
+        inotify = None if self.use_polling else self._create_inotify()
+        mode = "inotify" if inotify else f"polling {self.poll_interval}s"
+        logger.info(f"Đang theo dõi {len(self.folders)} thư mục ({mode})")
+
+        # Các file đã có sẵn cũng là ứng viên
+        for path, sig in self._scan(self.folders, inotify):
+            self._snapshot[path] = sig
+            self._touch(path, sig)
+
+        interval = self.poll_interval
+        next_poll = time.monotonic() + interval
+        try:
+            while not self._stop.is_set():
+                timeout = self._next_timeout()
+                if inotify:
+                    readable, _, _ = select.select([inotify.fd, self._wake_r], [], [], timeout)
+                    if inotify.fd in readable:
+                        self._handle_events(inotify, inotify.read_events())
+                else:
+                    wait = next_poll - time.monotonic()
+                    if timeout is not None:
+                        wait = min(wait, timeout)
+                    self._stop.wait(max(wait, 0))
+                    if time.monotonic() >= next_poll:
+                        # Không có thay đổi -> giãn chu kỳ quét để giảm tải CPU/ổ mạng
+                        changed = self._poll()
+                        interval = self.poll_interval if changed else min(
+                            interval * 1.5, self.max_poll_interval)
+                        next_poll = time.monotonic() + interval
+                self._flush_ready()
+        finally:
+            if inotify:
+                inotify.close()
+            os.close(self._wake_r)
+            os.close(self._wake_w)
+            logger.info("Đã dừng theo dõi thư mục")
+
+    def _create_inotify(self) -> Optional[_Inotify]:
+        """Tạo inotify, trả về None nếu hệ điều hành không hỗ trợ"""
+        try:
+            return _Inotify()
+        except (OSError, AttributeError, TypeError) as e:
+            logger.warning(f"Không dùng được inotify ({e}), chuyển sang polling")
+            return None
+
+    def _accepts(self, path: Path) -> bool:
+        return (FileHandler.matches_patterns(path, self.patterns)
+                and not FileHandler.is_temp_file(path))
+
+    def _scan(self, folders: Iterable[Path],
+              inotify: Optional[_Inotify] = None) -> Iterator[Tuple[Path, Signature]]:
+        """Quét thư mục bằng os.scandir, đăng ký inotify trước khi liệt kê để không sót file"""
+        stack = list(folders)
+        while stack:
+            folder = stack.pop()
+            if inotify:
+                try:
+                    inotify.add_watch(folder)
+                except OSError as e:
+                    logger.warning(f"Không theo dõi được {folder}: {e}")
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.recursive:
+                                stack.append(Path(entry.path))
+                            continue
+                        path = Path(entry.path)
+                        if not self._accepts(path):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        yield path, (st.st_size, st.st_mtime_ns)
+            except OSError as e:
+                logger.warning(f"Không đọc được thư mục {folder}: {e}")
+
+    def _poll(self) -> bool:
+        """Quét lại toàn bộ, trả về True nếu có file mới/thay đổi"""
+        snapshot = dict(self._scan(self.folders))
+        changed = False
+        for path, sig in snapshot.items():
+            if self._snapshot.get(path) != sig:
+                self._touch(path, sig)
+                changed = True
+        self._snapshot = snapshot
+        return changed
+
+    def _handle_events(self, inotify: _Inotify, events: List[Tuple[Optional[Path], int]]):
+        for path, mask in events:
+            if path is None:
+                logger.warning("Hàng đợi inotify bị tràn, quét lại thư mục")
+                for p, sig in self._scan(self.folders, inotify):
+                    self._touch(p, sig)
+            elif mask & _Inotify.IN_ISDIR:
+                # Thư mục con mới: theo dõi và lấy các file đã có bên trong
+                if self.recursive and mask & (_Inotify.IN_CREATE | _Inotify.IN_MOVED_TO):
+                    for p, sig in self._scan([path], inotify):
+                        self._touch(p, sig)
+            elif self._accepts(path):
+                self._touch(path)
+
+    def _touch(self, path: Path, sig: Optional[Signature] = None):
+        """Ghi nhận file vừa thay đổi, lùi hạn kiểm tra thêm settle_seconds"""
+        deadline = time.monotonic() + self.settle_seconds
+        entry = self._pending.get(path)
+        if entry is None:
+            self._pending[path] = [deadline, sig]
+            heapq.heappush(self._heap, (deadline, path))
+        else:
+            # Heap entry cũ sẽ được đẩy lại khi tới hạn
+            entry[0] = deadline
+
+    def _next_timeout(self) -> Optional[float]:
+        if not self._heap:
+            return None
+        return max(self._heap[0][0] - time.monotonic(), 0.0)
+
+    def _stat(self, path: Path) -> Optional[Signature]:
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_size, st.st_mtime_ns
+
+    def _flush_ready(self):
+        """Báo các file đã đứng yên đủ lâu"""
+        ready = []
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] <= now:
+            _, path = heapq.heappop(self._heap)
+            entry = self._pending.get(path)
+            if entry is None:
+                continue
+            if entry[0] > now:
+                heapq.heappush(self._heap, (entry[0], path))
+                continue
+
+            sig = self._stat(path)
+            if sig is None:
+                del self._pending[path]
+                continue
+            if sig != entry[1]:
+                # Vẫn đang ghi -> chờ thêm một chu kỳ
+                entry[0] = now + self.settle_seconds
+                entry[1] = sig
+                heapq.heappush(self._heap, (entry[0], path))
+                continue
+
+            del self._pending[path]
+            if self._reported.get(path) != sig:
+                self._reported[path] = sig
+                ready.append(path)
+
+        if ready:
+            try:
+                self.on_ready(ready)
+            except Exception as e:
+                logger.error(f"Lỗi xử lý file mới: {e}", exc_info=True)
@@ -0,0 +1,194 @@
+"""
+Vào/ra trong bộ nhớ cho converter: đọc tài liệu từ bytes / memoryview / mmap /
+file object và nhận PDF dưới dạng bytes hoặc ghi thẳng vào stream
+
+Không ghi file tạm và không chép lại dữ liệu: bytes được BytesIO dùng chung bộ
+đệm, memoryview / mmap / bytearray được đọc qua MemoryReader (chỉ phần được
+đọc mới thành bytes), PDF là đúng object bytes mà ReportLab tạo ra.
+"""
+import io
+import mmap
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator, Optional, Union
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+# Nội dung tài liệu: bytes-like (bytes, bytearray, memoryview, mmap) hoặc file object nhị phân
+InputSource = Union[bytes, bytearray, memoryview, BinaryIO]
+
+
+class MemoryReader(io.RawIOBase):
+    """File object chỉ đọc trên một vùng nhớ (memoryview, mmap, bytearray), không chép"""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast('B')
+        self._pos = 0
+        # bytes gốc khi view phủ trọn nó, xem stream_buffer()
+        obj = buffer.obj if isinstance(buffer, memoryview) else buffer
+        self.source = obj if isinstance(obj, bytes) and len(obj) == self._view.nbytes else None
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        self._check_closed()
+        end = len(self._view) if size is None or size < 0 else min(self._pos + size, len(self._view))
+        data = self._view[self._pos:end].tobytes()
+        self._pos = max(end, self._pos)
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, b) -> int:
+        self._check_closed()
+        data = self._view[self._pos:self._pos + len(b)]
+        n = len(data)
+        memoryview(b).cast('B')[:n] = data
+        self._pos += n
+        return n
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        self._check_closed()
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self._pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self._view) + offset
+        else:
+            raise ValueError(f"whence không hợp lệ: {whence}")
+        if pos < 0:
+            raise ValueError(f"Vị trí âm: {pos}")
+        self._pos = pos
+        return pos
+
+    def tell(self) -> int:
+        self._check_closed()
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            # Trả vùng nhớ để người gọi đóng được mmap
+            try:
+                self._view.release()
+            except BufferError:
+                pass  # còn view con đang dùng, vùng nhớ được trả khi chúng bị giải phóng
+        super().close()
+
+    def _check_closed(self):
+        if self.closed:
+            raise ValueError("MemoryReader đã đóng")
+
+
+def source_name(source) -> str:
+    """Tên hiển thị trong log của nội dung đầu vào"""
+    name = getattr(source, 'name', None)
+    if isinstance(name, str):
+        return name
+    try:
+        with memoryview(source) as view:
+            return f"<{view.nbytes} byte trong bộ nhớ>"
+    except TypeError:
+        return f"<{type(source).__name__}>"
+
+
+@contextmanager
+def open_input(source: InputSource) -> Iterator[BinaryIO]:
+    """
+    Stream đọc được và seek được (docx/xlsx là file zip) cho nội dung đầu vào
+
+    Stream của người gọi được dùng nguyên và không bị đóng; stream không seek
+    được (pipe, socket) thì buộc phải đọc hết vào bộ nhớ.
+
+    Args:
+        source: bytes, bytearray, memoryview, mmap hoặc file object nhị phân
+
+    Yields:
+        BinaryIO: Stream đặt ở đầu nội dung
+    """
+    if isinstance(source, bytes):
+        # BytesIO dùng chung bộ đệm với bytes cho tới khi bị ghi
+        stream = io.BytesIO(source)
+    elif hasattr(source, 'read') and not isinstance(source, mmap.mmap):
+        if _seekable(source):
+            yield source
+            return
+        logger.debug("Stream không seek được - đọc toàn bộ vào bộ nhớ")
+        stream = io.BytesIO(source.read())
+    else:
+        try:
+            stream = MemoryReader(source)
+        except TypeError:
+            raise TypeError(f"Không đọc được tài liệu từ {type(source).__name__}: cần bytes, "
+                            f"memoryview, mmap hoặc file object nhị phân") from None
+    try:
+        yield stream
+    finally:
+        stream.close()
+
+
+def _seekable(stream) -> bool:
+    try:
+        return stream.seekable()
+    except (AttributeError, ValueError):
+        return False
+
+
+def peek(stream: BinaryIO, size: int) -> bytes:
+    """Đọc size byte đầu của stream rồi trả lại vị trí cũ"""
+    position = stream.tell()
+    try:
+        return stream.read(size)
+    finally:
+        stream.seek(position)
+
+
+def stream_buffer(stream: BinaryIO):
+    """
+    Toàn bộ nội dung stream dạng bytes (cho thư viện chỉ nhận cả file trong bộ
+    nhớ như xlrd), không chép khi stream được tạo từ bytes
+
+    mmap cũng bị đọc ra bytes: xlrd tự đóng mmap được truyền vào khi nạp xong.
+    """
+    if isinstance(stream, MemoryReader) and stream.source is not None:
+        return stream.source
+    if isinstance(stream, io.BytesIO):
+        # BytesIO chưa bị ghi trả lại chính bytes đã tạo ra nó
+        return stream.getvalue()
+    stream.seek(0)
+    return stream.read()
+
+
+class PdfCapture:
+    """
+    Đích ghi PDF trong bộ nhớ: ReportLab ghi cả file bằng một lần write(bytes)
+    nên giữ lại chính object đó thay vì chép vào BytesIO rồi chép ra lần nữa
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(data)
+        return len(data)
+
+    def getvalue(self) -> bytes:
+        if len(self._chunks) == 1 and isinstance(self._chunks[0], bytes):
+            return self._chunks[0]
+        return b''.join(self._chunks)
+
+
+def pdf_target(output: Optional[BinaryIO]):
+    """Đích ghi PDF: stream của người gọi, hoặc PdfCapture để trả về bytes"""
+    return output if output is not None else PdfCapture()
+
+
+def pdf_result(target) -> Optional[bytes]:
+    """PDF đã ghi (bytes) nếu đích là PdfCapture, None nếu đã ghi vào stream của người gọi"""
+    return target.getvalue() if isinstance(target, PdfCapture) else None
@@ -0,0 +1,191 @@
+"""
+Đọc trước / ghi nền cho chuyển đổi nhiều file
+
+Trên thư mục mạng, đọc file gốc và ghi PDF tốn ngang (hoặc hơn) thời gian dựng
+PDF. FilePrefetcher đọc nội dung các file kế tiếp trên một thread trong lúc file
+hiện tại đang được dựng, BackgroundWriter ghi PDF đã dựng trên một thread khác;
+hai đầu nối với nhau bằng hàng đợi có giới hạn nên bộ nhớ chỉ giữ vài file. Tổng
+thời gian khi đó gần với giai đoạn chậm nhất thay vì tổng các giai đoạn.
+"""
+import io
+import os
+import queue
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, NamedTuple, Optional
+
+from ..logging.logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+# File lớn hơn thì không đọc trước vào bộ nhớ, converter tự đọc từ đĩa
+PREFETCH_MAX_BYTES = 64 * 1024 ** 2
+
+
+class Prefetched(NamedTuple):
+    """Một file đã được đọc trước"""
+    path: Path
+    data: Optional[bytes]  # None = file quá lớn hoặc đọc lỗi
+    error: Optional[Exception] = None
+    read_time: float = 0.0
+
+    def open(self) -> io.BytesIO:
+        """Stream trong bộ nhớ mang tên file (converter lấy tên sheet / đuôi file từ đó)"""
+        stream = io.BytesIO(self.data)
+        stream.name = str(self.path)
+        return stream
+
+
+class FilePrefetcher:
+    """
+    Đọc trước các file trên thread riêng, giữ tối đa max_files file đã đọc
+
+    Mỗi file được submit() là một việc; get() trả None khi mọi việc đã
+    task_done() (file lỗi được submit lại trước khi task_done lần thử trước).
+    """
+
+    def __init__(self, max_files: int = 2, max_bytes: int = PREFETCH_MAX_BYTES):
+        """
+        Args:
+            max_files: Số file đã đọc tối đa đang chờ dựng
+            max_bytes: File lớn hơn không được đọc trước
+        """
+        self.max_files = max(1, max_files)
+        self.max_bytes = max_bytes
+        self._pending = deque()  # (path, not_before, read)
+        self._ready = deque()
+        self._unfinished = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+        self._thread.start()
+
+    def submit(self, path: Path, not_before: float = 0.0, read: bool = True):
+        """
+        Thêm file cần đọc
+
+        Args:
+            path: File cần đọc
+            not_before: Thời điểm time.time() sớm nhất (cho thử lại)
+            read: False = chỉ xếp thứ tự, không đọc nội dung (converter tự đọc từ đĩa)
+        """
+        with self._cond:
+            self._pending.append((path, not_before, read))
+            self._unfinished += 1
+            self._cond.notify_all()
+
+    def get(self) -> Optional[Prefetched]:
+        """File kế tiếp theo thứ tự submit, None khi không còn việc nào"""
+        with self._cond:
+            while not self._ready and self._unfinished and not self._closed:
+                self._cond.wait()
+            if not self._ready:
+                return None
+            item = self._ready.popleft()
+            self._cond.notify_all()
+            return item
+
+    def task_done(self):
+        """Một file đã xong hẳn (thành công hoặc hết lượt thử lại)"""
+        with self._cond:
+            self._unfinished -= 1
+            self._cond.notify_all()
+
+    def close(self):
+        """Dừng thread đọc (file đang chờ bị bỏ)"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closed and (not self._pending
+                                            or len(self._ready) >= self.max_files):
+                    self._cond.wait()
+                if self._closed:
+                    return
+                path, not_before, read = self._pending.popleft()
+                # Chờ hết thời gian backoff của file thử lại (close() đánh thức)
+                while not self._closed and time.time() < not_before:
+                    self._cond.wait(not_before - time.time())
+                if self._closed:
+                    return
+            item = self._read(path) if read else Prefetched(path, None)
+            with self._cond:
+                self._ready.append(item)
+                self._cond.notify_all()
+
+    def _read(self, path: Path) -> Prefetched:
+        start = time.perf_counter()
+        try:
+            if path.stat().st_size > self.max_bytes:
+                return Prefetched(path, None)
+            data = path.read_bytes()
+        except OSError as e:
+            return Prefetched(path, None, e)
+        return Prefetched(path, data, read_time=time.perf_counter() - start)
+
+
+class BackgroundWriter:
+    """
+    Ghi PDF ra đĩa trên thread riêng, submit() chờ khi đã có max_pending file
+    chưa ghi (giữ bộ nhớ có giới hạn khi đĩa / mạng chậm hơn tốc độ dựng)
+    """
+
+    def __init__(self, max_pending: int = 2):
+        self._queue = queue.Queue(max(1, max_pending))
+        self._thread = threading.Thread(target=self._run, name='pdf-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, output_path: Path, data: bytes,
+               on_done: Callable[[Path, Optional[Exception]], None]):
+        """
+        Đưa PDF vào hàng đợi ghi
+
+        Args:
+            output_path: File PDF đích
+            data: Nội dung PDF
+            on_done: on_done(output_path, lỗi hoặc None), gọi trên thread ghi
+        """
+        self._queue.put((output_path, data, on_done))
+
+    def close(self):
+        """Ghi hết các file đang chờ rồi dừng thread"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            output_path, data, on_done = item
+            error = None
+            try:
+                self._write(output_path, data)
+            except OSError as e:
+                error = e
+            try:
+                on_done(output_path, error)
+            except Exception as e:
+                logger.error(f"Lỗi xử lý sau khi ghi {output_path}: {e}", exc_info=True)
+
+    @staticmethod
+    def _write(output_path: Path, data: bytes):
+        """Ghi vào file tạm cùng thư mục rồi đổi tên: không để lại PDF ghi dở"""
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        temp = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+        try:
+            with open(temp, 'wb') as f:
+                f.write(data)
+            os.replace(temp, output_path)
+        except OSError:
+            try:
+                temp.unlink()
+            except OSError:
+                pass
+            raise
@@ -0,0 +1,360 @@
+"""
+Pre-flight - kiểm tra nhanh file trước khi đưa vào converter
+
+Chỉ đọc chữ ký đầu file, central directory của zip (.docx/.xlsx), thư mục
+OLE2 (.xls/.doc/file Office có mật khẩu) hoặc vài chục KB đầu của CSV/TSV,
+và vài metadata nhỏ, không parse cả tài liệu. File rỗng, hỏng, có mật khẩu hay
+sai định dạng bị loại ngay với lý do rõ ràng thay vì chiếm một worker cho đến khi Document()/load_workbook báo lỗi.
+Ước lượng khối lượng (cost) được dùng để sắp lịch chạy job lớn trước.
+"""
+import csv
+import re
+import struct
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..logging.logger_setup import get_logger
+from .file_handler import FileHandler
+
+logger = get_logger(__name__)
+
+ZIP_MAGIC = (b'PK\x03\x04', b'PK\x05\x06')
+OLE2_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+TEXT_SUFFIXES = ('.csv', '.tsv')
+_TEXT_SAMPLE_BYTES = 64 * 1024
+
+# Giới hạn tổng dung lượng giải nén (chống zip bomb)
+MAX_UNCOMPRESSED = 4 * 1024 ** 3
+
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?"')
+_SHEET_RE = re.compile(rb'<(?:\w+:)?sheet\s')
+_APP_PARAGRAPHS_RE = re.compile(rb'<(?:\w+:)?Paragraphs>(\d+)<')
+
+_OLE_END_OF_CHAIN = 0xFFFFFFFE
+_OLE_MAX_DIR_SECTORS = 64  # đủ cho mọi file Office thường gặp, chặn file hỏng vòng lặp
+
+# BIFF record
+_BIFF_BOF = 0x0809
+_BIFF_EOF = 0x000A
+_BIFF_FILEPASS = 0x002F
+_BIFF_BOUNDSHEET = 0x0085
+_BIFF_DIMENSIONS = 0x0200
+
+
+@dataclass
+class PreflightResult:
+    """Kết quả pre-flight của một file"""
+    path: Path
+    ok: bool
+    kind: Optional[str] = None  # định dạng thật: '.docx', '.xlsx', '.xls', '.csv', '.tsv'
+    error: Optional[str] = None
+    size: int = 0  # byte trên đĩa
+    sheet_count: Optional[int] = None
+    cell_count: Optional[int] = None  # theo vùng dữ liệu khai báo của các sheet
+    paragraph_count: Optional[int] = None
+    image_bytes: int = 0
+    cost: float = 0.0  # ước lượng khối lượng xử lý (byte nội dung), chỉ để so sánh
+
+
+def preflight(path: Path) -> PreflightResult:
+    """
+    Kiểm tra nhanh một file
+
+    Args:
+        path: Đường dẫn file
+
+    Returns:
+        PreflightResult: ok=False kèm error nếu file không chuyển đổi được
+    """
+    path = Path(path)
+    try:
+        size = path.stat().st_size
+        if size == 0:
+            return PreflightResult(path, False, error="File rỗng (0 byte)")
+        with open(path, 'rb') as f:
+            head = f.read(8)
+            if head[:4] in ZIP_MAGIC:
+                result = _check_zip(path, f)
+            elif head == OLE2_MAGIC:
+                result = _check_ole2(path, f, size)
+            elif path.suffix.lower() in TEXT_SUFFIXES:
+                result = _check_text(path, f, size)
+            else:
+                result = PreflightResult(path, False, error=_describe_unknown(head))
+    except OSError as e:
+        return PreflightResult(path, False, error=f"Không đọc được file: {e}")
+    except Exception as e:
+        logger.debug(f"Pre-flight lỗi {path}: {e}", exc_info=True)
+        return PreflightResult(path, False, error=f"File hỏng: {e}")
+
+    result.size = size
+    if result.cost == 0.0:
+        result.cost = float(size)
+    return result
+
+
+def _describe_unknown(head: bytes) -> str:
+    if head.startswith(b'{\\rtf'):
+        return "File RTF (không phải .docx) - hãy lưu lại dạng .docx"
+    if head.lstrip().lower().startswith((b'<html', b'<!doc', b'<?xml')):
+        return "File HTML/XML đổi đuôi (không phải file Office thật)"
+    if head.startswith(b'%PDF'):
+        return "File đã là PDF"
+    return "Không phải file Word/Excel (sai chữ ký file)"
+
+
+# ----------------------------------------------------------------------
+# CSV / TSV: encoding và số cột theo phần đầu file, số dòng ngoại suy từ kích thước
+# ----------------------------------------------------------------------
+
+def _check_text(path: Path, f, size: int) -> PreflightResult:
+    f.seek(0)
+    sample = f.read(_TEXT_SAMPLE_BYTES)
+    encoding = FileHandler.detect_text_encoding(sample)
+    if b'\0' in sample and not encoding.startswith('utf-16'):
+        return PreflightResult(path, False, error="File nhị phân đổi đuôi (không phải CSV/TSV)")
+    text = sample.decode(encoding, errors='replace')
+    lines = text.splitlines()
+    if len(sample) == _TEXT_SAMPLE_BYTES and len(lines) > 1:
+        lines.pop()  # dòng cuối của mẫu có thể bị cắt dở
+    delimiter = FileHandler.detect_delimiter(lines, path.suffix)
+    columns = max((len(row) for row in csv.reader(lines[:200], delimiter=delimiter)), default=0)
+    if len(sample) >= size:
+        rows = len(lines)
+    else:
+        # Số byte của các dòng trong mẫu (theo tỉ lệ ký tự, encoding nhiều byte)
+        kept = len(sample) * min(sum(len(line) + 1 for line in lines) / max(len(text), 1), 1.0)
+        rows = round(len(lines) * size / max(kept, 1.0))
+    return PreflightResult(path, True, kind=path.suffix.lower(), sheet_count=1,
+                           cell_count=rows * columns, cost=float(size))
+
+
+# ----------------------------------------------------------------------
+# OOXML (.docx / .xlsx): chỉ đọc central directory + vài part nhỏ
+# ----------------------------------------------------------------------
+
+def _check_zip(path: Path, f) -> PreflightResult:
+    f.seek(0)
+    try:
+        zf = zipfile.ZipFile(f)
+    except zipfile.BadZipFile as e:
+        return PreflightResult(path, False, error=f"File zip hỏng hoặc tải về chưa hết: {e}")
+
+    with zf:
+        infos: Dict[str, zipfile.ZipInfo] = {i.filename: i for i in zf.infolist()}
+        if any(i.flag_bits & 0x1 for i in infos.values()):
+            return PreflightResult(path, False, error="File zip có mật khẩu")
+        if sum(i.file_size for i in infos.values()) > MAX_UNCOMPRESSED:
+            return PreflightResult(path, False, error="Dung lượng giải nén quá lớn (nghi zip bomb)")
+
+        if 'word/document.xml' in infos:
+            return _docx_metadata(path, zf, infos)
+        if 'xl/workbook.xml' in infos:
+            return _xlsx_metadata(path, zf, infos)
+        if '[Content_Types].xml' in infos:
+            return PreflightResult(path, False, error="File Office không phải Word/Excel (pptx?)")
+        return PreflightResult(path, False, error="File zip không phải tài liệu Office")
+
+
+def _read_part(zf: zipfile.ZipFile, name: str, limit: int = -1) -> bytes:
+    with zf.open(name) as part:
+        return part.read(limit)
+
+
+def _docx_metadata(path: Path, zf: zipfile.ZipFile,
+                   infos: Dict[str, zipfile.ZipInfo]) -> PreflightResult:
+    result = PreflightResult(path, True, kind='.docx')
+    document = infos['word/document.xml']
+    result.image_bytes = sum(i.file_size for n, i in infos.items() if n.startswith('word/media/'))
+
+    # docProps/app.xml do Word ghi sẵn số đoạn, không phải parse document.xml
+    if 'docProps/app.xml' in infos:
+        m = _APP_PARAGRAPHS_RE.search(_read_part(zf, 'docProps/app.xml', 64 * 1024))
+        if m:
+            result.paragraph_count = int(m.group(1))
+    result.cost = float(document.file_size + result.image_bytes)
+    return result
+
+
+def _xlsx_metadata(path: Path, zf: zipfile.ZipFile,
+                   infos: Dict[str, zipfile.ZipInfo]) -> PreflightResult:
+    result = PreflightResult(path, True, kind='.xlsx')
+    result.sheet_count = len(_SHEET_RE.findall(_read_part(zf, 'xl/workbook.xml')))
+
+    sheets = [i for n, i in infos.items()
+              if n.startswith('xl/worksheets/') and n.endswith('.xml')]
+    cells = 0
+    for info in sheets:
+        # <dimension> nằm ngay đầu part, chỉ cần giải nén vài KB đầu
+        m = _DIMENSION_RE.search(_read_part(zf, info.filename, 4096))
+        if m:
+            rows, cols = _dimension_size(m.groups())
+            cells += rows * cols
+        else:
+            cells += info.file_size // 40  # ~40 byte XML mỗi ô
+    result.cell_count = cells
+    result.cost = float(sum(i.file_size for i in sheets)
+                        + infos.get('xl/sharedStrings.xml', zipfile.ZipInfo()).file_size)
+    return result
+
+
+def _column_number(letters: bytes) -> int:
+    number = 0
+    for ch in letters:
+        number = number * 26 + ch - 64
+    return number
+
+
+def _dimension_size(groups: Tuple) -> Tuple[int, int]:
+    col1, row1, col2, row2 = groups
+    if col2 is None:
+        return 1, 1
+    return (int(row2) - int(row1) + 1,
+            _column_number(col2) - _column_number(col1) + 1)
+
+
+# ----------------------------------------------------------------------
+# OLE2 / Compound File (.xls, .doc, file OOXML có mật khẩu)
+# ----------------------------------------------------------------------
+
+class _OleReader:
+    """Đọc tối thiểu Compound File: thư mục và phần đầu của stream"""
+
+    def __init__(self, f, size: int):
+        self.f = f
+        header = self._read_at(0, 512)
+        self.sector_size = 1 << struct.unpack_from('<H', header, 0x1E)[0]
+        if self.sector_size not in (512, 4096):
+            raise ValueError("Header OLE2 hỏng")
+        self.mini_cutoff = struct.unpack_from('<I', header, 0x38)[0]
+        self.first_dir = struct.unpack_from('<I', header, 0x30)[0]
+        self.max_sector = size // self.sector_size
+        self._per_sector = self.sector_size // 4
+
+        difat = list(struct.unpack_from('<109I', header, 0x4C))
+        next_difat, difat_count = struct.unpack_from('<II', header, 0x44)
+        for _ in range(min(difat_count, self.max_sector)):
+            if next_difat >= self.max_sector:
+                break
+            entries = struct.unpack(f'<{self._per_sector}I', self._sector(next_difat))
+            difat.extend(entries[:-1])
+            next_difat = entries[-1]
+        self._difat = difat
+        self._fat: Dict[int, Tuple[int, ...]] = {}
+
+    def _read_at(self, offset: int, length: int) -> bytes:
+        self.f.seek(offset)
+        return self.f.read(length)
+
+    def _sector(self, sector: int) -> bytes:
+        return self._read_at((sector + 1) * self.sector_size, self.sector_size)
+
+    def _next(self, sector: int) -> int:
+        """Sector kế tiếp trong chain (FAT sector được đọc khi cần)"""
+        fat_index, pos = divmod(sector, self._per_sector)
+        table = self._fat.get(fat_index)
+        if table is None:
+            if fat_index >= len(self._difat) or self._difat[fat_index] >= self.max_sector:
+                return _OLE_END_OF_CHAIN
+            table = self._fat[fat_index] = struct.unpack(
+                f'<{self._per_sector}I', self._sector(self._difat[fat_index]))
+        return table[pos]
+
+    def _chain(self, start: int, limit: int):
+        sector = start
+        for _ in range(limit):
+            if sector >= self.max_sector:
+                return
+            yield sector
+            sector = self._next(sector)
+
+    def entries(self) -> List[Tuple[str, int, int, int]]:
+        """Các entry thư mục: (tên, loại, sector đầu, kích thước)"""
+        result = []
+        for sector in self._chain(self.first_dir, _OLE_MAX_DIR_SECTORS):
+            data = self._sector(sector)
+            for off in range(0, len(data), 128):
+                entry = data[off:off + 128]
+                name_len = struct.unpack_from('<H', entry, 0x40)[0]
+                entry_type = entry[0x42]
+                if not entry_type or not 2 <= name_len <= 64:
+                    continue
+                name = entry[:name_len - 2].decode('utf-16-le', 'replace')
+                start, size = struct.unpack_from('<IQ', entry, 0x74)
+                if self.sector_size == 512:
+                    size &= 0xFFFFFFFF  # bản 3: 4 byte cao không dùng
+                result.append((name, entry_type, start, size))
+        return result
+
+    def read_stream(self, start: int, size: int, offset: int, length: int) -> bytes:
+        """Đọc length byte tại offset của stream (stream nằm trong sector thường)"""
+        if size < self.mini_cutoff:
+            return b''
+        end = min(offset + length, size)
+        first, skip = divmod(offset, self.sector_size)
+        parts = []
+        needed = end - offset
+        for idx, sector in enumerate(self._chain(start, first + needed // self.sector_size + 2)):
+            if idx < first:
+                continue
+            parts.append(self._sector(sector))
+            if sum(map(len, parts)) - skip >= needed:
+                break
+        return b''.join(parts)[skip:skip + max(needed, 0)]
+
+
+def _check_ole2(path: Path, f, size: int) -> PreflightResult:
+    ole = _OleReader(f, size)
+    streams = {name: (start, stream_size) for name, kind, start, stream_size in ole.entries()
+               if kind == 2}
+
+    if 'EncryptedPackage' in streams or 'EncryptionInfo' in streams:
+        return PreflightResult(path, False, error="File có mật khẩu (đã mã hoá) - hãy bỏ mật khẩu trước")
+    if 'WordDocument' in streams:
+        return PreflightResult(path, False, error="Định dạng Word .doc cũ - hãy lưu lại dạng .docx")
+
+    workbook = streams.get('Workbook') or streams.get('Book')
+    if workbook is None:
+        return PreflightResult(path, False, error="File OLE2 không phải Word/Excel")
+    return _xls_metadata(path, ole, *workbook)
+
+
+def _biff_records(data: bytes):
+    pos = 0
+    while pos + 4 <= len(data):
+        rtype, rlen = struct.unpack_from('<HH', data, pos)
+        yield rtype, data[pos + 4:pos + 4 + rlen]
+        pos += 4 + rlen
+
+
+def _xls_metadata(path: Path, ole: _OleReader, start: int, size: int) -> PreflightResult:
+    result = PreflightResult(path, True, kind='.xls', cost=float(size))
+    # Phần globals (font, format, XF, danh sách sheet) thường chỉ vài chục KB
+    globals_data = ole.read_stream(start, size, 0, 64 * 1024)
+    if not globals_data:
+        return result
+
+    records = _biff_records(globals_data)
+    if next(records, (None,))[0] != _BIFF_BOF:
+        return PreflightResult(path, False, error="Stream Workbook hỏng (thiếu BOF)")
+    sheet_offsets = []
+    for rtype, data in records:
+        if rtype == _BIFF_FILEPASS:
+            return PreflightResult(path, False, error="File .xls có mật khẩu - hãy bỏ mật khẩu trước")
+        if rtype == _BIFF_BOUNDSHEET and len(data) >= 6 and data[5] == 0:  # 0 = worksheet
+            sheet_offsets.append(struct.unpack_from('<I', data, 0)[0])
+        elif rtype == _BIFF_EOF:
+            break
+    result.sheet_count = len(sheet_offsets)
+
+    cells = 0
+    for offset in sheet_offsets:
+        for rtype, data in _biff_records(ole.read_stream(start, size, offset, 4096)):
+            if rtype == _BIFF_DIMENSIONS and len(data) >= 12:
+                row1, row2, col1, col2 = struct.unpack_from('<IIHH', data, 0)
+                cells += max(row2 - row1, 0) * max(col2 - col1, 0)
+                break
+    result.cell_count = cells
+    return result
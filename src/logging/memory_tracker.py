@@ -0,0 +1,254 @@
+"""
+Đo bộ nhớ theo từng giai đoạn chuyển đổi (RSS hoặc tracemalloc)
+
+Converter gọi checkpoint('<giai đoạn>') ở cuối mỗi giai đoạn (đọc file, dựng
+bảng, build PDF...). Khi không đo, checkpoint chỉ là một phép so sánh. Bật bằng
+biến môi trường WORDTOPDF_MEMTRACE hoặc `--memtrace` của main_batch.py:
+
+- rss: RSS cuối giai đoạn và RSS đỉnh trong giai đoạn (Linux: VmHWM), gần như
+  không tốn thêm thời gian
+- tracemalloc: thêm bộ nhớ Python cấp phát (hiện tại / đỉnh từng giai đoạn) và
+  top dòng code cấp phát nhiều nhất trong mỗi giai đoạn; chậm hơn 2-4 lần
+"""
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+from .logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+MEMTRACE_ENV = 'WORDTOPDF_MEMTRACE'
+RSS = 'rss'
+TRACEMALLOC = 'tracemalloc'
+MODES = (RSS, TRACEMALLOC)
+DEFAULT_TOP = 10
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+_MB = 1024 ** 2
+
+# Không tính cấp phát của chính tracemalloc / cơ chế import
+_SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+    tracemalloc.Filter(False, __file__),
+]
+# Dòng cấp phát thêm ít hơn mức này không đưa vào báo cáo
+_MIN_SITE_BYTES = 1024
+
+
+def reset_peak_memory():
+    """Đặt lại mức RSS đỉnh của process hiện tại (Linux), gọi trước mỗi job"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def peak_memory() -> int:
+    """RSS đỉnh (byte) của process từ lần reset_peak_memory() gần nhất, 0 nếu không đo được"""
+    try:
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, AttributeError):
+        return 0
+
+
+def current_rss() -> int:
+    """RSS hiện tại (byte) của process, 0 nếu không đọc được"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class AllocationSite(NamedTuple):
+    """Dòng code cấp phát thêm nhiều bộ nhớ trong một giai đoạn"""
+    location: str  # file:dòng
+    size_diff: int  # byte
+    count_diff: int
+
+
+class Stage(NamedTuple):
+    """Số đo của một giai đoạn (từ checkpoint trước tới checkpoint này)"""
+    name: str
+    seconds: float
+    rss: int  # RSS cuối giai đoạn
+    peak_rss: int  # RSS đỉnh trong giai đoạn (0 nếu không đo được)
+    traced: int  # tracemalloc: bộ nhớ Python cuối giai đoạn (0 ở chế độ rss)
+    traced_peak: int  # tracemalloc: đỉnh trong giai đoạn
+    top: List[AllocationSite]
+
+
+class MemoryTracker:
+    """Ghi số đo bộ nhớ tại các checkpoint của một lần chuyển đổi"""
+
+    def __init__(self, mode: str = RSS, top: int = DEFAULT_TOP):
+        """
+        Args:
+            mode: 'rss' hoặc 'tracemalloc'
+            top: Số dòng cấp phát nhiều nhất ghi lại cho mỗi giai đoạn (tracemalloc)
+        """
+        if mode not in MODES:
+            raise ValueError(f"Chế độ đo bộ nhớ không hợp lệ: {mode} (chọn {', '.join(MODES)})")
+        self.mode = mode
+        self.top = top
+        self.stages: List[Stage] = []
+        self.baseline_rss = 0
+        self._started_tracing = False
+        self._snapshot = None
+        self._last = 0.0
+
+    def start(self):
+        """Bắt đầu đo (RSS nền = RSS lúc này)"""
+        if self.mode == TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        if self.mode == TRACEMALLOC:
+            tracemalloc.reset_peak()
+            self._snapshot = self._take_snapshot()
+        reset_peak_memory()
+        self.baseline_rss = current_rss()
+        self._last = time.perf_counter()
+
+    def checkpoint(self, name: str):
+        """Kết thúc giai đoạn name: ghi số đo rồi đặt lại mức đỉnh cho giai đoạn sau"""
+        now = time.perf_counter()
+        traced = traced_peak = 0
+        top: List[AllocationSite] = []
+        if self.mode == TRACEMALLOC and tracemalloc.is_tracing():
+            traced, traced_peak = tracemalloc.get_traced_memory()
+            snapshot = self._take_snapshot()
+            top = [AllocationSite(f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                                  stat.size_diff, stat.count_diff)
+                   for stat in snapshot.compare_to(self._snapshot, 'lineno')[:self.top]
+                   if stat.size_diff >= _MIN_SITE_BYTES]
+            self._snapshot = snapshot
+            tracemalloc.reset_peak()
+        self.stages.append(Stage(name, now - self._last, current_rss(), peak_memory(),
+                                 traced, traced_peak, top))
+        reset_peak_memory()
+        # Thời gian chụp snapshot không tính vào giai đoạn sau
+        self._last = time.perf_counter()
+
+    def stop(self):
+        """Dừng đo (tắt tracemalloc nếu tracker đã bật nó)"""
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        self._snapshot = None
+
+    @property
+    def peak_rss(self) -> int:
+        """RSS đỉnh trong cả lần đo"""
+        return max([s.peak_rss or s.rss for s in self.stages] + [self.baseline_rss])
+
+    @property
+    def traced_peak(self) -> int:
+        """Bộ nhớ Python đỉnh trong cả lần đo (tracemalloc)"""
+        return max([s.traced_peak for s in self.stages] + [0])
+
+    def report(self) -> List[str]:
+        """Bảng số đo theo giai đoạn (MB) kèm top dòng cấp phát"""
+        lines = [f"{'Giai đoạn':<24}{'thời gian':>10}{'RSS':>9}{'đỉnh RSS':>10}"
+                 + (f"{'Python':>9}{'đỉnh Py':>9}" if self.mode == TRACEMALLOC else '')]
+        lines.append(f"{'(nền)':<24}{'':>10}{self.baseline_rss / _MB:>9.1f}")
+        for stage in self.stages:
+            line = (f"{stage.name:<24}{stage.seconds:>9.2f}s{stage.rss / _MB:>9.1f}"
+                    f"{stage.peak_rss / _MB:>10.1f}")
+            if self.mode == TRACEMALLOC:
+                line += f"{stage.traced / _MB:>9.1f}{stage.traced_peak / _MB:>9.1f}"
+            lines.append(line)
+            for site in stage.top:
+                lines.append(f"    +{site.size_diff / _MB:8.2f}MB {site.count_diff:>+9} "
+                             f"{_short_path(site.location)}")
+        return lines
+
+    @staticmethod
+    def _take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+
+def _short_path(location: str) -> str:
+    """Rút gọn đường dẫn site-packages / project để báo cáo dễ đọc"""
+    for marker in ('site-packages' + os.sep, 'src' + os.sep):
+        index = location.rfind(marker)
+        if index >= 0:
+            return location[index + (len(marker) if marker.startswith('site') else 0):]
+    return location
+
+
+# Tracker của lần chuyển đổi đang chạy trong process này (None = không đo)
+_active: Optional[MemoryTracker] = None
+
+
+def checkpoint(name: str):
+    """Đánh dấu kết thúc một giai đoạn chuyển đổi (không làm gì nếu không đo)"""
+    if _active is not None:
+        _active.checkpoint(name)
+
+
+def memtrace_mode() -> Optional[str]:
+    """Chế độ đo theo WORDTOPDF_MEMTRACE (1 = rss), None nếu không bật"""
+    value = os.environ.get(MEMTRACE_ENV, '').strip().lower()
+    if value in ('', '0', 'false', 'no', 'off'):
+        return None
+    if value in ('1', 'true', 'yes', 'on'):
+        return RSS
+    if value not in MODES:
+        logger.warning(f"{MEMTRACE_ENV}={value} không hợp lệ, dùng {RSS}")
+        return RSS
+    return value
+
+
+def enable_memtrace(mode: str):
+    """Bật đo bộ nhớ cho process này và các worker tạo sau đó"""
+    os.environ[MEMTRACE_ENV] = mode
+
+
+@contextmanager
+def track_memory(input_path: Path, mode: Optional[str] = None,
+                 top: int = DEFAULT_TOP) -> Iterator[Optional[MemoryTracker]]:
+    """
+    Đo bộ nhớ các giai đoạn của đoạn code trong with, ghi báo cáo vào log khi xong
+
+    Args:
+        input_path: File đang chuyển đổi (tiêu đề báo cáo)
+        mode: 'rss' / 'tracemalloc' (None = theo WORDTOPDF_MEMTRACE, không bật thì không đo)
+        top: Số dòng cấp phát nhiều nhất mỗi giai đoạn
+
+    Yields:
+        Optional[MemoryTracker]: Tracker (None nếu không đo)
+    """
+    global _active
+    mode = mode or memtrace_mode()
+    if mode is None or _active is not None:
+        yield None
+        return
+    tracker = MemoryTracker(mode, top)
+    tracker.start()
+    _active = tracker
+    try:
+        yield tracker
+    finally:
+        _active = None
+        tracker.checkpoint('(kết thúc)')
+        tracker.stop()
+        logger.info(f"🧠 Bộ nhớ {Path(input_path).name} ({mode}), "
+                    f"đỉnh {tracker.peak_rss / _MB:.1f}MB RSS:")
+        for line in tracker.report():
+            logger.info(f"   {line}")
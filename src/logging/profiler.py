@@ -0,0 +1,192 @@
+"""
+Profiling chuyển đổi bằng cProfile, không cần sửa code converter
+
+Bật bằng `--profile [thư mục]` của main_batch.py hoặc biến môi trường
+WORDTOPDF_PROFILE (đường dẫn thư mục, hoặc 1 = thư mục profiles/). Worker
+process thừa hưởng biến môi trường nên mỗi file được profile trong chính worker
+chạy nó. Mỗi file cho ra:
+
+- <tên file>-<hash>.pstats: mở bằng pstats, snakeviz...
+- <tên file>-<hash>.collapsed: collapsed stacks cho flamegraph.pl / speedscope
+
+Cuối batch write_report() gộp các .pstats thành report.txt (top N hàm tốn thời
+gian nhất), batch.pstats và batch.collapsed.
+"""
+import cProfile
+import hashlib
+import os
+import pstats
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .logger_setup import get_logger
+
+logger = get_logger(__name__)
+
+PROFILE_ENV = 'WORDTOPDF_PROFILE'
+DEFAULT_FOLDER = 'profiles'
+DEFAULT_TOP = 25
+
+# Bỏ nhánh chiếm dưới tỉ lệ này của tổng thời gian (tránh bùng nổ số stack)
+_MIN_STACK_SHARE = 1e-4
+_MAX_DEPTH = 256
+
+_ON_VALUES = ('1', 'true', 'yes', 'on')
+_OFF_VALUES = ('', '0', 'false', 'no', 'off')
+
+Func = Tuple[str, int, str]  # (filename, lineno, funcname) như trong pstats
+
+
+def profile_folder() -> Optional[Path]:
+    """Thư mục ghi profile theo WORDTOPDF_PROFILE, None nếu không bật"""
+    value = os.environ.get(PROFILE_ENV, '').strip()
+    if value.lower() in _OFF_VALUES:
+        return None
+    if value.lower() in _ON_VALUES:
+        return Path(DEFAULT_FOLDER)
+    return Path(value)
+
+
+def enable_profiling(folder: Path):
+    """Bật profiling cho process này và các worker tạo sau đó"""
+    os.environ[PROFILE_ENV] = str(Path(folder).resolve())
+
+
+def _profile_name(input_path: Path) -> str:
+    """Tên file profile: tên file gốc + hash đường dẫn (file trùng tên ở thư mục khác)"""
+    digest = hashlib.sha1(str(Path(input_path).resolve()).encode()).hexdigest()[:8]
+    return f"{Path(input_path).name}-{digest}"
+
+
+@contextmanager
+def profile_conversion(input_path: Path,
+                       folder: Optional[Path] = None) -> Iterator[Optional[Path]]:
+    """
+    Profile đoạn code trong with (nếu profiling đang bật)
+
+    Profile được ghi cả khi chuyển đổi lỗi, file chậm bất thường thường cũng là
+    file lỗi. Job bị kill vì quá thời gian thì không kịp ghi, nên tăng --timeout
+    khi profile.
+
+    Args:
+        input_path: File đang chuyển đổi (dùng đặt tên file profile)
+        folder: Thư mục ghi profile (None = theo WORDTOPDF_PROFILE)
+
+    Yields:
+        Optional[Path]: File .pstats sẽ được ghi, None nếu không profile
+    """
+    folder = folder or profile_folder()
+    if folder is None:
+        yield None
+        return
+    folder.mkdir(parents=True, exist_ok=True)
+    stats_path = folder / f"{_profile_name(input_path)}.pstats"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield stats_path
+    finally:
+        profiler.disable()
+        try:
+            profiler.dump_stats(str(stats_path))
+            write_collapsed(pstats.Stats(profiler), stats_path.with_suffix('.collapsed'))
+            logger.debug(f"Đã ghi profile: {stats_path}")
+        except OSError as e:
+            logger.warning(f"Không ghi được profile {stats_path}: {e}")
+
+
+def _label(func: Func) -> str:
+    filename, lineno, name = func
+    if filename == '~':  # hàm built-in
+        return name.replace(';', ':')
+    return f"{name} ({os.path.basename(filename)}:{lineno})".replace(';', ':')
+
+
+def collapsed_stacks(stats: pstats.Stats) -> Dict[str, int]:
+    """
+    Dựng collapsed stacks ("a;b;c" -> micro giây self time) từ pstats
+
+    cProfile chỉ lưu cạnh caller -> callee, không lưu cả stack, nên thời gian
+    của callee được chia về các đường gọi theo tỉ lệ thời gian của caller trên
+    từng đường (cách của gprof2dot / flameprof). Hàm đệ quy chỉ xuất hiện một
+    lần trên mỗi stack.
+    """
+    entries = stats.stats
+    callees: Dict[Func, Dict[Func, Tuple[float, float]]] = {}
+    for func, (_, _, _, _, callers) in entries.items():
+        for caller, edge in callers.items():
+            callees.setdefault(caller, {})[func] = (edge[2], edge[3])
+
+    total = sum(tt for _, _, tt, _, _ in entries.values())
+    threshold = total * _MIN_STACK_SHARE
+    result: Dict[str, int] = {}
+
+    def emit(stack: List[str], seconds: float):
+        micros = int(round(seconds * 1e6))
+        if micros > 0:
+            key = ';'.join(stack)
+            result[key] = result.get(key, 0) + micros
+
+    # Duyệt bằng stack tường minh (stack gọi ReportLab có thể rất sâu)
+    roots = [(func, entry[3], entry[2]) for func, entry in entries.items() if not entry[4]]
+    todo = [(func, ct, tt, [_label(func)], {func}) for func, ct, tt in roots]
+    while todo:
+        func, ct_share, tt_share, stack, on_stack = todo.pop()
+        emit(stack, tt_share)
+        func_ct = entries[func][3]
+        if func_ct <= 0 or len(stack) >= _MAX_DEPTH:
+            continue
+        scale = ct_share / func_ct
+        for callee, (tt, ct) in callees.get(func, {}).items():
+            if callee in on_stack or ct * scale < threshold:
+                continue
+            todo.append((callee, ct * scale, tt * scale, stack + [_label(callee)],
+                         on_stack | {callee}))
+    return result
+
+
+def write_collapsed(stats: pstats.Stats, path: Path) -> Path:
+    """Ghi collapsed stacks (mỗi dòng "a;b;c <micro giây>") cho flamegraph"""
+    stacks = collapsed_stacks(stats)
+    with open(path, 'w', encoding='utf-8') as f:
+        for stack, micros in sorted(stacks.items()):
+            f.write(f"{stack} {micros}\n")
+    return path
+
+
+def write_report(stats_paths: Iterable[Path], folder: Path,
+                 top: int = DEFAULT_TOP) -> Optional[Path]:
+    """
+    Gộp profile của các file trong batch: top N hotspot theo self time và cumulative
+
+    Args:
+        stats_paths: Các file .pstats của batch
+        folder: Thư mục ghi report.txt, batch.pstats, batch.collapsed
+        top: Số hàm trong mỗi bảng
+
+    Returns:
+        Optional[Path]: File report.txt, None nếu không có profile nào
+    """
+    paths = [str(p) for p in stats_paths if p and Path(p).exists()]
+    if not paths:
+        return None
+    folder.mkdir(parents=True, exist_ok=True)
+    report_path = folder / 'report.txt'
+    with open(report_path, 'w', encoding='utf-8') as f:
+        stats = pstats.Stats(*paths, stream=f)
+        f.write(f"Profile gộp của {len(paths)} file\n\n")
+        f.write(f"=== Top {top} theo self time (tottime) ===\n")
+        stats.sort_stats('tottime').print_stats(top)
+        f.write(f"\n=== Top {top} theo thời gian tích luỹ (cumulative) ===\n")
+        stats.sort_stats('cumulative').print_stats(top)
+    stats.dump_stats(str(folder / 'batch.pstats'))
+    write_collapsed(stats, folder / 'batch.collapsed')
+
+    total = stats.total_tt or 1.0
+    hotspots = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]
+    logger.info(f"🔥 Hotspot ({len(paths)} file, tổng {stats.total_tt:.2f}s):")
+    for func, (_, calls, tt, ct, _) in hotspots:
+        logger.info(f"   {tt / total:6.1%} {tt:8.3f}s {ct:8.3f}s {calls:>9}  {_label(func)}")
+    logger.info(f"📄 Báo cáo profile: {report_path}")
+    return report_path